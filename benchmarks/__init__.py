@@ -0,0 +1,5 @@
+import sys
+import os
+
+# the interpreter modules import each other by bare name, as in tests/conftest.py
+sys.path.append(os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../interpretter_in_python/"))
@@ -0,0 +1,59 @@
+import sys
+import json
+import argparse
+from benchmarks.corpora import corpora
+from benchmarks.runner import (SIZES, DEFAULT_TOLERANCE, run_suite, run_memory_suite, compare,
+                               format_results, format_memory)
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Measure lexer, parser and evaluator throughput')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                            help=f"corpus sizes to generate (default: {' '.join(map(str, SIZES))})")
+    arg_parser.add_argument('--corpus', choices=sorted(corpora), action='append',
+                            help='only run the given corpus (repeatable)')
+    arg_parser.add_argument('--repeat', type=int, default=3,
+                            help='runs per measurement; the best one is kept')
+    arg_parser.add_argument('--output', help='write the results as JSON to this file')
+    arg_parser.add_argument('--compare', metavar='BASELINE',
+                            help='fail if any rate dropped below the saved baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help=f'allowed slowdown before failing (default: {DEFAULT_TOLERANCE})')
+    arg_parser.add_argument('--memory', action='store_true',
+                            help='report the memory parsed trees keep instead of throughput')
+    args = arg_parser.parse_args(argv)
+
+    if args.memory:
+        report = run_memory_suite(args.sizes, args.corpus)
+        print(format_memory(report))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    report = run_suite(args.sizes, args.repeat, args.corpus)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(format_results(report, baseline))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance)
+        for key, ratio in regressions:
+            print(f"REGRESSION {key}: {ratio:.2f}x of baseline", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
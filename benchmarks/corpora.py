@@ -0,0 +1,65 @@
+from typing import Callable, Dict
+
+# Each generator returns a syntactically valid Monkey program whose size
+# grows linearly with `size`. Nesting depth stays bounded so the recursive
+# parser and evaluator can handle every corpus.
+
+
+def name(i: int) -> str:
+    # identifiers are letters only, so number them in base 26
+    letters = ""
+    while True:
+        i, digit = divmod(i, 26)
+        letters = "abcdefghijklmnopqrstuvwxyz"[digit] + letters
+        if not i:
+            return letters
+
+
+def nested_expressions(size: int) -> str:
+    depth = 40
+    expression = "1"
+    for i in range(depth):
+        operator = "+-*"[i % 3]
+        expression = f"({expression} {operator} {i % 7 + 1})"
+    return ";\n".join([expression] * size) + ";\n"
+
+
+def let_statements(size: int) -> str:
+    return "".join(f"let value{name(i)} = {i} * 2 + {i % 10} - 3;\n" for i in range(size))
+
+
+def wide_functions(size: int) -> str:
+    params = [f"p{name(i)}" for i in range(16)]
+    body = " + ".join(params)
+    return "".join(f"let fn{name(i)} = fn({', '.join(params)}) {{ if (pa < pb) {{ {body} }} else {{ pa }} }};\n"
+                   for i in range(size))
+
+
+def call_chains(size: int) -> str:
+    chain = "f"
+    for i in range(20):
+        chain = f"{chain}({i}, g(x))"
+    return ";\n".join([chain] * size) + ";\n"
+
+
+def conditionals(size: int) -> str:
+    return "".join(f"if ({i} < {i % 13}) {{ {i} * 3 }} else {{ if (true) {{ {i} - 1 }} }};\n"
+                   for i in range(size))
+
+
+def recursive_calls(size: int) -> str:
+    # arithmetic and conditionals inside function calls; every line starts
+    # a different count so memoization cannot skip any of them
+    count = ("let count = fn(n, acc) { if (n < 1) { acc } else { "
+             "count(n - 1, acc + n * 2 - n / 3) } };\n")
+    return count + "".join(f"count({i % 50 + 20}, {i});\n" for i in range(size))
+
+
+corpora: Dict[str, Callable[[int], str]] = {
+    'nested_expressions': nested_expressions,
+    'let_statements': let_statements,
+    'wide_functions': wide_functions,
+    'call_chains': call_chains,
+    'conditionals': conditionals,
+    'recursive_calls': recursive_calls,
+}
@@ -0,0 +1,173 @@
+import gc
+import time
+import platform
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+from benchmarks.corpora import corpora
+from lexer import Lexer
+from monkey_parser import Parser
+import evaluator
+import stack_evaluator
+import pycompiler
+import closure_compiler
+from compiler import CompileError
+from optimizer import count_nodes
+from token_type import TokenType
+
+SIZES = (100, 400, 1600)
+DEFAULT_TOLERANCE = 0.2
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse(src: str, recursive: bool = False):
+    parser = Parser(Lexer(src), recursive=recursive)
+    program = parser.parse_program()
+    if parser.errors:
+        raise ValueError(f"benchmark corpus does not parse: {parser.errors[0]}")
+    return program
+
+
+def result(items: int, seconds: float, unit: str) -> dict:
+    return {'items': items, 'seconds': seconds, 'rate': items / seconds if seconds else 0.0, 'unit': unit}
+
+
+def measure_lexer(src: str, repeat: int) -> dict:
+    tokens = sum(1 for _ in Lexer(src).tokenize())
+    return result(tokens, best_time(lambda: sum(1 for _ in Lexer(src).tokenize()), repeat), 'tokens/s')
+
+
+def measure_parser(src: str, repeat: int, recursive: bool = False) -> dict:
+    nodes = count_nodes(parse(src))
+    return result(nodes, best_time(lambda: parse(src, recursive), repeat), 'nodes/s')
+
+
+def measure_recursive_parser(src: str, repeat: int) -> dict:
+    return measure_parser(src, repeat, recursive=True)
+
+
+def measure_evaluator(src: str, repeat: int, run=evaluator.run) -> dict:
+    program = parse(src)
+    return result(1, best_time(lambda: run(program), repeat), 'evaluations/s')
+
+
+def measure_stack_evaluator(src: str, repeat: int) -> dict:
+    return measure_evaluator(src, repeat, stack_evaluator.run)
+
+
+def measure_closure_compiler(src: str, repeat: int) -> dict:
+    # steady state, like the Python compiler: the closures are built once
+    program = parse(src)
+    closure_compiler.run(program)
+    return result(1, best_time(lambda: closure_compiler.run(program), repeat), 'evaluations/s')
+
+
+def measure_python_compiler(src: str, repeat: int) -> Optional[dict]:
+    # steady state: the first run compiles, the timed ones hit the code cache
+    program = parse(src)
+    try:
+        pycompiler.run(program)
+    except CompileError:
+        return None
+    return result(1, best_time(lambda: pycompiler.run(program), repeat), 'evaluations/s')
+
+
+# the -recursive and -stack variants are there to compare against the defaults
+measurements = {
+    'lexer': measure_lexer,
+    'parser': measure_parser,
+    'parser-recursive': measure_recursive_parser,
+    'evaluator': measure_evaluator,
+    'evaluator-stack': measure_stack_evaluator,
+    'evaluator-closure': measure_closure_compiler,
+    'evaluator-python': measure_python_compiler,
+}
+
+
+def run_suite(sizes=SIZES, repeat: int = 3, names: Optional[List[str]] = None) -> dict:
+    results = {}
+    for name, generate in corpora.items():
+        if names and name not in names:
+            continue
+        for size in sizes:
+            src = generate(size)
+            for stage, measure in measurements.items():
+                # None means the stage cannot run this corpus
+                if (measured := measure(src, repeat)) is not None:
+                    results[f"{stage}/{name}/{size}"] = measured
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def measure_memory(src: str) -> dict:
+    # What the parsed tree keeps alive, tokens included, next to how many
+    # identifiers it has and how many distinct names they share.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        program = parse(src)
+        kept, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    identifiers = [t for t in Lexer(src).tokenize() if t.type == TokenType.IDENT]
+    return {
+        'nodes': count_nodes(program),
+        'bytes': kept,
+        'identifiers': len(identifiers),
+        'names': len({t.literal for t in identifiers}),
+    }
+
+
+def run_memory_suite(sizes=SIZES, names: Optional[List[str]] = None) -> dict:
+    results = {}
+    for name, generate in corpora.items():
+        if names and name not in names:
+            continue
+        for size in sizes:
+            results[f"memory/{name}/{size}"] = measure_memory(generate(size))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def format_memory(report: dict) -> str:
+    lines = []
+    for key, entry in report['results'].items():
+        lines.append(f"{key:<40} {entry['bytes'] / 1024:>12,.0f} KiB  {entry['bytes'] / entry['nodes']:>6.0f} B/node"
+                     f"  {entry['identifiers']:>8} identifiers, {entry['names']} names")
+    return "\n".join(lines)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[str, float]]:
+    # Returns (benchmark, current/baseline rate) for every benchmark that got
+    # slower than the baseline by more than `tolerance`.
+    regressions = []
+    for key, base in baseline['results'].items():
+        if key not in current['results'] or not base['rate']:
+            continue
+        ratio = current['results'][key]['rate'] / base['rate']
+        if ratio < 1 - tolerance:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def format_results(report: dict, baseline: Optional[dict] = None) -> str:
+    lines = []
+    for key, entry in report['results'].items():
+        line = f"{key:<40} {entry['rate']:>14,.1f} {entry['unit']}"
+        if baseline and key in baseline['results'] and baseline['results'][key]['rate']:
+            line += f"  ({entry['rate'] / baseline['results'][key]['rate']:.2f}x baseline)"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,438 @@
+from array import array
+from enum import IntEnum, auto
+from typing import Dict, List, Optional, Tuple
+from token_type import Token, TokenType
+import ast_type
+import symbols
+
+token_types = list(TokenType)
+token_type_codes = {t: code for code, t in enumerate(token_types)}
+
+
+class NodeKind(IntEnum):
+    PROGRAM = auto()
+    LET_STATEMENT = auto()
+    RETURN_STATEMENT = auto()
+    EXPRESSION_STATEMENT = auto()
+    BLOCK_STATEMENT = auto()
+    IDENTIFIER = auto()
+    INTEGER_LITERAL = auto()
+    BOOLEAN = auto()
+    PREFIX_EXPRESSION = auto()
+    INFIX_EXPRESSION = auto()
+    IF_EXPRESSION = auto()
+    FUNCTION_LITERAL = auto()
+    CALL_EXPRESSION = auto()
+    ARRAY_LITERAL = auto()
+    INDEX_EXPRESSION = auto()
+
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class AstArena:
+    # Stores every node as one row of parallel arrays instead of an object.
+    # Passed to Parser(lexer, nodes=AstArena()), it takes the place of the
+    # ast_type module: each constructor appends a row and returns its index,
+    # and parse_program returns a ProgramView over the finished arena.
+    #
+    # Child columns a, b and c hold node indexes (0 means no node) or, for
+    # lists of nodes, a start offset into `lists` and a count. Tokens are
+    # kept the same way and only rebuilt as Token objects when accessed.
+    def __init__(self):
+        self.kind = array('B', [0])
+        self.token = array('i', [0])
+        self.a = array('q', [0])
+        self.b = array('i', [0])
+        self.c = array('i', [0])
+        self.lists = array('i')
+        self.token_type = array('B', [0])
+        self.token_source = array('i', [0])
+        self.token_start = array('q', [0])
+        self.token_length = array('i', [0])
+        self.sources: List[str] = ['']
+        self.last_token: Optional[Token] = None
+        self.big_ints: Dict[int, int] = {}
+        self.slot_counts: Dict[int, int] = {}
+        self.free_variables: Dict[int, Tuple[Tuple[str, int, int], ...]] = {}
+        self.caches: Dict[int, object] = {}
+
+    def __len__(self) -> int:
+        return len(self.kind) - 1
+
+    def add(self, kind: NodeKind, token: Optional[Token], a: int = 0, b: int = 0, c: int = 0) -> int:
+        if token is not self.last_token:
+            self.add_token(token)
+        self.kind.append(kind)
+        self.token.append(len(self.token_type) - 1)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        return len(self.kind) - 1
+
+    def add_token(self, token: Token):
+        self.last_token = token
+        if token.source is not self.sources[-1]:
+            self.sources.append(token.source)
+        self.token_type.append(token_type_codes[token.type])
+        self.token_source.append(len(self.sources) - 1)
+        self.token_start.append(token.start)
+        self.token_length.append(token.length)
+
+    def get_token(self, index: int) -> Token:
+        return Token(token_types[self.token_type[index]],
+                     self.sources[self.token_source[index]],
+                     self.token_start[index],
+                     self.token_length[index])
+
+    def add_list(self, nodes: Optional[List[int]]) -> int:
+        start = len(self.lists)
+        self.lists.extend(nodes or ())
+        return start
+
+    def view(self, index: int) -> Optional['NodeView']:
+        if not index:
+            return None
+        return view_classes[self.kind[index]](self, index)
+
+    def views(self, start: int, count: int) -> list:
+        return [self.view(i) for i in self.lists[start: start + count]]
+
+    def Program(self, statements: List[int]) -> 'ProgramView':
+        index = self.add(NodeKind.PROGRAM, self.last_token, self.add_list(statements), len(statements))
+        return self.view(index)
+
+    def LetStatement(self, token: Token, name: int, value: Optional[int]) -> int:
+        return self.add(NodeKind.LET_STATEMENT, token, name, value or 0)
+
+    def ReturnStatement(self, token: Token, return_value: Optional[int]) -> int:
+        return self.add(NodeKind.RETURN_STATEMENT, token, return_value or 0)
+
+    def ExpressionStatement(self, token: Token, expression: Optional[int]) -> int:
+        return self.add(NodeKind.EXPRESSION_STATEMENT, token, expression or 0)
+
+    def BlockStatement(self, token: Token, statements: List[int]) -> int:
+        return self.add(NodeKind.BLOCK_STATEMENT, token, self.add_list(statements), len(statements))
+
+    def Identifier(self, token: Token, value: str) -> int:
+        # a holds the name's number in symbols.table, b and c the resolver's
+        # depth and slot
+        return self.add(NodeKind.IDENTIFIER, token, symbols.intern(value), -1, -1)
+
+    def IntegerLiteral(self, token: Token, value: int) -> int:
+        if INT64_MIN <= value <= INT64_MAX:
+            return self.add(NodeKind.INTEGER_LITERAL, token, value)
+        index = self.add(NodeKind.INTEGER_LITERAL, token, 0, 1)
+        self.big_ints[index] = value
+        return index
+
+    def Boolean(self, token: Token, value: bool) -> int:
+        return self.add(NodeKind.BOOLEAN, token, int(value))
+
+    def PrefixExpression(self, token: Token, operator: str, right: Optional[int]) -> int:
+        return self.add(NodeKind.PREFIX_EXPRESSION, token, right or 0)
+
+    def InfixExpression(self, token: Token, left: int, operator: str, right: Optional[int]) -> int:
+        return self.add(NodeKind.INFIX_EXPRESSION, token, left, right or 0)
+
+    def IfExpression(self, token: Token, condition: Optional[int], consequence: int,
+                     alternative: Optional[int]) -> int:
+        return self.add(NodeKind.IF_EXPRESSION, token, condition or 0, consequence, alternative or 0)
+
+    def FunctionLiteral(self, token: Token, parameters: Optional[List[int]], body: int) -> int:
+        parameters = parameters or []
+        return self.add(NodeKind.FUNCTION_LITERAL, token, self.add_list(parameters), len(parameters), body)
+
+    def CallExpression(self, token: Token, function: int, arguments: Optional[List[int]]) -> int:
+        arguments = arguments or []
+        return self.add(NodeKind.CALL_EXPRESSION, token, function, self.add_list(arguments), len(arguments))
+
+    def ArrayLiteral(self, token: Token, elements: Optional[List[int]]) -> int:
+        elements = elements or []
+        return self.add(NodeKind.ARRAY_LITERAL, token, self.add_list(elements), len(elements))
+
+    def IndexExpression(self, token: Token, left: int, index: Optional[int]) -> int:
+        return self.add(NodeKind.INDEX_EXPRESSION, token, left, index or 0)
+
+
+class NodeView:
+    # A lightweight handle on one arena row. Each view class is registered as
+    # a virtual subclass of its ast_type counterpart, so isinstance checks and
+    # the string() implementations work on either representation.
+    __slots__ = ('arena', 'row')
+
+    def __init__(self, arena: AstArena, row: int):
+        self.arena = arena
+        self.row = row
+
+    @property
+    def token(self) -> Token:
+        return self.arena.get_token(self.arena.token[self.row])
+
+    def token_literal(self) -> str:
+        return self.token.literal
+
+    def string(self) -> str:
+        return self.token.literal
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.string()!r})"
+
+
+class ProgramView(NodeView):
+    # weakly referable, as the code caches hold programs
+    __slots__ = ('__weakref__',)
+
+    @property
+    def statements(self) -> list:
+        return self.arena.views(self.arena.a[self.row], self.arena.b[self.row])
+
+    token_literal = ast_type.Program.token_literal
+    string = ast_type.Program.string
+
+
+class LetStatementView(NodeView):
+    __slots__ = ()
+
+    @property
+    def name(self) -> 'IdentifierView':
+        return self.arena.view(self.arena.a[self.row])
+
+    @property
+    def value(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.b[self.row])
+
+    string = ast_type.LetStatement.string
+
+
+class ReturnStatementView(NodeView):
+    __slots__ = ()
+
+    @property
+    def return_value(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.a[self.row])
+
+    string = ast_type.ReturnStatement.string
+
+
+class ExpressionStatementView(NodeView):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.a[self.row])
+
+    string = ast_type.ExpressionStatement.string
+
+
+class BlockStatementView(NodeView):
+    __slots__ = ()
+
+    @property
+    def statements(self) -> list:
+        return self.arena.views(self.arena.a[self.row], self.arena.b[self.row])
+
+    string = ast_type.BlockStatement.string
+
+
+class IdentifierView(NodeView):
+    __slots__ = ()
+
+    @property
+    def value(self) -> str:
+        return symbols.table.names[self.arena.a[self.row]]
+
+    @property
+    def symbol(self) -> int:
+        return self.arena.a[self.row]
+
+    @property
+    def depth(self) -> int:
+        return self.arena.b[self.row]
+
+    @depth.setter
+    def depth(self, depth: int):
+        self.arena.b[self.row] = depth
+
+    @property
+    def slot(self) -> int:
+        return self.arena.c[self.row]
+
+    @slot.setter
+    def slot(self, slot: int):
+        self.arena.c[self.row] = slot
+
+
+class IntegerLiteralView(NodeView):
+    __slots__ = ()
+
+    @property
+    def value(self) -> int:
+        if self.arena.b[self.row]:
+            return self.arena.big_ints[self.row]
+        return self.arena.a[self.row]
+
+
+class BooleanView(NodeView):
+    __slots__ = ()
+
+    @property
+    def value(self) -> bool:
+        return bool(self.arena.a[self.row])
+
+
+class PrefixExpressionView(NodeView):
+    __slots__ = ()
+
+    @property
+    def operator(self) -> str:
+        return self.token.literal
+
+    @property
+    def right(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.a[self.row])
+
+    string = ast_type.PrefixExpression.string
+
+
+class InfixExpressionView(NodeView):
+    __slots__ = ()
+
+    @property
+    def operator(self) -> str:
+        return self.token.literal
+
+    @property
+    def left(self) -> NodeView:
+        return self.arena.view(self.arena.a[self.row])
+
+    @property
+    def right(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.b[self.row])
+
+    @property
+    def cache(self) -> object:
+        return self.arena.caches.get(self.row)
+
+    @cache.setter
+    def cache(self, cache: object):
+        self.arena.caches[self.row] = cache
+
+    string = ast_type.InfixExpression.string
+
+
+class IfExpressionView(NodeView):
+    __slots__ = ()
+
+    @property
+    def condition(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.a[self.row])
+
+    @property
+    def consequence(self) -> BlockStatementView:
+        return self.arena.view(self.arena.b[self.row])
+
+    @property
+    def alternative(self) -> Optional[BlockStatementView]:
+        return self.arena.view(self.arena.c[self.row])
+
+    string = ast_type.IfExpression.string
+
+
+class FunctionLiteralView(NodeView):
+    __slots__ = ()
+
+    @property
+    def parameters(self) -> List[IdentifierView]:
+        return self.arena.views(self.arena.a[self.row], self.arena.b[self.row])
+
+    @property
+    def body(self) -> BlockStatementView:
+        return self.arena.view(self.arena.c[self.row])
+
+    @property
+    def slot_count(self) -> int:
+        return self.arena.slot_counts.get(self.row, 0)
+
+    @slot_count.setter
+    def slot_count(self, slot_count: int):
+        self.arena.slot_counts[self.row] = slot_count
+
+    @property
+    def free_variables(self) -> Tuple[Tuple[str, int, int], ...]:
+        return self.arena.free_variables.get(self.row, ())
+
+    @free_variables.setter
+    def free_variables(self, free_variables: Tuple[Tuple[str, int, int], ...]):
+        self.arena.free_variables[self.row] = free_variables
+
+    string = ast_type.FunctionLiteral.string
+
+
+class CallExpressionView(NodeView):
+    __slots__ = ()
+
+    @property
+    def function(self) -> NodeView:
+        return self.arena.view(self.arena.a[self.row])
+
+    @property
+    def arguments(self) -> list:
+        return self.arena.views(self.arena.b[self.row], self.arena.c[self.row])
+
+    @property
+    def cache(self) -> object:
+        return self.arena.caches.get(self.row)
+
+    @cache.setter
+    def cache(self, cache: object):
+        self.arena.caches[self.row] = cache
+
+    string = ast_type.CallExpression.string
+
+
+class ArrayLiteralView(NodeView):
+    __slots__ = ()
+
+    @property
+    def elements(self) -> list:
+        return self.arena.views(self.arena.a[self.row], self.arena.b[self.row])
+
+    string = ast_type.ArrayLiteral.string
+
+
+class IndexExpressionView(NodeView):
+    __slots__ = ()
+
+    @property
+    def left(self) -> NodeView:
+        return self.arena.view(self.arena.a[self.row])
+
+    @property
+    def index(self) -> Optional[NodeView]:
+        return self.arena.view(self.arena.b[self.row])
+
+    string = ast_type.IndexExpression.string
+
+
+view_classes = {
+    NodeKind.PROGRAM: ProgramView,
+    NodeKind.LET_STATEMENT: LetStatementView,
+    NodeKind.RETURN_STATEMENT: ReturnStatementView,
+    NodeKind.EXPRESSION_STATEMENT: ExpressionStatementView,
+    NodeKind.BLOCK_STATEMENT: BlockStatementView,
+    NodeKind.IDENTIFIER: IdentifierView,
+    NodeKind.INTEGER_LITERAL: IntegerLiteralView,
+    NodeKind.BOOLEAN: BooleanView,
+    NodeKind.PREFIX_EXPRESSION: PrefixExpressionView,
+    NodeKind.INFIX_EXPRESSION: InfixExpressionView,
+    NodeKind.IF_EXPRESSION: IfExpressionView,
+    NodeKind.FUNCTION_LITERAL: FunctionLiteralView,
+    NodeKind.CALL_EXPRESSION: CallExpressionView,
+    NodeKind.ARRAY_LITERAL: ArrayLiteralView,
+    NodeKind.INDEX_EXPRESSION: IndexExpressionView,
+}
+
+for view_class in view_classes.values():
+    getattr(ast_type, view_class.__name__[:-len('View')]).register(view_class)
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from token_type import Token
 from abc import ABC, abstractclassmethod
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
+import symbols
 
 
 class Node(ABC):
@@ -49,7 +50,29 @@ class Program(Node):
 
 @dataclass
 class Identifier(Expression):
-    value: str
+    value: str = field(compare=False)
+    # filled in by the resolver: frames outwards and index in that frame
+    depth: int = field(default=-1, compare=False, repr=False)
+    slot: int = field(default=-1, compare=False, repr=False)
+    # the name's number in symbols.table, which is what equality compares;
+    # value becomes the table's string for it
+    symbol: int = field(default=-1, repr=False)
+
+    def __post_init__(self):
+        if self.symbol < 0:
+            self.symbol = symbols.intern(self.value)
+        self.value = symbols.table.names[self.symbol]
+
+    def __getstate__(self):
+        # another process numbers the name itself, as with SymbolToken
+        state = self.__dict__.copy()
+        del state['symbol']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.symbol = -1
+        self.__post_init__()
 
 
 @dataclass
@@ -76,6 +99,8 @@ class InfixExpression(Expression):
     left: Expression
     operator: str
     right: Expression
+    # filled in by the evaluator: see inline_cache
+    cache: object = field(default=None, compare=False, repr=False)
 
     def string(self):
         return f"({self.left.string()} {self.operator} {self.right.string()})"
@@ -115,6 +140,36 @@ class BlockStatement(Statement):
             strings.append(stmt.string())
         return "".join(strings)
 
+class LazyBlockStatement(BlockStatement):
+    # A function body the parser only pre-parsed: it keeps the span of the
+    # body's tokens and parses them the first time its statements are read.
+    # resolve, set by the resolver, then resolves them in the scopes the
+    # body was pre-resolved in.
+    def __init__(self, token: Token, span, parse: Callable[[object], List[Statement]]):
+        self.token = token
+        self.span = span
+        self.parse = parse
+        self.resolve: Optional[Callable[[], None]] = None
+        self._statements: Optional[List[Statement]] = None
+
+    @property
+    def parsed(self) -> bool:
+        return self._statements is not None
+
+    @property
+    def statements(self) -> List[Statement]:
+        if self._statements is None:
+            self._statements = self.parse(self.span)
+            self.span = None
+            if self.resolve is not None:
+                resolve, self.resolve = self.resolve, None
+                resolve()
+        return self._statements
+
+    @statements.setter
+    def statements(self, statements: List[Statement]):
+        self._statements = statements
+
 @dataclass
 class IfExpression(Expression):
     condition: Expression
@@ -124,6 +179,8 @@ class IfExpression(Expression):
     def string(self):
         strings = []
         strings.append("if")
+        strings.append(self.condition.string())
+        strings.append(" ")
         strings.append(self.consequence.string())
         strings.append(" ")
 
@@ -137,6 +194,10 @@ class IfExpression(Expression):
 class FunctionLiteral(Expression):
     parameters: List[Identifier]
     body: BlockStatement
+    # filled in by the resolver: size of the frame a call allocates, and
+    # (name, depth, slot) of each variable read from the closure environment
+    slot_count: int = field(default=0, compare=False, repr=False)
+    free_variables: Tuple[Tuple[str, int, int], ...] = field(default=(), compare=False, repr=False)
 
     def string(self):
         strings = []
@@ -152,12 +213,30 @@ class FunctionLiteral(Expression):
 class CallExpression(Expression):
     function: Expression
     arguments: List[Expression]
+    # filled in by the evaluator: see inline_cache
+    cache: object = field(default=None, compare=False, repr=False)
 
     def string(self):
         strings = []
-        strings.append(function.string())
+        strings.append(self.function.string())
         strings.append("(")
         strings.append(",".join([a.string() for a in self.arguments]))
         strings.append(")")
 
-        return "".join(strings)
\ No newline at end of file
+        return "".join(strings)
+
+@dataclass
+class ArrayLiteral(Expression):
+    elements: List[Expression]
+
+    def string(self):
+        return "[" + ", ".join([e.string() for e in self.elements]) + "]"
+
+
+@dataclass
+class IndexExpression(Expression):
+    left: Expression
+    index: Expression
+
+    def string(self):
+        return f"({self.left.string()}[{self.index.string()}])"
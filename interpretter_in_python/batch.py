@@ -0,0 +1,103 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from lexer import Lexer
+from monkey_parser import Parser
+from compiler import CompileError
+from optimizer import optimize
+from object import Error
+from monkey_builtins import capture_output
+import evaluator
+
+DEFAULT_CHUNKSIZE = 64
+
+
+@dataclass
+class BatchResult:
+    index: int
+    # inspect() of the program's value, None if it had none or did not parse
+    output: Optional[str] = None
+    # parser errors; the program was not run when there are any
+    errors: List[str] = field(default_factory=list)
+    # evaluation ended in an error value or the engine gave up
+    failed: bool = False
+    # lines the program wrote with puts
+    printed: List[str] = field(default_factory=list)
+
+
+def evaluate_source(index: int, source: str, engine: Callable = evaluator.run,
+                    optimize_ast: bool = True) -> BatchResult:
+    # puts output is returned with the result rather than written by the
+    # worker, so it stays with its program
+    with capture_output() as printed:
+        result = evaluate_program(index, source, engine, optimize_ast)
+    result.printed = printed
+    return result
+
+
+def evaluate_program(index: int, source: str, engine: Callable, optimize_ast: bool) -> BatchResult:
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    if parser.errors:
+        return BatchResult(index, errors=parser.errors)
+
+    if optimize_ast:
+        program, _ = optimize(program)
+    try:
+        evaluated = engine(program)
+    except CompileError as e:
+        return BatchResult(index, output=str(e), failed=True)
+    except RecursionError:
+        return BatchResult(index, output="nesting too deep for this engine", failed=True)
+
+    if evaluated is None:
+        return BatchResult(index)
+    return BatchResult(index, output=evaluated.inspect(), failed=type(evaluated) is Error)
+
+
+def evaluate_chunk(start: int, sources: List[str], engine: Callable,
+                   optimize_ast: bool) -> List[BatchResult]:
+    return [evaluate_source(start + i, source, engine, optimize_ast)
+            for i, source in enumerate(sources)]
+
+
+def chunked(sources: Iterable[str], chunksize: int) -> Iterator[Tuple[int, List[str]]]:
+    sources = iter(sources)
+    start = 0
+    while chunk := list(islice(sources, chunksize)):
+        yield start, chunk
+        start += len(chunk)
+
+
+def run_many(sources: Iterable[str], workers: Optional[int] = None,
+             chunksize: int = DEFAULT_CHUNKSIZE, engine: Callable = evaluator.run,
+             optimize_ast: bool = True) -> Iterator[BatchResult]:
+    # Evaluates independent programs on a pool of worker processes and
+    # yields their results in input order as soon as each is ready. sources
+    # is read lazily and at most two chunks per worker are in flight, so
+    # memory stays flat however long the input is. engine must be picklable,
+    # i.e. a module-level function such as evaluator.run.
+    workers = workers or os.cpu_count() or 1
+    chunks = chunked(sources, chunksize)
+
+    if workers == 1:
+        for start, chunk in chunks:
+            yield from evaluate_chunk(start, chunk, engine, optimize_ast)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for start, chunk in chunks:
+                pending.append(pool.submit(evaluate_chunk, start, chunk, engine, optimize_ast))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # the caller may stop early; drop the work it will never read
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,61 @@
+from enum import IntEnum, auto
+from dataclasses import dataclass
+from typing import List
+from object import Object
+
+
+class Opcode(IntEnum):
+    CONSTANT = auto()
+    POP = auto()
+
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+
+    TRUE = auto()
+    FALSE = auto()
+    NULL = auto()
+
+    EQUAL = auto()
+    NOT_EQUAL = auto()
+    GREATER_THAN = auto()
+    LESS_THAN = auto()
+
+    MINUS = auto()
+    BANG = auto()
+
+    JUMP_NOT_TRUTHY = auto()
+    JUMP = auto()
+
+
+operand_counts = {
+    Opcode.CONSTANT: 1,
+    Opcode.JUMP_NOT_TRUTHY: 1,
+    Opcode.JUMP: 1,
+}
+
+
+@dataclass
+class Bytecode:
+    instructions: List[int]
+    constants: List[Object]
+
+
+def make(op: Opcode, *operands: int) -> List[int]:
+    expected = operand_counts.get(op, 0)
+    if len(operands) != expected:
+        raise ValueError(f"{op.name} expects {expected} operands, got {len(operands)}")
+    return [int(op), *operands]
+
+
+def disassemble(instructions: List[int]) -> str:
+    lines = []
+    ip = 0
+    while ip < len(instructions):
+        op = Opcode(instructions[ip])
+        count = operand_counts.get(op, 0)
+        operands = instructions[ip + 1: ip + 1 + count]
+        lines.append(" ".join([f"{ip:04d}", op.name, *map(str, operands)]))
+        ip += 1 + count
+    return "\n".join(lines)
@@ -0,0 +1,474 @@
+import operator as operators
+from typing import Callable, List, Optional
+import evaluator
+import memoization
+from environment import Environment
+from compiler import CompileError
+from pycompiler import CodeCache
+from resolver import Resolver
+from monkey_builtins import builtins
+from evaluator import TailCall
+from object import (Object,
+                    Integer,
+                    Error,
+                    ReturnValue,
+                    Function,
+                    Array,
+                    Builtin,
+                    TRUE,
+                    FALSE,
+                    NULL,
+                    int_div)
+from ast_type import (Node,
+                      IntegerLiteral,
+                      Boolean,
+                      Program,
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      LazyBlockStatement,
+                      Identifier,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
+
+# A compiled node: a Python function of the frame it runs in, returning the
+# node's value as evaluator.eval would.
+Code = Callable[[Environment], Optional[Object]]
+
+arithmetic = {
+    '+': operators.add,
+    '-': operators.sub,
+    '*': operators.mul,
+}
+
+comparisons = {
+    '<': operators.lt,
+    '>': operators.gt,
+    '==': operators.eq,
+    '!=': operators.ne,
+}
+
+
+class MonkeyError(Exception):
+    # Carries an Error to the top of the program, so compiled code does not
+    # test every value it computes for one the way the evaluator does.
+    def __init__(self, error: Error):
+        super().__init__(error.message)
+        self.error = error
+
+
+def checked(result: Object) -> Object:
+    if type(result) is Error:
+        raise MonkeyError(result)
+    return result
+
+
+def apply_function(function: Object, arguments: List[Object]) -> Object:
+    # evaluator.apply_function for compiled bodies, memoized the same way
+    key = memoization.call_key(function, arguments)
+    if (result := memoization.lookup(key)) is not None:
+        return result
+
+    while True:
+        if type(function) is Builtin:
+            return checked(function.function(arguments))
+        if type(function) is not Function:
+            raise MonkeyError(Error(f"not a function: {function.type().value}"))
+        if len(arguments) != len(function.parameters):
+            raise MonkeyError(Error(f"wrong number of arguments: want={len(function.parameters)}, "
+                                    f"got={len(arguments)}"))
+
+        code = function.code
+        if code is None:
+            # made by another engine, say in a mixed REPL session
+            code = function.code = compile_function(function.parameters, function.body, function.slot_count)
+        result = code(function.env, arguments)
+        if type(result) is not TailCall:
+            memoization.store(key, result)
+            return result
+        function, arguments = result.function, result.arguments
+
+
+def has_return(node: Optional[Node]) -> bool:
+    # whether a ReturnValue can come out of node; functions catch their own
+    if isinstance(node, ReturnStatement):
+        return True
+    elif isinstance(node, (Program, BlockStatement)):
+        return any(has_return(stmt) for stmt in node.statements)
+    elif isinstance(node, ExpressionStatement):
+        return has_return(node.expression)
+    elif isinstance(node, IfExpression):
+        return has_return(node.consequence) or has_return(node.alternative)
+    return False
+
+
+def compile_function(parameters: list, body: BlockStatement, slot_count: int) -> Callable:
+    # the body as code(outer, arguments), run in a new frame
+    run_body = compile_block(body, tail=True)
+    unwrap = has_return(body)
+    slots = [p.slot for p in parameters]
+    count = len(slots)
+    in_order = slots == list(range(count))
+
+    def code(outer: Environment, arguments: List[Object]) -> Object:
+        env = Environment(slot_count, outer)
+        if in_order:
+            env.slots[:count] = arguments
+        else:
+            for slot, argument in zip(slots, arguments):
+                env.slots[slot] = argument
+        result = run_body(env)
+        if unwrap and type(result) is ReturnValue:
+            return result.value
+        return result
+
+    return code
+
+
+def compile_deferred(parameters: list, body: BlockStatement, slot_count: int) -> Callable:
+    # a body that is not parsed yet is parsed and compiled on its first call
+    compiled = None
+
+    def code(outer: Environment, arguments: List[Object]) -> Object:
+        nonlocal compiled
+        if compiled is None:
+            compiled = compile_function(parameters, body, slot_count)
+        return compiled(outer, arguments)
+
+    return code
+
+
+def compile_node(node: Optional[Node], tail: bool = False) -> Code:
+    # tail is true when node's value is what the enclosing function returns
+    if isinstance(node, ExpressionStatement):
+        return compile_node(node.expression, tail)
+    elif isinstance(node, IntegerLiteral):
+        return compile_constant(Integer(node.value))
+    elif isinstance(node, Boolean):
+        return compile_constant(TRUE if node.value else FALSE)
+    elif isinstance(node, Identifier):
+        return compile_identifier(node)
+    elif isinstance(node, PrefixExpression):
+        return compile_prefix_expression(node)
+    elif isinstance(node, InfixExpression):
+        return compile_infix_expression(node)
+    elif isinstance(node, BlockStatement):
+        return compile_block(node, tail)
+    elif isinstance(node, IfExpression):
+        return compile_if_expression(node, tail)
+    elif isinstance(node, LetStatement):
+        return compile_let_statement(node)
+    elif isinstance(node, ReturnStatement):
+        return compile_return_statement(node)
+    elif isinstance(node, FunctionLiteral):
+        return compile_function_literal(node)
+    elif isinstance(node, CallExpression):
+        return compile_call_expression(node, tail)
+    elif isinstance(node, ArrayLiteral):
+        return compile_array_literal(node)
+    elif isinstance(node, IndexExpression):
+        return compile_index_expression(node)
+    elif node is None:
+        return compile_constant(None)
+    raise CompileError(f"unsupported node: {type(node).__name__}")
+
+
+def compile_constant(value: Optional[Object]) -> Code:
+    def constant(env):
+        return value
+    return constant
+
+
+def unbound(name: str) -> Object:
+    value = builtins.get(name)
+    if value is None:
+        raise MonkeyError(Error(f"identifier not found: {name}"))
+    return value
+
+
+def compile_identifier(node: Identifier) -> Code:
+    name, depth, slot = node.value, node.depth, node.slot
+    if slot < 0:
+        # never resolved, so only a builtin can be meant
+        return compile_constant(builtins[name]) if name in builtins else compile_unbound(name)
+    elif depth == 0:
+        def local(env):
+            value = env.slots[slot]
+            return unbound(name) if value is None else value
+        return local
+    elif depth == 1:
+        def enclosing(env):
+            value = env.outer.slots[slot]
+            return unbound(name) if value is None else value
+        return enclosing
+
+    def outer(env):
+        value = env.get(depth, slot)
+        return unbound(name) if value is None else value
+    return outer
+
+
+def compile_unbound(name: str) -> Code:
+    def missing(env):
+        return unbound(name)
+    return missing
+
+
+def compile_prefix_expression(node: PrefixExpression) -> Code:
+    right = compile_node(node.right)
+    operator = node.operator
+    if operator == '!':
+        def bang(env):
+            value = right(env)
+            return TRUE if value is FALSE or value is NULL else FALSE
+        return bang
+    elif operator == '-':
+        def minus(env):
+            value = right(env)
+            if type(value) is Integer:
+                return Integer(-value.value)
+            return checked(evaluator.eval_prefix_expression('-', value))
+        return minus
+
+    def prefix(env):
+        return checked(evaluator.eval_prefix_expression(operator, right(env)))
+    return prefix
+
+
+def compile_infix_expression(node: InfixExpression) -> Code:
+    # Integer operands take the inline path; anything else, errors included,
+    # goes through the evaluator's operators. An integer literal on the
+    # right is unboxed once, here.
+    operator = node.operator
+    left = compile_node(node.left)
+    generic = evaluator.eval_infix_expression
+
+    if operator in arithmetic or operator in comparisons:
+        function = arithmetic.get(operator) or comparisons[operator]
+        boxed = operator in arithmetic
+
+        if isinstance(node.right, IntegerLiteral):
+            constant = Integer(node.right.value)
+            number = constant.value
+
+            def infix_constant(env):
+                value = left(env)
+                if type(value) is Integer:
+                    result = function(value.value, number)
+                    return Integer(result) if boxed else (TRUE if result else FALSE)
+                return checked(generic(operator, value, constant))
+            return infix_constant
+
+        right = compile_node(node.right)
+
+        def infix(env):
+            a = left(env)
+            b = right(env)
+            if type(a) is Integer and type(b) is Integer:
+                result = function(a.value, b.value)
+                return Integer(result) if boxed else (TRUE if result else FALSE)
+            return checked(generic(operator, a, b))
+        return infix
+
+    right = compile_node(node.right)
+    if operator == '/':
+        def divide(env):
+            a = left(env)
+            b = right(env)
+            if type(a) is Integer and type(b) is Integer and b.value:
+                return Integer(int_div(a.value, b.value))
+            return checked(generic(operator, a, b))
+        return divide
+
+    def other(env):
+        return checked(generic(operator, left(env), right(env)))
+    return other
+
+
+def compile_block(node: BlockStatement, tail: bool = False) -> Code:
+    # As evaluator.eval_block_statement: the value of the last statement,
+    # null if there is none, and a ReturnValue stops the block. Only
+    # statements that can return one are tested for it.
+    stmts = node.statements
+    if not stmts:
+        return compile_constant(NULL)
+    codes = [compile_node(stmt) for stmt in stmts[:-1]]
+    returning = [has_return(stmt) for stmt in stmts[:-1]]
+    last = compile_node(stmts[-1], tail)
+    if not codes:
+        if isinstance(stmts[-1], LetStatement):
+            def let_block(env):
+                last(env)
+                return NULL
+            return let_block
+
+        def single(env):
+            result = last(env)
+            return NULL if result is None else result
+        return single
+
+    if not any(returning):
+        def block(env):
+            for code in codes:
+                code(env)
+            result = last(env)
+            return NULL if result is None else result
+        return block
+
+    steps = list(zip(codes, returning))
+
+    def returning_block(env):
+        for code, may_return in steps:
+            result = code(env)
+            if may_return and type(result) is ReturnValue:
+                return result
+        result = last(env)
+        return NULL if result is None else result
+    return returning_block
+
+
+def compile_if_expression(node: IfExpression, tail: bool = False) -> Code:
+    condition = compile_node(node.condition)
+    consequence = compile_block(node.consequence, tail)
+    if node.alternative is None:
+        def if_then(env):
+            value = condition(env)
+            if value is not FALSE and value is not NULL:
+                return consequence(env)
+            return NULL
+        return if_then
+
+    alternative = compile_block(node.alternative, tail)
+
+    def if_else(env):
+        value = condition(env)
+        if value is not FALSE and value is not NULL:
+            return consequence(env)
+        return alternative(env)
+    return if_else
+
+
+def compile_let_statement(node: LetStatement) -> Code:
+    value = compile_node(node.value)
+    slot = node.name.slot
+
+    def let(env):
+        env.slots[slot] = value(env)
+    return let
+
+
+def compile_return_statement(node: ReturnStatement) -> Code:
+    # a returned call is always a tail call
+    value = compile_node(node.return_value, tail=True)
+
+    def return_statement(env):
+        return ReturnValue(value(env))
+    return return_statement
+
+
+def compile_function_literal(node: FunctionLiteral) -> Code:
+    parameters, body, slot_count, free_variables = node.parameters, node.body, node.slot_count, node.free_variables
+    if isinstance(body, LazyBlockStatement) and not body.parsed:
+        code = compile_deferred(parameters, body, slot_count)
+    else:
+        code = compile_function(parameters, body, slot_count)
+
+    def function(env):
+        return Function(parameters, body, slot_count, env, free_variables, code)
+    return function
+
+
+def compile_call_expression(node: CallExpression, tail: bool = False) -> Code:
+    function = compile_node(node.function)
+    arguments = [compile_node(argument) for argument in node.arguments or ()]
+    make = TailCall if tail else apply_function
+
+    if len(arguments) == 1:
+        argument = arguments[0]
+
+        def call_one(env):
+            callee = function(env)
+            return make(callee, [argument(env)])
+        return call_one
+    elif len(arguments) == 2:
+        first, second = arguments
+
+        def call_two(env):
+            callee = function(env)
+            a = first(env)
+            return make(callee, [a, second(env)])
+        return call_two
+
+    def call(env):
+        callee = function(env)
+        return make(callee, [argument(env) for argument in arguments])
+    return call
+
+
+def compile_array_literal(node: ArrayLiteral) -> Code:
+    elements = [compile_node(element) for element in node.elements or ()]
+
+    def array(env):
+        return Array.from_objects([element(env) for element in elements])
+    return array
+
+
+def compile_index_expression(node: IndexExpression) -> Code:
+    left = compile_node(node.left)
+    index = compile_node(node.index)
+
+    def index_expression(env):
+        value = left(env)
+        return checked(evaluator.eval_index_expression(value, index(env)))
+    return index_expression
+
+
+def compile_program(program: Program) -> Code:
+    # As evaluator.eval_program: a top-level return ends the program, and a
+    # call it returns is run here.
+    codes = [compile_node(stmt) for stmt in program.statements]
+    returning = [has_return(stmt) for stmt in program.statements]
+    steps = list(zip(codes, returning))
+
+    def run_program(env):
+        result = None
+        try:
+            for code, may_return in steps:
+                result = code(env)
+                if may_return and type(result) is ReturnValue:
+                    result = result.value
+                    if type(result) is TailCall:
+                        return apply_function(result.function, result.arguments)
+                    return result
+        except MonkeyError as e:
+            return e.error
+        return result
+    return run_program
+
+
+class Session(evaluator.Session):
+    def evaluate(self, program: Program) -> Optional[Object]:
+        return compile_program(program)(self.env)
+
+
+# compiled programs with the number of globals they use, for run()
+code_cache = CodeCache()
+
+
+def run(program: Program) -> Optional[Object]:
+    # A cached program is not resolved again: its closures already hold the
+    # slots it was compiled with.
+    entry = code_cache.get(program)
+    if entry is None:
+        resolver = Resolver()
+        resolver.resolve_program(program)
+        entry = (compile_program(program), len(resolver.globals))
+        code_cache.put(program, entry)
+    code, global_count = entry
+    return code(Environment(global_count))
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Tuple
+from bytecode import Opcode, Bytecode, make
+from object import Object, Integer
+from ast_type import (Node,
+                      Program,
+                      ExpressionStatement,
+                      BlockStatement,
+                      IntegerLiteral,
+                      Boolean,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression)
+
+
+class CompileError(Exception):
+    pass
+
+
+infix_opcodes = {
+    '+': Opcode.ADD,
+    '-': Opcode.SUB,
+    '*': Opcode.MUL,
+    '/': Opcode.DIV,
+    '==': Opcode.EQUAL,
+    '!=': Opcode.NOT_EQUAL,
+    '>': Opcode.GREATER_THAN,
+    '<': Opcode.LESS_THAN,
+}
+
+prefix_opcodes = {
+    '-': Opcode.MINUS,
+    '!': Opcode.BANG,
+}
+
+
+class Compiler:
+    def __init__(self):
+        self.instructions: List[int] = []
+        self.constants: List[Object] = []
+        self.integer_constants: Dict[int, int] = {}
+        self.last_instruction: Optional[Tuple[Opcode, int]] = None
+
+    def bytecode(self) -> Bytecode:
+        return Bytecode(instructions=self.instructions, constants=self.constants)
+
+    def compile(self, node: Node):
+        if isinstance(node, Program):
+            for stmt in node.statements:
+                self.compile(stmt)
+        elif isinstance(node, ExpressionStatement):
+            self.compile(node.expression)
+            self.emit(Opcode.POP)
+        elif isinstance(node, BlockStatement):
+            for stmt in node.statements:
+                self.compile(stmt)
+        elif isinstance(node, IntegerLiteral):
+            self.emit(Opcode.CONSTANT, self.add_integer_constant(node.value))
+        elif isinstance(node, Boolean):
+            self.emit(Opcode.TRUE if node.value else Opcode.FALSE)
+        elif isinstance(node, PrefixExpression):
+            self.compile(node.right)
+            self.emit(self.lookup_operator(prefix_opcodes, node.operator))
+        elif isinstance(node, InfixExpression):
+            self.compile(node.left)
+            self.compile(node.right)
+            self.emit(self.lookup_operator(infix_opcodes, node.operator))
+        elif isinstance(node, IfExpression):
+            self.compile_if_expression(node)
+        else:
+            raise CompileError(f"unsupported node: {type(node).__name__}")
+
+    def compile_if_expression(self, node: IfExpression):
+        self.compile(node.condition)
+        jump_not_truthy_pos = self.emit(Opcode.JUMP_NOT_TRUTHY, -1)
+
+        self.compile_block_value(node.consequence)
+        jump_pos = self.emit(Opcode.JUMP, -1)
+        self.change_operand(jump_not_truthy_pos, len(self.instructions))
+
+        if node.alternative is None:
+            self.emit(Opcode.NULL)
+        else:
+            self.compile_block_value(node.alternative)
+        self.change_operand(jump_pos, len(self.instructions))
+
+    def compile_block_value(self, block: BlockStatement):
+        # a block used as a value leaves its last expression on the stack
+        self.compile(block)
+        if self.last_instruction_is(Opcode.POP):
+            self.remove_last_pop()
+        else:
+            self.emit(Opcode.NULL)
+
+    def lookup_operator(self, opcodes: Dict[str, Opcode], operator: str) -> Opcode:
+        if (op := opcodes.get(operator)) is None:
+            raise CompileError(f"unknown operator: {operator}")
+        return op
+
+    def add_integer_constant(self, value: int) -> int:
+        if (index := self.integer_constants.get(value)) is None:
+            index = len(self.constants)
+            self.constants.append(Integer(value))
+            self.integer_constants[value] = index
+        return index
+
+    def emit(self, op: Opcode, *operands: int) -> int:
+        pos = len(self.instructions)
+        self.instructions.extend(make(op, *operands))
+        self.last_instruction = (op, pos)
+        return pos
+
+    def last_instruction_is(self, op: Opcode) -> bool:
+        return self.last_instruction is not None and self.last_instruction[0] == op
+
+    def remove_last_pop(self):
+        _, pos = self.last_instruction
+        del self.instructions[pos:]
+        self.last_instruction = None
+
+    def change_operand(self, pos: int, operand: int):
+        self.instructions[pos + 1] = operand
+
+
+def compile_program(program: Program) -> Bytecode:
+    compiler = Compiler()
+    compiler.compile(program)
+    return compiler.bytecode()
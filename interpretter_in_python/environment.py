@@ -0,0 +1,28 @@
+from typing import List, Optional
+from object import Object
+
+
+class Environment:
+    # One frame of variables, addressed by the (depth, slot) pairs the
+    # resolver assigns: depth counts frames outwards, slot indexes the
+    # frame's array. Unset slots hold None.
+    __slots__ = ('slots', 'outer')
+
+    def __init__(self, size: int = 0, outer: Optional['Environment'] = None):
+        self.slots: List[Optional[Object]] = [None] * size
+        self.outer = outer
+
+    def get(self, depth: int, slot: int) -> Optional[Object]:
+        env = self
+        while depth:
+            env = env.outer
+            depth -= 1
+        return env.slots[slot]
+
+    def set(self, slot: int, value: Object):
+        self.slots[slot] = value
+
+    def grow(self, size: int):
+        # the global frame gains slots as later REPL lines declare names
+        if size > len(self.slots):
+            self.slots.extend([None] * (size - len(self.slots)))
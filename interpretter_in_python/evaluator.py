@@ -1,26 +1,366 @@
-from typing import Optional, List
-from object import Object, Integer, Boolean
+import operator as operators
+from itertools import repeat
+from typing import Optional, List, Sequence, Union
+from object import (Object,
+                    Integer,
+                    Boolean,
+                    Error,
+                    ReturnValue,
+                    Function,
+                    Array,
+                    Builtin,
+                    TRUE,
+                    FALSE,
+                    NULL,
+                    int_div)
+from environment import Environment
+from resolver import Resolver
+from monkey_builtins import builtins
+import memoization
+import inline_cache
+from inline_cache import GENERIC
 from ast_type import (Node,
                       IntegerLiteral,
                       Boolean as BooleanLiteral,
                       Program,
                       Statement,
-                      ExpressionStatement)
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      Identifier,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
 
+array_operators = {
+    '+': operators.add,
+    '-': operators.sub,
+    '*': operators.mul,
+    '/': int_div,
+    '<': operators.lt,
+    '>': operators.gt,
+    '==': operators.eq,
+    '!=': operators.ne,
+}
 
-def eval(node: Node) -> Optional[Object]:
+
+class TailCall:
+    # What a call in tail position evaluates to: apply_function runs it in
+    # its loop instead of growing the Python stack. It only ever travels up
+    # to the enclosing apply_function (or program), never into an operator.
+    __slots__ = ('function', 'arguments')
+
+    def __init__(self, function: Object, arguments: List[Object]):
+        self.function = function
+        self.arguments = arguments
+
+
+def eval(node: Node, env: Environment, tail: bool = False) -> Optional[Object]:
+    # tail is true when node's value is what the enclosing function returns
     if isinstance(node, Program):
-        return eval_statements(node.statements)
+        return eval_program(node.statements, env)
     elif isinstance(node, ExpressionStatement):
-        return eval(node.expression)
+        return eval(node.expression, env, tail)
     elif isinstance(node, IntegerLiteral):
         return Integer(node.value)
     elif isinstance(node, BooleanLiteral):
-        return Boolean(node.value)
+        return TRUE if node.value else FALSE
+    elif isinstance(node, PrefixExpression):
+        right = eval(node.right, env)
+        if is_error(right):
+            return right
+        return eval_prefix_expression(node.operator, right)
+    elif isinstance(node, InfixExpression):
+        left = eval(node.left, env)
+        if is_error(left):
+            return left
+        right = eval(node.right, env)
+        if is_error(right):
+            return right
+        cache = node.cache
+        if cache is GENERIC:
+            return eval_infix_expression(node.operator, left, right)
+        if cache is None or type(left) is not cache.left_type or type(right) is not cache.right_type:
+            node.cache = cache = inline_cache.specialize_infix(node.operator, left, right, cache)
+            if cache is GENERIC:
+                return eval_infix_expression(node.operator, left, right)
+        return cache.handler(left, right)
+    elif isinstance(node, BlockStatement):
+        return eval_block_statement(node.statements, env, tail)
+    elif isinstance(node, IfExpression):
+        return eval_if_expression(node, env, tail)
+    elif isinstance(node, LetStatement):
+        value = eval(node.value, env)
+        if is_error(value):
+            return value
+        env.set(node.name.slot, value)
+    elif isinstance(node, ReturnStatement):
+        # a returned call is always a tail call
+        value = eval(node.return_value, env, True)
+        if is_error(value):
+            return value
+        return ReturnValue(value)
+    elif isinstance(node, Identifier):
+        return eval_identifier(node, env)
+    elif isinstance(node, FunctionLiteral):
+        return Function(node.parameters, node.body, node.slot_count, env, node.free_variables)
+    elif isinstance(node, CallExpression):
+        function = None
+        cache = node.cache
+        if cache is not None and cache is not GENERIC:
+            callee = node.function
+            function = env.get(callee.depth, callee.slot)
+            if function is None:
+                function = cache.builtin
+            elif function is not cache.builtin and (type(function) is not Function
+                                                    or function.body is not cache.body):
+                function = None
+        if function is None:
+            function = eval(node.function, env)
+            if is_error(function):
+                return function
+            if cache is not GENERIC:
+                node.cache = inline_cache.specialize_call(node.function, function, cache)
+        arguments = eval_expressions(node.arguments, env)
+        if len(arguments) == 1 and is_error(arguments[0]):
+            return arguments[0]
+        if tail:
+            return TailCall(function, arguments)
+        return apply_function(function, arguments)
+    elif isinstance(node, ArrayLiteral):
+        elements = eval_expressions(node.elements, env)
+        if len(elements) == 1 and is_error(elements[0]):
+            return elements[0]
+        return Array.from_objects(elements)
+    elif isinstance(node, IndexExpression):
+        left = eval(node.left, env)
+        if is_error(left):
+            return left
+        index = eval(node.index, env)
+        if is_error(index):
+            return index
+        return eval_index_expression(left, index)
     return None
 
 
-def eval_statements(stmts: List[Statement]):
+def eval_program(stmts: List[Statement], env: Environment):
+    result = None
     for stmt in stmts:
-        result = eval(stmt)
+        result = eval(stmt, env)
+        if type(result) is ReturnValue:
+            result = result.value
+            if type(result) is TailCall:
+                return apply_function(result.function, result.arguments)
+            return result
+        elif is_error(result):
+            return result
     return result
+
+
+def eval_block_statement(stmts: List[Statement], env: Environment, tail: bool = False):
+    # only the last statement of a block can be in tail position
+    result = None
+    for stmt in stmts[:-1]:
+        result = eval(stmt, env)
+        if type(result) is ReturnValue or is_error(result):
+            return result
+    if stmts:
+        result = eval(stmts[-1], env, tail)
+    return NULL if result is None else result
+
+
+def eval_expressions(exprs: List[Node], env: Environment) -> List[Object]:
+    # on error, returns a list holding just that error
+    results = []
+    for expr in exprs or ():
+        evaluated = eval(expr, env)
+        if is_error(evaluated):
+            return [evaluated]
+        results.append(evaluated)
+    return results
+
+
+def apply_function(function: Object, arguments: List[Object]) -> Object:
+    # Tail calls in the body come back as TailCall and are run by the next
+    # iteration, so a chain of them uses one Python frame however long it is.
+    # Only the call that entered here is memoized; the chain's result is its
+    # result.
+    key = memoization.call_key(function, arguments)
+    if (result := memoization.lookup(key)) is not None:
+        return result
+
+    while True:
+        if type(function) is Builtin:
+            return function.function(arguments)
+        if type(function) is not Function:
+            return Error(f"not a function: {function.type().value}")
+        if len(arguments) != len(function.parameters):
+            return Error(f"wrong number of arguments: want={len(function.parameters)}, "
+                         f"got={len(arguments)}")
+
+        result = call_body(function, arguments)
+        if type(result) is not TailCall:
+            memoization.store(key, result)
+            return result
+        function, arguments = result.function, result.arguments
+
+
+def call_body(function: Function, arguments: List[Object]) -> Object:
+    # Runs the body of one call in a new frame. tiering swaps in a version
+    # that runs the bodies of hot functions compiled.
+    env = Environment(function.slot_count, function.env)
+    for parameter, argument in zip(function.parameters, arguments):
+        env.slots[parameter.slot] = argument
+
+    result = eval(function.body, env, True)
+    if type(result) is ReturnValue:
+        return result.value
+    return result
+
+
+def eval_prefix_expression(operator: str, right: Object) -> Object:
+    if operator == '!':
+        return TRUE if right is FALSE or right is NULL else FALSE
+    elif operator == '-':
+        if type(right) is Array and (values := right.ints()) is not None:
+            return Array.from_ints(map(operators.neg, values))
+        if type(right) is not Integer:
+            return Error(f"unknown operator: -{right.type().value}")
+        return Integer(-right.value)
+    return Error(f"unknown operator: {operator}{right.type().value}")
+
+
+def eval_infix_expression(operator: str, left: Object, right: Object) -> Object:
+    if type(left) is Integer and type(right) is Integer:
+        return eval_integer_infix_expression(operator, left, right)
+    elif type(left) is Array or type(right) is Array:
+        return eval_array_infix_expression(operator, left, right)
+    elif operator == '==':
+        # booleans and null are singletons, so equality is identity
+        return TRUE if left is right else FALSE
+    elif operator == '!=':
+        return FALSE if left is right else TRUE
+    elif left.type() != right.type():
+        return Error(f"type mismatch: {left.type().value} {operator} {right.type().value}")
+    return Error(f"unknown operator: {left.type().value} {operator} {right.type().value}")
+
+
+def eval_integer_infix_expression(operator: str, left: Integer, right: Integer) -> Object:
+    if operator == '+':
+        return Integer(left.value + right.value)
+    elif operator == '-':
+        return Integer(left.value - right.value)
+    elif operator == '*':
+        return Integer(left.value * right.value)
+    elif operator == '/':
+        if right.value == 0:
+            return Error("division by zero")
+        return Integer(int_div(left.value, right.value))
+    elif operator == '<':
+        return TRUE if left.value < right.value else FALSE
+    elif operator == '>':
+        return TRUE if left.value > right.value else FALSE
+    elif operator == '==':
+        # cached small integers compare by identity first
+        return TRUE if left is right or left.value == right.value else FALSE
+    elif operator == '!=':
+        return FALSE if left is right or left.value == right.value else TRUE
+    return Error(f"unknown operator: INTEGER {operator} INTEGER")
+
+
+def array_operand(obj: Object) -> Union[Sequence[int], int, None]:
+    if type(obj) is Integer:
+        return obj.value
+    elif type(obj) is Array:
+        return obj.ints()
+    return None
+
+
+def eval_array_infix_expression(operator: str, left: Object, right: Object) -> Object:
+    # One pass over all the elements at the Python level, pairing up arrays
+    # of the same length or broadcasting an integer over an array.
+    # Comparisons give an array of booleans.
+    function = array_operators.get(operator)
+    lefts = array_operand(left)
+    rights = array_operand(right)
+    if function is None or lefts is None or rights is None:
+        if left.type() != right.type():
+            return Error(f"type mismatch: {left.type().value} {operator} {right.type().value}")
+        return Error(f"unknown operator: {left.type().value} {operator} {right.type().value}")
+
+    if operator == '/' and (rights == 0 if type(rights) is int else 0 in rights):
+        return Error("division by zero")
+    if type(lefts) is int:
+        lefts = repeat(lefts, len(rights))
+    elif type(rights) is int:
+        rights = repeat(rights, len(lefts))
+    elif len(lefts) != len(rights):
+        return Error(f"array length mismatch: {len(lefts)} {operator} {len(rights)}")
+
+    results = map(function, lefts, rights)
+    if operator in ('<', '>', '==', '!='):
+        return Array(list(map(Boolean, results)))
+    return Array.from_ints(results)
+
+
+def eval_index_expression(left: Object, index: Object) -> Object:
+    if type(left) is Array and type(index) is Integer:
+        if 0 <= index.value < len(left):
+            return left[index.value]
+        return NULL
+    return Error(f"index operator not supported: {left.type().value}")
+
+
+def eval_if_expression(node: IfExpression, env: Environment, tail: bool = False) -> Optional[Object]:
+    condition = eval(node.condition, env)
+    if is_error(condition):
+        return condition
+
+    if is_truthy(condition):
+        return eval(node.consequence, env, tail)
+    elif node.alternative is not None:
+        return eval(node.alternative, env, tail)
+    return NULL
+
+
+def eval_identifier(node: Identifier, env: Environment) -> Object:
+    # slot < 0 means the program was never resolved
+    value = env.get(node.depth, node.slot) if node.slot >= 0 else None
+    if value is None:
+        value = builtins.get(node.value)
+        if value is None:
+            return Error(f"identifier not found: {node.value}")
+    return value
+
+
+def is_truthy(obj: Object) -> bool:
+    return obj is not FALSE and obj is not NULL
+
+
+def is_error(obj: Optional[Object]) -> bool:
+    return type(obj) is Error
+
+
+class Session:
+    # A global frame together with the resolver scope that describes it, so
+    # bindings made by one REPL line are visible to the next.
+    def __init__(self):
+        self.resolver = Resolver()
+        self.env = Environment()
+
+    def run(self, program: Program) -> Optional[Object]:
+        self.resolver.resolve_program(program)
+        self.env.grow(len(self.resolver.globals))
+        return self.evaluate(program)
+
+    def evaluate(self, program: Program) -> Optional[Object]:
+        return eval(program, self.env)
+
+
+def run(program: Program) -> Optional[Object]:
+    return Session().run(program)
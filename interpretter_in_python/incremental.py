@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+from token_type import Token, TokenType
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_type import Program, Statement
+
+# Re-lexing and re-parsing after an edit, for editors that parse the buffer
+# on every keystroke. Only the tokens around the edit are lexed again and
+# only the top-level statements that read them are parsed again; the result
+# is always what a full parse of the new text gives.
+
+
+@dataclass
+class TextEdit:
+    # replaces removed characters at offset with inserted
+    offset: int
+    removed: int
+    inserted: str
+
+    def apply(self, source: str) -> str:
+        return source[:self.offset] + self.inserted + source[self.offset + self.removed:]
+
+
+@dataclass
+class Step:
+    # One round of Parser.parse_program: the statement parsed from the token
+    # at index (None when it failed) and the errors it reported.
+    index: int
+    statement: Optional[Statement]
+    errors: List[str]
+
+
+@dataclass
+class ParsedSource:
+    # The tokens and tree of a source, shared with the ParsedSource reparse
+    # makes from it: an edit moves them in place, so after reparse only the
+    # new one is valid.
+    source: str
+    tokens: List[Token]
+    program: Program
+    errors: List[str]
+    steps: List[Step]
+
+
+class TokenList:
+    # lexer interface over a token list from a given index, remembering how
+    # far the parser has read
+    def __init__(self, tokens: List[Token], position: int):
+        self.tokens = tokens
+        self.position = position
+
+    def tokenize(self) -> Iterator[Token]:
+        while self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            self.position += 1
+            yield token
+
+    def current(self) -> int:
+        # index of the parser's cur_token, which is two tokens behind
+        return self.position - 2
+
+
+def parse_steps(tokens: List[Token], index: int, stop=None) -> Iterator[Step]:
+    # Parses from tokens[index] as parse_program does. stop(index, token) is
+    # asked before each statement whether to end there.
+    stream = TokenList(tokens, index)
+    parser = Parser(stream)
+    while not parser.cur_token_is(TokenType.EOF):
+        index = stream.current()
+        if stop is not None and stop(index, parser.cur_token):
+            return
+        errors = len(parser.errors)
+        statement = parser.parse_statement()
+        yield Step(index, statement, parser.errors[errors:])
+        parser.next_token()
+
+
+def parsed(source: str, tokens: List[Token], steps: List[Step]) -> ParsedSource:
+    program = Program(statements=[step.statement for step in steps if step.statement])
+    errors = [error for step in steps for error in step.errors]
+    return ParsedSource(source, tokens, program, errors, steps)
+
+
+def parse_source(source: str) -> ParsedSource:
+    tokens = list(Lexer(source).tokenize())
+    return parsed(source, tokens, list(parse_steps(tokens, 0)))
+
+
+def first_token_ending_at(tokens: List[Token], offset: int) -> int:
+    # tokens are sorted and the last one, EOF, ends the source
+    low, high = 0, len(tokens) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if tokens[middle].start + tokens[middle].length >= offset:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def relex(old: ParsedSource, edit: TextEdit, source: str) -> Tuple[int, List[Token], int]:
+    # Lexes the new source from the end of the last token before the edit
+    # until it produces an old token after the edit again, moved by the
+    # edit. Returns the index of the first old token that changed, the new
+    # tokens, and the index of the first old token kept after them.
+    tokens = old.tokens
+    first = first_token_ending_at(tokens, edit.offset)
+    position = 0 if first == 0 else tokens[first - 1].start + tokens[first - 1].length
+    shift = len(edit.inserted) - edit.removed
+    edit_end = edit.offset + len(edit.inserted)
+
+    lexed = []
+    kept = first
+    for token in Lexer.scan(source, position):
+        if token.start >= edit_end:
+            start = token.start - shift
+            while kept < len(tokens) - 1 and tokens[kept].start < start:
+                kept += 1
+            candidate = tokens[kept]
+            if (candidate.start == start and candidate.type == token.type
+                    and candidate.length == token.length and candidate.type != TokenType.EOF):
+                return first, lexed, kept
+        lexed.append(token)
+    lexed.append(Token(TokenType.EOF, source, len(source), 0))
+    return first, lexed, len(tokens)
+
+
+def reparse(old: ParsedSource, edit: TextEdit) -> ParsedSource:
+    if not 0 <= edit.offset <= edit.offset + edit.removed <= len(old.source):
+        raise ValueError(f"edit out of range: {edit}")
+    source = edit.apply(old.source)
+    shift = len(edit.inserted) - edit.removed
+    first, lexed, kept = relex(old, edit, source)
+
+    # the tokens that did not change now point into the new source
+    for token in old.tokens[:first]:
+        token.source = source
+    for token in old.tokens[kept:]:
+        token.source = source
+        token.start += shift
+    tokens = old.tokens[:first] + lexed + old.tokens[kept:]
+    moved = first + len(lexed) - kept
+
+    # A statement reads its tokens and the one after them, the first token
+    # of the next statement. Statements up to one that reads a changed token
+    # are kept; parsing restarts there and stops at an old statement start
+    # past the edit.
+    steps = old.steps
+    restart = 0
+    while restart + 1 < len(steps) and steps[restart + 1].index < first:
+        restart += 1
+    index = steps[restart].index if steps else 0
+
+    starts = {id(old.tokens[step.index]): n for n, step in enumerate(steps[restart:], restart)
+              if step.index >= kept}
+    resumed = []
+
+    def stop(index: int, token: Token) -> bool:
+        if index >= first + len(lexed) and id(token) in starts:
+            resumed.append(starts[id(token)])
+            return True
+        return False
+
+    new_steps = steps[:restart] + list(parse_steps(tokens, index, stop))
+    for step in steps[resumed[0]:] if resumed else ():
+        step.index += moved
+        if step.errors:
+            # the same statement again, for errors that give its new position
+            step = next(parse_steps(tokens, step.index))
+        new_steps.append(step)
+    return parsed(source, tokens, new_steps)
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from object import Object, Integer, Boolean, Error, Function, Builtin, TRUE, FALSE, int_div
+from monkey_builtins import builtins
+from ast_type import Node, Identifier
+
+# Per-node caches for evaluator.eval. An InfixExpression or CallExpression
+# starts with no cache; its first evaluation records what it saw and a fast
+# path for exactly that, and a later evaluation that sees something else
+# deoptimizes the node to GENERIC, the plain path, for good.
+
+
+class Generic:
+    # the cache of a node that saw more than one kind of operand or callee
+    def __repr__(self) -> str:
+        return 'GENERIC'
+
+
+GENERIC = Generic()
+
+
+def int_add(left: Integer, right: Integer) -> Object:
+    return Integer(left.value + right.value)
+
+
+def int_sub(left: Integer, right: Integer) -> Object:
+    return Integer(left.value - right.value)
+
+
+def int_mul(left: Integer, right: Integer) -> Object:
+    return Integer(left.value * right.value)
+
+
+def int_divide(left: Integer, right: Integer) -> Object:
+    if right.value == 0:
+        return Error("division by zero")
+    return Integer(int_div(left.value, right.value))
+
+
+def int_lt(left: Integer, right: Integer) -> Object:
+    return TRUE if left.value < right.value else FALSE
+
+
+def int_gt(left: Integer, right: Integer) -> Object:
+    return TRUE if left.value > right.value else FALSE
+
+
+def int_eq(left: Integer, right: Integer) -> Object:
+    return TRUE if left.value == right.value else FALSE
+
+
+def int_ne(left: Integer, right: Integer) -> Object:
+    return FALSE if left.value == right.value else TRUE
+
+
+def same(left: Object, right: Object) -> Object:
+    # booleans are singletons
+    return TRUE if left is right else FALSE
+
+
+def different(left: Object, right: Object) -> Object:
+    return FALSE if left is right else TRUE
+
+
+infix_handlers: Dict[Tuple[str, type, type], Callable[[Object, Object], Object]] = {
+    ('+', Integer, Integer): int_add,
+    ('-', Integer, Integer): int_sub,
+    ('*', Integer, Integer): int_mul,
+    ('/', Integer, Integer): int_divide,
+    ('<', Integer, Integer): int_lt,
+    ('>', Integer, Integer): int_gt,
+    ('==', Integer, Integer): int_eq,
+    ('!=', Integer, Integer): int_ne,
+    ('==', Boolean, Boolean): same,
+    ('!=', Boolean, Boolean): different,
+}
+
+
+class OperatorCache:
+    # the operand types an infix node saw and its operator for those types
+    __slots__ = ('left_type', 'right_type', 'handler')
+
+    def __init__(self, left_type: type, right_type: type, handler: Callable[[Object, Object], Object]):
+        self.left_type = left_type
+        self.right_type = right_type
+        self.handler = handler
+
+    def __repr__(self) -> str:
+        return f"OperatorCache({self.left_type.__name__}, {self.right_type.__name__}, {self.handler.__name__})"
+
+
+class CallCache:
+    # The callee a call site saw, read straight from the slot of the
+    # identifier naming it instead of evaluating that identifier. body is
+    # the body of the function literal every callee must come from; builtin
+    # is the builtin the name stands for when its slot is empty.
+    __slots__ = ('body', 'builtin')
+
+    def __init__(self, body: Optional[Node] = None, builtin: Optional[Builtin] = None):
+        self.body = body
+        self.builtin = builtin
+
+    def __repr__(self) -> str:
+        if self.builtin is not None:
+            return f"CallCache(builtin {self.builtin.name})"
+        return "CallCache(function)"
+
+
+@dataclass
+class CacheStats:
+    specializations: int = 0
+    deoptimizations: int = 0
+
+    def reset(self):
+        self.specializations = 0
+        self.deoptimizations = 0
+
+
+stats = CacheStats()
+
+
+def deoptimize(cache) -> Generic:
+    if cache is not None:
+        stats.deoptimizations += 1
+    return GENERIC
+
+
+def specialize_infix(operator: str, left: Object, right: Object, cache):
+    # the new cache of a node whose cache missed; only a node seeing its
+    # first operands is specialized
+    handler = infix_handlers.get((operator, type(left), type(right)))
+    if cache is not None or handler is None:
+        return deoptimize(cache)
+    stats.specializations += 1
+    return OperatorCache(type(left), type(right), handler)
+
+
+def specialize_call(callee: Node, function: Object, cache):
+    if cache is not None or not isinstance(callee, Identifier) or callee.slot < 0:
+        return deoptimize(cache)
+    if type(function) is Function:
+        stats.specializations += 1
+        return CallCache(body=function.body)
+    elif type(function) is Builtin and builtins.get(callee.value) is function:
+        stats.specializations += 1
+        return CallCache(builtin=function)
+    return deoptimize(cache)
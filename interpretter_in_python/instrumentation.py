@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import evaluator
+from ast_type import Node, InfixExpression
+
+original_eval = evaluator.eval
+
+
+@dataclass
+class NodeStats:
+    count: int = 0
+    # total_time includes nested evaluations, so recursive node types can add
+    # up to more than the wall time; self_time excludes them.
+    total_time: float = 0.0
+    self_time: float = 0.0
+
+
+class EvalStats:
+    def __init__(self):
+        self.nodes: Dict[str, NodeStats] = {}
+
+    def reset(self):
+        self.nodes.clear()
+
+    def __getitem__(self, key: str) -> NodeStats:
+        return self.nodes[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.nodes
+
+    def report(self) -> str:
+        if not self.nodes:
+            return "no evaluations recorded"
+        lines = [f"{'node':<28} {'count':>10} {'total ms':>12} {'self ms':>12}"]
+        for key, entry in sorted(self.nodes.items(), key=lambda item: -item[1].self_time):
+            lines.append(f"{key:<28} {entry.count:>10} "
+                         f"{entry.total_time * 1000:>12.3f} {entry.self_time * 1000:>12.3f}")
+        return "\n".join(lines)
+
+
+stats = EvalStats()
+
+
+def node_key(node: Node) -> str:
+    # arena views report under the name of the ast_type class they stand for
+    name = type(node).__name__
+    if name.endswith('View'):
+        name = name[:-len('View')]
+    if isinstance(node, InfixExpression):
+        return f"{name} {node.operator}"
+    return name
+
+
+def make_instrumented_eval(target: EvalStats, inner: Callable) -> Callable:
+    nodes = target.nodes
+    perf_counter = time.perf_counter
+    # time spent in nested evaluations of the node currently being timed
+    nested = [0.0]
+
+    def eval(node, env, tail=False):
+        key = node_key(node)
+        entry = nodes.get(key)
+        if entry is None:
+            entry = nodes[key] = NodeStats()
+
+        outer = nested[0]
+        nested[0] = 0.0
+        start = perf_counter()
+        try:
+            return inner(node, env, tail)
+        finally:
+            elapsed = perf_counter() - start
+            entry.count += 1
+            entry.total_time += elapsed
+            entry.self_time += elapsed - nested[0]
+            nested[0] = outer + elapsed
+
+    return eval
+
+
+def is_enabled() -> bool:
+    return evaluator.eval is not original_eval
+
+
+def enable(target: Optional[EvalStats] = None) -> EvalStats:
+    # The evaluator recurses through its module-level eval, so swapping that
+    # name routes every node through the counters; disable() puts the plain
+    # function back and leaves no overhead behind.
+    target = stats if target is None else target
+    evaluator.eval = make_instrumented_eval(target, original_eval)
+    return target
+
+
+def disable():
+    evaluator.eval = original_eval
+
+
+@contextmanager
+def instrumented(target: Optional[EvalStats] = None):
+    previous = evaluator.eval
+    try:
+        yield enable(target)
+    finally:
+        evaluator.eval = previous
@@ -1,14 +1,135 @@
-from token_type import TokenType, Token
+import re
+import mmap
+import codecs
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional, Set
+from token_type import TokenType, Token, SymbolToken
+import symbols
+
+WINDOW_SIZE = 1 << 16
+
+keywords = {
+    'fn' : TokenType.FUNCTION,
+    'let' : TokenType.LET,
+    'true' : TokenType.TRUE,
+    'false' : TokenType.FALSE,
+    'if' : TokenType.IF,
+    'else' : TokenType.ELSE,
+    'return' : TokenType.RETURN,
+}
+
+char_to_toke_type = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.ASTERISK,
+    '/': TokenType.SLASH,
+    '<': TokenType.LT,
+    '>': TokenType.GT,
+    ';': TokenType.SEMICLOLON,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    ',': TokenType.COMMA,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    '[': TokenType.LBRACKET,
+    ']': TokenType.RBRACKET,
+}
+
+operator_to_token_type = {
+    **char_to_toke_type,
+    '=': TokenType.ASSIGN,
+    '!': TokenType.BANG,
+    '==': TokenType.EQ,
+    '!=': TokenType.NOT_EQ,
+}
+
+# One alternation per token class, tried in order at every position.
+# Numbers are str.isdecimal runs, as in next_token. Identifiers are
+# str.isalpha runs, which re cannot say: [^\W\d_] also takes numeric
+# characters that are not letters, such as ² or ½, and scan splits those off.
+token_pattern = re.compile(r"""
+    (?P<WS>[ \t\n\r]+)
+  | (?P<IDENT>[^\W\d_]+)
+  | (?P<INT>\d+)
+  | (?P<OP>==|!=|[-+*/<>;(),{}\[\]=!])
+  | (?P<ILLEGAL>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+class SourceWindow(str):
+    # A run of whole lines cut out of a streamed source. Tokens never contain
+    # a newline, so none can straddle two windows.
+    first_line = 1
+
+
+def line_windows(chunks: Iterable[str], size: int = WINDOW_SIZE) -> Iterator[SourceWindow]:
+    pending = ''
+    line = 1
+    for chunk in chunks:
+        pending += chunk
+        if len(pending) < size:
+            continue
+        cut = pending.rfind('\n') + 1
+        if not cut:
+            continue
+        window = SourceWindow(pending[:cut])
+        window.first_line = line
+        line += window.count('\n')
+        pending = pending[cut:]
+        yield window
+
+    if pending:
+        window = SourceWindow(pending)
+        window.first_line = line
+        yield window
+
+
+def file_chunks(path: str, size: int = WINDOW_SIZE) -> Iterator[str]:
+    with open(path, encoding='utf-8') as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+def mmap_chunks(buffer: mmap.mmap, size: int = WINDOW_SIZE) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for offset in range(0, len(buffer), size):
+        yield decoder.decode(buffer[offset: offset + size])
+    yield decoder.decode(b'', final=True)
+
 
 class Lexer:
-    def __init__(self, input_str: str):
+    def __init__(self, input_str: str, windows: Optional[Iterator[SourceWindow]] = None):
         self.input_str = input_str
+        self.windows = windows
         self.position = 0
         self.read_position = 0
         self.ch = None
         self.read_char()
 
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[str], window_size: int = WINDOW_SIZE) -> 'Lexer':
+        windows = line_windows(chunks, window_size)
+        return cls(next(windows, SourceWindow('')), windows)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Lexer':
+        return cls.from_chunks(file_chunks(path))
+
+    @classmethod
+    def from_mmap(cls, buffer: mmap.mmap) -> 'Lexer':
+        return cls.from_chunks(mmap_chunks(buffer))
+
+    def next_window(self):
+        window = next(self.windows, None)
+        if window is None:
+            self.windows = None
+        else:
+            self.input_str = window
+            self.read_position = 0
+
     def read_char(self):
+        if self.read_position >= len(self.input_str) and self.windows is not None:
+            self.next_window()
         self.ch = self.peek_char()
         self.position = self.read_position
         self.read_position += 1
@@ -23,74 +144,134 @@ class Lexer:
         position = self.position
         while self.ch != 0 and self.ch.isalpha():
             self.read_char()
-        return self.input_str[position: self.position]
+        return position
 
     def read_number(self):
         position = self.position
-        while self.ch != 0 and self.ch.isdigit():
+        while self.ch != 0 and self.ch.isdecimal():
             self.read_char()
-        return self.input_str[position: self.position]
+        return position
 
     def lookup_ident(self, ident: str):
-        keywords = {
-            'fn' : TokenType.FUNCTION,
-            'let' : TokenType.LET,
-            'true' : TokenType.TRUE,
-            'false' : TokenType.FALSE,
-            'if' : TokenType.IF,
-            'else' : TokenType.ELSE,
-            'return' : TokenType.RETURN,
-        }
         return keywords.get(ident, TokenType.IDENT)
 
     def skip_whitespaces(self):
         while self.ch in (' ', '\t', '\n', '\r'):
             self.read_char()
 
-    def next_token(self):
-        char_to_toke_type = {
-            '+': TokenType.PLUS,
-            '-': TokenType.MINUS,
-            '*': TokenType.ASTERISK,
-            '/': TokenType.SLASH,
-            '<': TokenType.LT,
-            '>': TokenType.GT,
-            ';': TokenType.SEMICLOLON,
-            '(': TokenType.LPAREN,
-            ')': TokenType.RPAREN,
-            ',': TokenType.COMMA,
-            '{': TokenType.LBRACE,
-            '}': TokenType.RBRACE,
-        }
+    def new_token(self, token_type: TokenType, start: int) -> Token:
+        return Token(token_type, self.input_str, start, self.read_position - start)
 
+    def next_token(self):
         self.skip_whitespaces()
 
         if tokenType := char_to_toke_type.get(self.ch):
-            token = Token(tokenType, self.ch)
+            token = self.new_token(tokenType, self.position)
         elif self.ch == '=':
             if self.peek_char() == '=':
-                ch = self.ch
+                start = self.position
                 self.read_char()
-                token = Token(TokenType.EQ, ch + self.ch)
+                token = self.new_token(TokenType.EQ, start)
             else:
-                token = Token(TokenType.ASSIGN, self.ch)
+                token = self.new_token(TokenType.ASSIGN, self.position)
         elif self.ch == '!':
             if self.peek_char() == '=':
-                ch = self.ch
+                start = self.position
                 self.read_char()
-                token = Token(TokenType.NOT_EQ, ch + self.ch)
+                token = self.new_token(TokenType.NOT_EQ, start)
             else:
-                token = Token(TokenType.BANG, self.ch)
+                token = self.new_token(TokenType.BANG, self.position)
         elif self.ch == 0:
-            token = Token(TokenType.EOF, '')
+            token = Token(TokenType.EOF, self.input_str, len(self.input_str), 0)
         elif self.ch.isalpha():
-            ident = self.read_identifier()
-            tokenType = self.lookup_ident(ident)
-            return Token(tokenType, ident)
-        elif self.ch.isdigit():
-            return Token(TokenType.INT,self.read_number())
+            start = self.read_identifier()
+            text = self.input_str[start: self.position]
+            tokenType = self.lookup_ident(text)
+            if tokenType == TokenType.IDENT:
+                return SymbolToken(self.input_str, start, self.position - start, symbols.intern(text))
+            return Token(tokenType, self.input_str, start, self.position - start)
+        elif self.ch.isdecimal():
+            start = self.read_number()
+            return Token(TokenType.INT, self.input_str, start, self.position - start)
         else:
-            token = Token(TokenType.ILLEGAL, self.ch)
+            token = self.new_token(TokenType.ILLEGAL, self.position)
 
         self.read_char()
         return token
+
+    def tokenize(self) -> Iterator[Token]:
+        # Scans the rest of the input in one pass and ends with a single EOF.
+        # It does not advance the next_token state, so use one or the other.
+        source = self.input_str
+        yield from self.scan(source, self.position)
+        for source in self.windows or ():
+            yield from self.scan(source, 0)
+        yield Token(TokenType.EOF, source, len(source), 0)
+
+    @staticmethod
+    def scan(source: str, position: int, end: Optional[int] = None) -> Iterator[Token]:
+        for match in token_pattern.finditer(source, position, len(source) if end is None else end):
+            kind = match.lastgroup
+            if kind == 'WS':
+                continue
+            start, end = match.span()
+            if kind == 'OP':
+                yield Token(operator_to_token_type[match.group()], source, start, end - start)
+            elif kind == 'IDENT':
+                if match.group().isalpha():
+                    yield word_token(source, start, end)
+                else:
+                    yield from split_word(source, start, end)
+            elif kind == 'INT':
+                yield Token(TokenType.INT, source, start, end - start)
+            else:
+                yield Token(TokenType.ILLEGAL, source, start, end - start)
+
+
+def word_token(source: str, start: int, end: int) -> Token:
+    text = source[start:end]
+    keyword = keywords.get(text)
+    if keyword is None:
+        return SymbolToken(source, start, end - start, symbols.intern(text))
+    return Token(keyword, source, start, end - start)
+
+
+def split_word(source: str, start: int, end: int) -> Iterator[Token]:
+    # the letters of an IDENT match are words, each other character ILLEGAL
+    for is_letter, run in groupby(range(start, end), lambda i: source[i].isalpha()):
+        run = list(run)
+        if is_letter:
+            yield word_token(source, run[0], run[-1] + 1)
+        else:
+            for i in run:
+                yield Token(TokenType.ILLEGAL, source, i, 1)
+
+
+class TokenSpan:
+    # The tokens of a function body the parser skipped, kept as the stretch
+    # of source they cover and lexed again on demand. A body in a streamed
+    # source may run over several windows, one segment each.
+    __slots__ = ('segments',)
+
+    def __init__(self):
+        self.segments: List[List] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.segments)
+
+    def add(self, token: Token):
+        end = token.start + token.length
+        if self.segments and self.segments[-1][0] is token.source:
+            self.segments[-1][2] = end
+        else:
+            self.segments.append([token.source, token.start, end])
+
+    def tokenize(self) -> Iterator[Token]:
+        # the same interface as Lexer, so a Parser can read a span
+        for source, start, end in self.segments:
+            yield from Lexer.scan(source, start, end)
+        source, _, end = self.segments[-1] if self.segments else ('', 0, 0)
+        yield Token(TokenType.EOF, source, end, 0)
+
+    def names(self) -> Set[str]:
+        return {token.literal for token in self.tokenize() if token.type == TokenType.IDENT}
@@ -1,10 +1,52 @@
 import sys
+import asyncio
+import argparse
+from contextlib import nullcontext
+from functools import partial
 from lexer import Lexer
-from monkey_parser import Parser
+from monkey_parser import Parser, ParseError
 from token_type import Token, TokenType
-from evaluator import eval
+import evaluator
+import stack_evaluator
+import closure_compiler
+import instrumentation
+import memoization
+import tiering
+import vm
+import pycompiler
+from batch import run_many
+from server import ReplServer
+from compiler import CompileError
+from optimizer import optimize
+from program_cache import load_program
+from parallel_parser import parse_parallel
 
-if __name__ == "__main__":
+
+engines = {
+    'eval': evaluator.run,
+    'stack': stack_evaluator.run,
+    'closure': closure_compiler.run,
+    'vm': vm.run,
+    'python': pycompiler.run,
+}
+
+# engines whose globals carry over from one REPL line to the next
+sessions = {
+    'eval': evaluator.Session,
+    'stack': stack_evaluator.Session,
+    'closure': closure_compiler.Session,
+}
+
+recursion_error = "\tnesting too deep for this engine, try --engine stack"
+
+
+def new_engine(name):
+    if name in sessions:
+        return sessions[name]().run
+    return engines[name]
+
+
+def repl(engine, optimize_ast=True):
     prompt = '>>'
 
     print('Hello! This is the Monkey programming language!')
@@ -13,6 +55,11 @@ if __name__ == "__main__":
 
     for l in sys.stdin:
         input_str = l.strip()
+        if input_str.startswith(':'):
+            print(repl_command(input_str))
+            print(prompt, end="", flush=True)
+            continue
+
         lexer = Lexer(input_str=input_str)
         parser = Parser(lexer)
         program = parser.parse_program()
@@ -21,8 +68,194 @@ if __name__ == "__main__":
             for e in parser.errors:
                 print(f"\t{e}")
         else:
-            evaluated = eval(program)
-            if evaluated:
-                print(evaluated.inspect())
+            if optimize_ast:
+                program, _ = optimize(program)
+            try:
+                evaluated = engine(program)
+            except CompileError as e:
+                print(f"\t{e}")
+            except RecursionError:
+                print(recursion_error)
+            else:
+                if evaluated:
+                    print(evaluated.inspect())
 
         print(prompt, end="", flush=True)
+
+
+def repl_command(command: str) -> str:
+    name, *args = command.split()
+    if name == ':stats':
+        return stats_command(args)
+    elif name == ':memo':
+        return memo_command(args)
+    elif name == ':tiers':
+        return tiers_command(args)
+    return f"\tunknown command: {name}"
+
+
+def stats_command(args) -> str:
+    # :stats [on|off|reset] controls per-node evaluator statistics
+    action = args[0] if args else 'show'
+    if action == 'on':
+        instrumentation.enable()
+        return "\tstats enabled"
+    elif action == 'off':
+        instrumentation.disable()
+        return "\tstats disabled"
+    elif action == 'reset':
+        instrumentation.stats.reset()
+        return "\tstats reset"
+    elif action == 'show':
+        if not instrumentation.is_enabled() and not instrumentation.stats.nodes:
+            return "\tstats are off, enable them with :stats on"
+        return instrumentation.stats.report()
+    return "\tusage: :stats [on|off|reset]"
+
+
+def memo_command(args) -> str:
+    # :memo [clear|size N] shows or controls the cache of pure function calls
+    if not args:
+        return f"\t{memoization.cache.info()}"
+    elif args == ['clear']:
+        memoization.cache.clear()
+        return "\tmemo cache cleared"
+    elif len(args) == 2 and args[0] == 'size' and args[1].isdigit():
+        memoization.cache.resize(int(args[1]))
+        return f"\t{memoization.cache.info()}"
+    return "\tusage: :memo [clear|size N]"
+
+
+def tiers_command(args) -> str:
+    # :tiers [reset] shows call counts and tiers of the evaluator's functions
+    if not args:
+        if not tiering.is_enabled():
+            return "\ttiering is off, it is used by --engine eval with --tier-threshold above 0"
+        return tiering.state.report()
+    elif args == ['reset']:
+        tiering.state.reset()
+        return "\ttiers reset"
+    return "\tusage: :tiers [reset]"
+
+
+def run_file(path, engine, optimize_ast=True, use_cache=True, lazy=False, parse_workers=1) -> int:
+    # the script is streamed through the lexer instead of being read whole,
+    # unless it is parsed by several processes, and its parsed form is cached
+    # in __monkeycache__ next to it
+    parse = partial(parse_parallel, workers=parse_workers) if parse_workers > 1 else None
+    program, errors = load_program(path, use_cache, lazy, parse)
+
+    if errors:
+        for e in errors:
+            print(f"\t{e}", file=sys.stderr)
+        return 1
+
+    if optimize_ast:
+        program, _ = optimize(program)
+    try:
+        evaluated = engine(program)
+        # inspecting a function prints its body, which a lazy parse may
+        # only parse now
+        output = evaluated.inspect() if evaluated else None
+    except CompileError as e:
+        print(f"\t{e}", file=sys.stderr)
+        return 1
+    except ParseError as e:
+        # in a function body that was only parsed when it was called
+        for error in e.errors:
+            print(f"\t{error}", file=sys.stderr)
+        return 1
+    except RecursionError:
+        print(recursion_error, file=sys.stderr)
+        return 1
+
+    if output is not None:
+        print(output)
+    return 0
+
+
+def run_batch(path, engine, workers=None, optimize_ast=True) -> int:
+    # one program per line; results are printed in line order as the worker
+    # processes finish them, each after what its program wrote with puts;
+    # parse and evaluation failures make the exit code 1
+    status = 0
+    with open(path) as f:
+        sources = (line.rstrip('\n') for line in f)
+        for result in run_many(sources, workers, engine=engine, optimize_ast=optimize_ast):
+            line = result.index + 1
+            for printed in result.printed:
+                print(printed)
+            if result.errors:
+                status = 1
+                for e in result.errors:
+                    print(f"line {line}:\t{e}", file=sys.stderr)
+            else:
+                status = status or int(result.failed)
+                print(f"line {line}:\t{'' if result.output is None else result.output}")
+    return status
+
+
+def size(text: str) -> int:
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return value
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='The Monkey programming language')
+    arg_parser.add_argument('script', nargs='?',
+                            help='run a script file instead of starting the REPL')
+    arg_parser.add_argument('--engine', choices=sorted(engines), default='eval',
+                            help='execution engine (default: eval)')
+    arg_parser.add_argument('--no-optimize', dest='optimize', action='store_false',
+                            help='skip constant folding and dead-branch elimination')
+    arg_parser.add_argument('--no-cache', dest='cache', action='store_false',
+                            help='always re-parse scripts instead of using __monkeycache__')
+    arg_parser.add_argument('--lazy-parse', dest='lazy', action='store_true',
+                            help='parse function bodies of scripts when they are first called, '
+                                 'bypassing __monkeycache__')
+    arg_parser.add_argument('--parse-workers', type=int, default=1,
+                            help='processes that parse a large script in pieces (default: 1)')
+    arg_parser.add_argument('--memo-size', type=size, default=memoization.DEFAULT_MAXSIZE,
+                            help='results of pure function calls to keep, 0 to disable '
+                                 f'(default: {memoization.DEFAULT_MAXSIZE})')
+    arg_parser.add_argument('--batch', metavar='FILE',
+                            help='evaluate every line of FILE as a separate program')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='processes used by --batch (default: one per CPU)')
+    arg_parser.add_argument('--serve', metavar='ADDRESS',
+                            help='serve the REPL to many clients on HOST:PORT or unix:PATH')
+    arg_parser.add_argument('--tier-threshold', type=int, default=tiering.DEFAULT_THRESHOLD,
+                            help='calls after which --engine eval compiles a function, 0 to disable '
+                                 f'(default: {tiering.DEFAULT_THRESHOLD})')
+    args = arg_parser.parse_args(argv)
+
+    memoization.cache.resize(args.memo_size)
+
+    tiers = nullcontext()
+    if args.engine == 'eval' and args.tier_threshold > 0:
+        tiers = tiering.tiered(args.tier_threshold)
+    with tiers:
+        return run_mode(args)
+
+
+def run_mode(args) -> int:
+    if args.serve:
+        server = ReplServer(lambda: new_engine(args.engine), args.optimize)
+        try:
+            asyncio.run(server.serve_forever(args.serve))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.batch:
+        return run_batch(args.batch, engines[args.engine], args.workers, args.optimize)
+    if args.script:
+        return run_file(args.script, engines[args.engine], args.optimize, args.cache, args.lazy,
+                        args.parse_workers)
+    repl(new_engine(args.engine), args.optimize)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
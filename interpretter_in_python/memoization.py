@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+from object import Object, Function, Builtin
+from monkey_builtins import builtins
+
+DEFAULT_MAXSIZE = 1024
+
+# builtins whose calls are observable; calls that can reach them are never
+# memoized
+side_effecting_builtins = {'puts'}
+
+
+class MemoCache:
+    # Results of calls to pure functions, keyed by the function, its
+    # arguments and the current values of everything the call can reach,
+    # with the least recently used entry evicted once maxsize is reached.
+    # maxsize=0 turns memoization off.
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[Object]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            # evicted by another thread since the lookup, e.g. a server session
+            pass
+        return result
+
+    def put(self, key: Hashable, result: Object):
+        self.entries[key] = result
+        while len(self.entries) > self.maxsize:
+            try:
+                self.entries.popitem(last=False)
+            except KeyError:
+                break
+
+    def resize(self, maxsize: int):
+        if maxsize < 0:
+            raise ValueError(f"memo cache size must not be negative: {maxsize}")
+        self.maxsize = maxsize
+        while len(self.entries) > maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> str:
+        return f"hits={self.hits} misses={self.misses} size={len(self.entries)}/{self.maxsize}"
+
+
+cache = MemoCache()
+
+
+def call_key(function: Function, arguments: List[Object]) -> Optional[tuple]:
+    # None when the call cannot be memoized
+    if not cache.maxsize or type(function) is not Function:
+        return None
+    values = reachable_values(function, arguments)
+    if values is None:
+        return None
+    key = (function, *arguments, *values)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def reachable_values(function: Function, arguments: List[Object]) -> Optional[List[Object]]:
+    # The current values of the free variables of every function the call
+    # can reach, through them or through its arguments: what its result
+    # depends on besides the arguments. None if it can reach a
+    # side-effecting builtin, whatever name that is bound to. An unbound
+    # name stands for the builtin of that name.
+    values = []
+    seen = {function}
+    pending = [function]
+    for value in arguments:
+        if type(value) is Builtin and value.name in side_effecting_builtins:
+            return None
+        if type(value) is Function and value not in seen:
+            seen.add(value)
+            pending.append(value)
+    while pending:
+        current = pending.pop()
+        env = current.env
+        for name, depth, slot in current.free_variables:
+            value = env.get(depth, slot)
+            reached = builtins.get(name) if value is None else value
+            if type(reached) is Builtin and reached.name in side_effecting_builtins:
+                return None
+            if type(value) is Function and value not in seen:
+                seen.add(value)
+                pending.append(value)
+            values.append(value)
+    return values
+
+
+def is_pure(function: Function) -> bool:
+    return reachable_values(function, []) is not None
+
+
+def lookup(key: Optional[tuple]) -> Optional[Object]:
+    return None if key is None else cache.get(key)
+
+
+def store(key: Optional[tuple], result: Object):
+    if key is not None:
+        cache.put(key, result)
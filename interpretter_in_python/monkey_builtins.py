@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from object import Object, Integer, Error, Array, Builtin, NULL
+
+# Functions every program can call. They are found by name when an
+# identifier is not bound, so a let of the same name shadows them.
+
+# where puts writes while capture_output is active in this thread or task;
+# None means stdout
+printed: ContextVar[Optional[List[str]]] = ContextVar('printed', default=None)
+
+
+@contextmanager
+def capture_output() -> Iterator[List[str]]:
+    # collects the lines puts writes, for callers that send output elsewhere
+    # than this process's stdout, such as a server session or a batch worker
+    lines: List[str] = []
+    token = printed.set(lines)
+    try:
+        yield lines
+    finally:
+        printed.reset(token)
+
+
+def check_arguments(args: List[Object], *counts: int) -> Optional[Error]:
+    if len(args) not in counts:
+        return Error(f"wrong number of arguments: want={counts[0]}, got={len(args)}")
+    return None
+
+
+def check_array(name: str, arg: Object) -> Optional[Error]:
+    if type(arg) is not Array:
+        return Error(f"argument to `{name}` must be ARRAY, got {arg.type().value}")
+    return None
+
+
+def builtin_len(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1):
+        return error
+    if type(args[0]) is not Array:
+        return Error(f"argument to `len` not supported, got {args[0].type().value}")
+    return Integer(len(args[0]))
+
+
+def builtin_first(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1) or check_array('first', args[0]):
+        return error
+    return args[0][0] if len(args[0]) else NULL
+
+
+def builtin_last(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1) or check_array('last', args[0]):
+        return error
+    return args[0][-1] if len(args[0]) else NULL
+
+
+def builtin_rest(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1) or check_array('rest', args[0]):
+        return error
+    return Array(args[0].elements[1:]) if len(args[0]) else NULL
+
+
+def builtin_push(args: List[Object]) -> Object:
+    if error := check_arguments(args, 2) or check_array('push', args[0]):
+        return error
+    return Array.from_objects(args[0].objects() + [args[1]])
+
+
+def builtin_puts(args: List[Object]) -> Object:
+    lines = printed.get()
+    for arg in args:
+        if lines is None:
+            print(arg.inspect())
+        else:
+            lines.append(arg.inspect())
+    return NULL
+
+
+def builtin_sum(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1) or check_array('sum', args[0]):
+        return error
+    values = args[0].ints()
+    if values is None:
+        return Error("argument to `sum` must be ARRAY of INTEGER")
+    return Integer(sum(values))
+
+
+def builtin_range(args: List[Object]) -> Object:
+    # range(stop), range(start, stop) or range(start, stop, step)
+    if error := check_arguments(args, 1, 2, 3):
+        return error
+    if any(type(arg) is not Integer for arg in args):
+        return Error("arguments to `range` must be INTEGER")
+    if len(args) == 3 and args[2].value == 0:
+        return Error("`range` step must not be zero")
+    return Array.from_ints(range(*[arg.value for arg in args]))
+
+
+def builtin_map(args: List[Object]) -> Object:
+    # Only builtins can be mapped: they run without the evaluator, so a
+    # numeric array and a builtin with an elementwise form are mapped in one
+    # bulk pass.
+    if error := check_arguments(args, 2) or check_array('map', args[0]):
+        return error
+    elements, function = args
+    if type(function) is not Builtin:
+        return Error(f"argument to `map` must be BUILTIN, got {function.type().value}")
+
+    if function.elementwise is not None and elements.is_numeric():
+        return Array.from_ints(map(function.elementwise, elements.elements))
+    results = []
+    for element in elements.objects():
+        result = function.function([element])
+        if type(result) is Error:
+            return result
+        results.append(result)
+    return Array.from_objects(results)
+
+
+def builtin_abs(args: List[Object]) -> Object:
+    if error := check_arguments(args, 1):
+        return error
+    arg = args[0]
+    if type(arg) is Integer:
+        return Integer(abs(arg.value))
+    elif type(arg) is Array and (values := arg.ints()) is not None:
+        return Array.from_ints(map(abs, values))
+    return Error(f"argument to `abs` not supported, got {arg.type().value}")
+
+
+builtins: Dict[str, Builtin] = {b.name: b for b in (
+    Builtin('len', builtin_len),
+    Builtin('first', builtin_first),
+    Builtin('last', builtin_last),
+    Builtin('rest', builtin_rest),
+    Builtin('push', builtin_push),
+    Builtin('puts', builtin_puts),
+    Builtin('sum', builtin_sum),
+    Builtin('range', builtin_range),
+    Builtin('map', builtin_map),
+    Builtin('abs', builtin_abs, elementwise=abs),
+)}
@@ -1,22 +1,17 @@
 from typing import Optional
 from token_type import Token, TokenType
-from lexer import Lexer
+from lexer import Lexer, TokenSpan
+import ast_type
 from ast_type import (Program,
                       Statement,
                       LetStatement,
                       ReturnStatement,
                       BlockStatement,
+                      LazyBlockStatement,
                       ExpressionStatement,
                       Expression,
-                      Identifier,
-                      Boolean,
-                      IntegerLiteral,
-                      FunctionLiteral,
-                      PrefixExpression,
-                      InfixExpression,
-                      CallExpression,
-                      IfExpression)
-from typing import List, Dict, Optional
+                      Identifier)
+from typing import List, Dict, Iterator, Optional
 from enum import IntEnum, auto
 
 
@@ -28,6 +23,7 @@ class OpPrecedence(IntEnum):
     PRODUCT = auto()
     PREFIX = auto()
     CALL = auto()
+    INDEX = auto()
 
 
 precendences = {
@@ -40,17 +36,42 @@ precendences = {
     TokenType.SLASH: OpPrecedence.PRODUCT,
     TokenType.ASTERISK: OpPrecedence.PRODUCT,
     TokenType.LPAREN: OpPrecedence.CALL,
+    TokenType.LBRACKET: OpPrecedence.INDEX,
 }
 
 
+# pending work in the explicit-stack parse_expression
+PREFIX_OPERAND = 0
+GROUP = 1
+INFIX_OPERAND = 2
+CALL_ARGUMENT = 3
+
+
+class ParseError(Exception):
+    # the errors in a function body that was parsed lazily, on first use
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
 class Parser():
-    def __init__(self, lexer: Lexer):
+    def __init__(self, lexer: Lexer, nodes=ast_type, recursive: bool = False, lazy: bool = False):
         self.lexer: Lexer = lexer
+        # node constructors; ast_arena.AstArena builds a compact AST instead
+        self.nodes = nodes
+        # pre-parse: function bodies are only skipped over, see LazyBlockStatement
+        if lazy and nodes is not ast_type:
+            raise ValueError("lazy parsing builds ast_type nodes only")
+        self.lazy = lazy
+        self.tokens: Iterator[Token] = lexer.tokenize()
         self.cur_token: Optional[Token] = None
         self.peek_token: Optional[Token] = None
         self.errors: List[str] = []
         self.prefix_parse_funcs: dict = {}
         self.infix_parse_funcs: dict = {}
+        # token types whose parse functions parse_expression inlines
+        self.stacked_prefixes: Dict[TokenType, int] = {}
+        self.stacked_infixes: Dict[TokenType, int] = {}
 
         self.register_prefix(TokenType.IDENT, self.parse_identifier)
         self.register_prefix(TokenType.INT, self.parse_integer_literal)
@@ -61,6 +82,7 @@ class Parser():
         self.register_prefix(TokenType.LPAREN, self.parse_grouped_expression)
         self.register_prefix(TokenType.IF, self.parse_if_expression)
         self.register_prefix(TokenType.FUNCTION, self.parse_function_literal)
+        self.register_prefix(TokenType.LBRACKET, self.parse_array_literal)
 
         self.register_infix(TokenType.PLUS, self.parse_infix_expression)
         self.register_infix(TokenType.MINUS, self.parse_infix_expression)
@@ -71,13 +93,18 @@ class Parser():
         self.register_infix(TokenType.LT, self.parse_infix_expression)
         self.register_infix(TokenType.GT, self.parse_infix_expression)
         self.register_infix(TokenType.LPAREN, self.parse_call_expression)
+        self.register_infix(TokenType.LBRACKET, self.parse_index_expression)
+
+        if recursive:
+            self.parse_expression = self.parse_expression_recursive
 
         self.next_token()
         self.next_token()
 
     def next_token(self):
         self.cur_token = self.peek_token
-        self.peek_token = self.lexer.next_token()
+        # the stream ends with one EOF token, which then repeats
+        self.peek_token = next(self.tokens, self.peek_token)
 
     def cur_token_is(self, token_type: TokenType) -> bool:
         return self.cur_token.type == token_type
@@ -100,28 +127,42 @@ class Parser():
 
     def peek_error(self, token_type: TokenType):
         self.errors.append(
-            f"expected next token to be {token_type}, got {self.peek_token.type} insted")
+            f"expected next token to be {token_type}, got {self.peek_token.type} insted"
+            f"{self.location(self.peek_token)}")
 
     def no_prefix_parse_func_error(self, token_type: TokenType):
         self.errors.append(
-            f"no prefix parse function for {token_type} found"
+            f"no prefix parse function for {token_type} found{self.location(self.cur_token)}"
         )
 
+    def location(self, token: Token) -> str:
+        return f" at line {token.line}, column {token.column}"
+
     def register_prefix(self, token_type: TokenType, func):
         self.prefix_parse_funcs[token_type] = func
+        self.stacked_prefixes.pop(token_type, None)
+        if func == self.parse_prefix_expression:
+            self.stacked_prefixes[token_type] = PREFIX_OPERAND
+        elif func == self.parse_grouped_expression:
+            self.stacked_prefixes[token_type] = GROUP
 
     def register_infix(self, token_type: TokenType, func):
         self.infix_parse_funcs[token_type] = func
+        self.stacked_infixes.pop(token_type, None)
+        if func == self.parse_infix_expression:
+            self.stacked_infixes[token_type] = INFIX_OPERAND
+        elif func == self.parse_call_expression:
+            self.stacked_infixes[token_type] = CALL_ARGUMENT
 
     def parse_program(self) -> Program:
-        program = Program(statements=[])
+        statements: List[Statement] = []
 
         while self.cur_token.type != TokenType.EOF:
             stmt = self.parse_statement()
             if stmt:
-                program.statements.append(stmt)
+                statements.append(stmt)
             self.next_token()
-        return program
+        return self.nodes.Program(statements=statements)
 
     def parse_statement(self) -> Statement:
         parse_funcs = {
@@ -140,7 +181,7 @@ class Parser():
         if not self.expect_peek(TokenType.IDENT):
             return None
 
-        name = Identifier(token=self.cur_token, value=self.cur_token.literal)
+        name = self.nodes.Identifier(token=self.cur_token, value=self.cur_token.literal)
 
         if not self.expect_peek(TokenType.ASSIGN):
             return None
@@ -151,7 +192,7 @@ class Parser():
         if self.peek_token_is(TokenType.SEMICLOLON):
             self.next_token()
 
-        return LetStatement(
+        return self.nodes.LetStatement(
             token=let_token,
             name=name,
             value=value)
@@ -165,12 +206,12 @@ class Parser():
         if self.peek_token_is(TokenType.SEMICLOLON):
             self.next_token()
 
-        return ReturnStatement(
+        return self.nodes.ReturnStatement(
             token=return_token,
             return_value=return_value)
 
     def parse_expression_statement(self) -> ExpressionStatement:
-        stmt = ExpressionStatement(
+        stmt = self.nodes.ExpressionStatement(
             token=self.cur_token, expression=self.parse_expression(OpPrecedence.LOWEST))
 
         if self.peek_token_is(TokenType.SEMICLOLON):
@@ -179,6 +220,85 @@ class Parser():
         return stmt
 
     def parse_expression(self, precendence: OpPrecedence) -> Optional[Expression]:
+        # The same Pratt parser as parse_expression_recursive, with the
+        # recursion for prefix operators, groups, infix operands and call
+        # arguments turned into an explicit stack, so nesting depth is limited
+        # by memory rather than the Python stack. The blocks of if and fn
+        # literals, array elements and indexes are still parsed recursively.
+        stack = []
+        while True:
+            stacked = self.stacked_prefixes.get(self.cur_token.type)
+            if stacked == PREFIX_OPERAND:
+                stack.append((PREFIX_OPERAND, precendence, self.cur_token, None))
+                precendence = OpPrecedence.PREFIX
+                self.next_token()
+                continue
+            elif stacked == GROUP:
+                stack.append((GROUP, precendence, None, None))
+                precendence = OpPrecedence.LOWEST
+                self.next_token()
+                continue
+
+            prefix = self.prefix_parse_funcs.get(self.cur_token.type, None)
+            if prefix:
+                left = prefix()
+                operand_ended = False
+            else:
+                self.no_prefix_parse_func_error(self.cur_token.type)
+                left = None
+                operand_ended = True
+
+            while True:
+                if (not operand_ended and not self.peek_token_is(TokenType.SEMICLOLON)
+                        and precendence < self.peek_precendence()
+                        and (infix := self.infix_parse_funcs.get(self.peek_token.type, None))):
+                    self.next_token()
+                    stacked = self.stacked_infixes.get(self.cur_token.type)
+                    if stacked == INFIX_OPERAND:
+                        stack.append((INFIX_OPERAND, precendence, self.cur_token, left))
+                        precendence = self.cur_precendence()
+                        self.next_token()
+                        break
+                    elif stacked == CALL_ARGUMENT:
+                        token = self.cur_token
+                        if self.peek_token_is(TokenType.RPAREN):
+                            self.next_token()
+                            left = self.nodes.CallExpression(token=token, function=left, arguments=[])
+                            continue
+                        stack.append((CALL_ARGUMENT, precendence, token, (left, [])))
+                        precendence = OpPrecedence.LOWEST
+                        self.next_token()
+                        break
+                    left = infix(left)
+                    continue
+
+                # the innermost pending expression is complete
+                operand_ended = False
+                if not stack:
+                    return left
+                kind, precendence, token, pending = stack.pop()
+                if kind == PREFIX_OPERAND:
+                    left = self.nodes.PrefixExpression(token=token, operator=token.literal, right=left)
+                elif kind == GROUP:
+                    if not self.expect_peek(TokenType.RPAREN):
+                        left = None
+                elif kind == INFIX_OPERAND:
+                    left = self.nodes.InfixExpression(
+                        token=token, left=pending, operator=token.literal, right=left)
+                else:
+                    function, arguments = pending
+                    arguments.append(left)
+                    if self.peek_token_is(TokenType.COMMA):
+                        stack.append((CALL_ARGUMENT, precendence, token, pending))
+                        precendence = OpPrecedence.LOWEST
+                        self.next_token()
+                        self.next_token()
+                        break
+                    if not self.expect_peek(TokenType.RPAREN):
+                        arguments = None
+                    left = self.nodes.CallExpression(token=token, function=function, arguments=arguments)
+
+    def parse_expression_recursive(self, precendence: OpPrecedence) -> Optional[Expression]:
         prefix = self.prefix_parse_funcs.get(self.cur_token.type, None)
         if not prefix:
             self.no_prefix_parse_func_error(self.cur_token.type)
@@ -197,13 +317,13 @@ class Parser():
 
 
     def parse_identifier(self) -> Expression:
-        return Identifier(token=self.cur_token, value=self.cur_token.literal)
+        return self.nodes.Identifier(token=self.cur_token, value=self.cur_token.literal)
 
     def parse_integer_literal(self) -> Expression:
-        return IntegerLiteral(token=self.cur_token, value=int(self.cur_token.literal))
+        return self.nodes.IntegerLiteral(token=self.cur_token, value=int(self.cur_token.literal))
 
     def parse_boolean(self) -> Expression:
-        return Boolean(token=self.cur_token, value=self.cur_token_is(TokenType.TRUE))
+        return self.nodes.Boolean(token=self.cur_token, value=self.cur_token_is(TokenType.TRUE))
 
     def parse_prefix_expression(self) -> Expression:
         token = self.cur_token
@@ -211,7 +331,7 @@ class Parser():
 
         self.next_token()
 
-        return PrefixExpression(token=token, operator=operator, right=self.parse_expression(OpPrecedence.PREFIX))
+        return self.nodes.PrefixExpression(token=token, operator=operator, right=self.parse_expression(OpPrecedence.PREFIX))
 
     def parse_infix_expression(self, left: Expression) -> Expression:
         token = self.cur_token
@@ -219,7 +339,7 @@ class Parser():
 
         precendence = self.cur_precendence()
         self.next_token()
-        return InfixExpression(
+        return self.nodes.InfixExpression(
             token = token,
             left = left,
             operator = operator,
@@ -259,7 +379,7 @@ class Parser():
                 return None
             alternative = self.parse_block_statement()
 
-        return IfExpression(
+        return self.nodes.IfExpression(
             token=token,
             condition=condition,
             consequence=consequence,
@@ -277,7 +397,31 @@ class Parser():
                 statements.append(stmt)
             self.next_token()
 
-        return BlockStatement(token=token, statements=statements)
+        return self.nodes.BlockStatement(token=token, statements=statements)
+
+    def skip_block_statement(self) -> BlockStatement:
+        # Steps over the body to its closing brace, as parse_block_statement
+        # would, counting braces instead of parsing. Errors in the body are
+        # only found once it is parsed.
+        token = self.cur_token
+        span = TokenSpan()
+        depth = 1
+
+        self.next_token()
+
+        while not self.cur_token_is(TokenType.EOF):
+            if self.cur_token_is(TokenType.LBRACE):
+                depth += 1
+            elif self.cur_token_is(TokenType.RBRACE):
+                depth -= 1
+                if depth == 0:
+                    break
+            span.add(self.cur_token)
+            self.next_token()
+
+        if not span:
+            return BlockStatement(token=token, statements=[])
+        return LazyBlockStatement(token=token, span=span, parse=parse_lazy_body)
 
     def parse_function_literal(self) -> Expression:
         token = self.cur_token
@@ -290,9 +434,9 @@ class Parser():
         if not self.expect_peek(TokenType.LBRACE):
             return None
 
-        body = self.parse_block_statement()
+        body = self.skip_block_statement() if self.lazy else self.parse_block_statement()
 
-        return FunctionLiteral(token=token, parameters=parameters, body=body)
+        return self.nodes.FunctionLiteral(token=token, parameters=parameters, body=body)
 
     def parse_function_parameters(self) -> List[Identifier]:
         if self.peek_token_is(TokenType.RPAREN):
@@ -302,13 +446,13 @@ class Parser():
         self.next_token()
 
         identifiers = [
-            Identifier(
+            self.nodes.Identifier(
                 token=self.cur_token, value=self.cur_token.literal)
         ]
         while self.peek_token_is(TokenType.COMMA):
             self.next_token()
             self.next_token()
-            identifiers.append(Identifier(
+            identifiers.append(self.nodes.Identifier(
                 token=self.cur_token, value=self.cur_token.literal))
 
         if not self.expect_peek(TokenType.RPAREN):
@@ -318,11 +462,28 @@ class Parser():
 
     def parse_call_expression(self, function: Expression) -> Expression:
         token = self.cur_token
-        arguments = self.parse_call_arguments()
-        return CallExpression(token=token, function=function, arguments=arguments)
+        arguments = self.parse_expression_list(TokenType.RPAREN)
+        return self.nodes.CallExpression(token=token, function=function, arguments=arguments)
 
-    def parse_call_arguments(self) -> List[Expression]:
-        if self.peek_token_is(TokenType.RPAREN):
+    def parse_array_literal(self) -> Expression:
+        token = self.cur_token
+        elements = self.parse_expression_list(TokenType.RBRACKET)
+        return self.nodes.ArrayLiteral(token=token, elements=elements)
+
+    def parse_index_expression(self, left: Expression) -> Expression:
+        token = self.cur_token
+
+        self.next_token()
+        index = self.parse_expression(OpPrecedence.LOWEST)
+
+        if not self.expect_peek(TokenType.RBRACKET):
+            return None
+
+        return self.nodes.IndexExpression(token=token, left=left, index=index)
+
+    def parse_expression_list(self, end: TokenType) -> List[Expression]:
+        if self.peek_token_is(end):
+            self.next_token()
             return []
 
         self.next_token()
@@ -337,7 +498,15 @@ class Parser():
                 self.parse_expression(OpPrecedence.LOWEST)
             )
 
-        if not self.expect_peek(TokenType.RPAREN):
+        if not self.expect_peek(end):
             return None
 
         return arguments
+
+
+def parse_lazy_body(span: TokenSpan) -> List[Statement]:
+    parser = Parser(span, lazy=True)
+    program = parser.parse_program()
+    if parser.errors:
+        raise ParseError(parser.errors)
+    return program.statements
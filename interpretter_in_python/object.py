@@ -1,16 +1,23 @@
 from enum import Enum
+from array import array
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Sequence
 
 
 class ObjectType(Enum):
     INTEGER_OBJ = "INTEGER"
     BOOLEAN_OBJ = "BOOLEAN"
     NULL_OBJ = "NULL"
+    ERROR_OBJ = "ERROR"
+    RETURN_VALUE_OBJ = "RETURN_VALUE"
+    FUNCTION_OBJ = "FUNCTION"
+    ARRAY_OBJ = "ARRAY"
+    BUILTIN_OBJ = "BUILTIN"
 
 
-@dataclass
 class Object(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def inspect(self) -> str:
         pass
@@ -20,9 +27,21 @@ class Object(ABC):
         pass
 
 
-@dataclass
+SMALL_INT_MIN = -256
+SMALL_INT_MAX = 1024
+
+
 class Integer(Object):
-    value: int
+    # Integers in [SMALL_INT_MIN, SMALL_INT_MAX] are cached, so Integer(n)
+    # returns the same instance for them; larger values are allocated.
+    __slots__ = ('value',)
+
+    def __new__(cls, value: int):
+        if SMALL_INT_MIN <= value <= SMALL_INT_MAX and cls is Integer:
+            return small_ints[value - SMALL_INT_MIN]
+        self = super().__new__(cls)
+        self.value = value
+        return self
 
     def inspect(self) -> str:
         return str(self.value)
@@ -30,10 +49,37 @@ class Integer(Object):
     def type(self) -> ObjectType:
         return ObjectType.INTEGER_OBJ
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Object):
+            return NotImplemented
+        return self is other or (type(other) is Integer and self.value == other.value)
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+    def __reduce__(self):
+        return Integer, (self.value,)
+
+    def __repr__(self) -> str:
+        return f"Integer(value={self.value})"
+
+
+def new_small_int(value: int) -> Integer:
+    obj = Object.__new__(Integer)
+    obj.value = value
+    return obj
+
+
+small_ints = [new_small_int(v) for v in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
 
-@dataclass
 class Boolean(Object):
-    value: bool
+    # There are exactly two booleans: Boolean(v) returns TRUE or FALSE, so
+    # comparing booleans is an identity check.
+    __slots__ = ('value',)
+
+    def __new__(cls, value: bool):
+        return TRUE if value else FALSE
 
     def inspect(self) -> str:
         return "true" if self.value else "false"
@@ -41,13 +87,199 @@ class Boolean(Object):
     def type(self) -> ObjectType:
         return ObjectType.BOOLEAN_OBJ
 
+    def __reduce__(self):
+        return Boolean, (self.value,)
+
+    def __repr__(self) -> str:
+        return f"Boolean(value={self.value})"
+
+
+TRUE = Object.__new__(Boolean)
+TRUE.value = True
+FALSE = Object.__new__(Boolean)
+FALSE.value = False
+
 
-@dataclass
 class Null(Object):
-    value: bool
+    __slots__ = ()
+
+    def __new__(cls):
+        return NULL
 
     def inspect(self) -> str:
         return "null"
 
     def type(self) -> ObjectType:
         return ObjectType.NULL_OBJ
+
+    def __reduce__(self):
+        return Null, ()
+
+    def __repr__(self) -> str:
+        return "Null()"
+
+
+NULL = Object.__new__(Null)
+
+
+class Error(Object):
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def inspect(self) -> str:
+        return f"ERROR: {self.message}"
+
+    def type(self) -> ObjectType:
+        return ObjectType.ERROR_OBJ
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Object):
+            return NotImplemented
+        return type(other) is Error and self.message == other.message
+
+    def __hash__(self) -> int:
+        return hash(self.message)
+
+    def __repr__(self) -> str:
+        return f"Error(message={self.message!r})"
+
+
+class ReturnValue(Object):
+    __slots__ = ('value',)
+
+    def __init__(self, value: Object):
+        self.value = value
+
+    def inspect(self) -> str:
+        return self.value.inspect()
+
+    def type(self) -> ObjectType:
+        return ObjectType.RETURN_VALUE_OBJ
+
+    def __repr__(self) -> str:
+        return f"ReturnValue(value={self.value!r})"
+
+
+class Function(Object):
+    # env is the Environment the literal was evaluated in; a call gets a new
+    # frame of slot_count slots whose outer frame is env. free_variables are
+    # the (name, depth, slot) the body reads from env. code is the body
+    # compiled by closure_compiler, for functions made by that engine.
+    __slots__ = ('parameters', 'body', 'slot_count', 'env', 'free_variables', 'code')
+
+    def __init__(self, parameters: list, body, slot_count: int, env, free_variables: tuple = (),
+                 code=None):
+        self.parameters = parameters
+        self.body = body
+        self.slot_count = slot_count
+        self.env = env
+        self.free_variables = free_variables
+        self.code = code
+
+    def inspect(self) -> str:
+        params = ", ".join(p.string() for p in self.parameters)
+        return f"fn({params}) {{\n{self.body.string()}\n}}"
+
+    def type(self) -> ObjectType:
+        return ObjectType.FUNCTION_OBJ
+
+    def __repr__(self) -> str:
+        return f"Function({self.inspect()!r})"
+
+
+class Array(Object):
+    # Arrays are immutable. While every element is an integer that fits in
+    # 64 bits they are stored unboxed in an array('q'), so arithmetic over
+    # them is one bulk operation on machine ints; anything else is a list
+    # of objects.
+    __slots__ = ('elements',)
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    @classmethod
+    def from_objects(cls, objects: List[Object]) -> 'Array':
+        if all(type(o) is Integer for o in objects):
+            return cls.from_ints([o.value for o in objects])
+        return cls(objects)
+
+    @classmethod
+    def from_ints(cls, values: Iterable[int]) -> 'Array':
+        values = values if isinstance(values, (array, list, range)) else list(values)
+        try:
+            return cls(array('q', values))
+        except OverflowError:
+            return cls(list(map(Integer, values)))
+
+    def is_numeric(self) -> bool:
+        return type(self.elements) is array
+
+    def ints(self) -> Optional[Sequence[int]]:
+        # the elements as Python ints, or None if some are not integers
+        if type(self.elements) is array:
+            return self.elements
+        if all(type(o) is Integer for o in self.elements):
+            return [o.value for o in self.elements]
+        return None
+
+    def objects(self) -> List[Object]:
+        if type(self.elements) is array:
+            return list(map(Integer, self.elements))
+        return self.elements
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def __getitem__(self, i: int) -> Object:
+        element = self.elements[i]
+        return Integer(element) if type(self.elements) is array else element
+
+    def inspect(self) -> str:
+        return "[" + ", ".join(o.inspect() for o in self.objects()) + "]"
+
+    def type(self) -> ObjectType:
+        return ObjectType.ARRAY_OBJ
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Object):
+            return NotImplemented
+        return type(other) is Array and self.objects() == other.objects()
+
+    # unhashable, so calls taking arrays are never memoized
+    __hash__ = None
+
+    def __reduce__(self):
+        return Array, (self.elements,)
+
+    def __repr__(self) -> str:
+        return f"Array({self.inspect()})"
+
+
+class Builtin(Object):
+    # A function implemented in Python. function takes the list of argument
+    # objects; elementwise, if given, is the same operation on one Python
+    # int, which map() applies in bulk over a numeric array.
+    __slots__ = ('name', 'function', 'elementwise')
+
+    def __init__(self, name: str, function: Callable[[List[Object]], Object],
+                 elementwise: Optional[Callable[[int], int]] = None):
+        self.name = name
+        self.function = function
+        self.elementwise = elementwise
+
+    def inspect(self) -> str:
+        return "builtin function"
+
+    def type(self) -> ObjectType:
+        return ObjectType.BUILTIN_OBJ
+
+    def __repr__(self) -> str:
+        return f"Builtin({self.name})"
+
+
+def int_div(left: int, right: int) -> int:
+    # Monkey integer division truncates toward zero
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
@@ -0,0 +1,276 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from token_type import Token, TokenType
+from object import int_div
+from ast_type import (Node,
+                      Program,
+                      Statement,
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      LazyBlockStatement,
+                      Expression,
+                      IntegerLiteral,
+                      Boolean,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
+
+@dataclass
+class OptimizationReport:
+    nodes_before: int
+    nodes_after: int
+    folded: int
+    pruned: int
+
+    @property
+    def removed(self) -> int:
+        return self.nodes_before - self.nodes_after
+
+
+class Optimizer:
+    # Rewrites the AST bottom-up without mutating it: unchanged subtrees are
+    # shared with the input, so arena views pass through untouched.
+    def __init__(self):
+        self.folded = 0
+        self.pruned = 0
+
+    def optimize(self, node: Optional[Node]) -> Optional[Node]:
+        if isinstance(node, Program):
+            statements = self.optimize_statements(node.statements)
+            return node if statements is None else Program(statements=statements)
+        elif isinstance(node, ExpressionStatement):
+            expression = self.optimize(node.expression)
+            if expression is node.expression:
+                return node
+            return ExpressionStatement(token=node.token, expression=expression)
+        elif isinstance(node, LetStatement):
+            value = self.optimize(node.value)
+            if value is node.value:
+                return node
+            return LetStatement(token=node.token, name=node.name, value=value)
+        elif isinstance(node, ReturnStatement):
+            return_value = self.optimize(node.return_value)
+            if return_value is node.return_value:
+                return node
+            return ReturnStatement(token=node.token, return_value=return_value)
+        elif isinstance(node, LazyBlockStatement) and not node.parsed:
+            # optimizing the body would parse it
+            return node
+        elif isinstance(node, BlockStatement):
+            statements = self.optimize_statements(node.statements)
+            return node if statements is None else BlockStatement(token=node.token, statements=statements)
+        elif isinstance(node, PrefixExpression):
+            return self.optimize_prefix_expression(node)
+        elif isinstance(node, InfixExpression):
+            return self.optimize_infix_expression(node)
+        elif isinstance(node, IfExpression):
+            return self.optimize_if_expression(node)
+        elif isinstance(node, FunctionLiteral):
+            body = self.optimize(node.body)
+            if body is node.body:
+                return node
+            return FunctionLiteral(token=node.token, parameters=node.parameters, body=body)
+        elif isinstance(node, CallExpression):
+            function = self.optimize(node.function)
+            arguments = [self.optimize(a) for a in node.arguments]
+            if function is node.function and all(a is b for a, b in zip(arguments, node.arguments)):
+                return node
+            return CallExpression(token=node.token, function=function, arguments=arguments)
+        elif isinstance(node, ArrayLiteral):
+            elements = [self.optimize(e) for e in node.elements]
+            if all(a is b for a, b in zip(elements, node.elements)):
+                return node
+            return ArrayLiteral(token=node.token, elements=elements)
+        elif isinstance(node, IndexExpression):
+            left = self.optimize(node.left)
+            index = self.optimize(node.index)
+            if left is node.left and index is node.index:
+                return node
+            return IndexExpression(token=node.token, left=left, index=index)
+        return node
+
+    def optimize_statements(self, stmts: List[Statement]) -> Optional[List[Statement]]:
+        # Returns None when nothing changed. Constant expression statements
+        # other than the last one have no effect and are dropped.
+        optimized = [self.optimize(stmt) for stmt in stmts]
+        kept = [stmt for i, stmt in enumerate(optimized)
+                if i == len(optimized) - 1 or not self.is_constant_statement(stmt)]
+        self.pruned += len(optimized) - len(kept)
+        if len(kept) == len(stmts) and all(a is b for a, b in zip(kept, stmts)):
+            return None
+        return kept
+
+    def optimize_prefix_expression(self, node: PrefixExpression) -> Expression:
+        right = self.optimize(node.right)
+
+        if node.operator == '-' and isinstance(right, IntegerLiteral):
+            return self.fold_integer(-right.value)
+        elif node.operator == '!' and isinstance(right, Boolean):
+            return self.fold_boolean(not right.value)
+        elif node.operator == '!' and isinstance(right, IntegerLiteral):
+            return self.fold_boolean(False)
+        elif node.operator == '!' and self.is_double_bang_of_boolean(right):
+            # !!e is e whenever e already evaluates to a boolean
+            self.folded += 1
+            return right.right
+
+        if right is node.right:
+            return node
+        return PrefixExpression(token=node.token, operator=node.operator, right=right)
+
+    def optimize_infix_expression(self, node: InfixExpression) -> Expression:
+        left = self.optimize(node.left)
+        right = self.optimize(node.right)
+        operator = node.operator
+
+        if isinstance(left, IntegerLiteral) and isinstance(right, IntegerLiteral):
+            folded = self.fold_integer_infix(operator, left.value, right.value)
+            if folded is not None:
+                return folded
+        elif self.is_constant(left) and self.is_constant(right) and operator in ('==', '!='):
+            # booleans never equal integers, and equal booleans are identical
+            equal = isinstance(left, Boolean) == isinstance(right, Boolean) and left.value == right.value
+            return self.fold_boolean(equal if operator == '==' else not equal)
+
+        if left is node.left and right is node.right:
+            return node
+        return InfixExpression(token=node.token, left=left, operator=operator, right=right)
+
+    def fold_integer_infix(self, operator: str, left: int, right: int) -> Optional[Expression]:
+        if operator == '+':
+            return self.fold_integer(left + right)
+        elif operator == '-':
+            return self.fold_integer(left - right)
+        elif operator == '*':
+            return self.fold_integer(left * right)
+        elif operator == '/' and right != 0:
+            return self.fold_integer(int_div(left, right))
+        elif operator == '<':
+            return self.fold_boolean(left < right)
+        elif operator == '>':
+            return self.fold_boolean(left > right)
+        elif operator == '==':
+            return self.fold_boolean(left == right)
+        elif operator == '!=':
+            return self.fold_boolean(left != right)
+        # division by zero is left for the evaluator to report
+        return None
+
+    def optimize_if_expression(self, node: IfExpression) -> Expression:
+        condition = self.optimize(node.condition)
+        consequence = self.optimize(node.consequence)
+        alternative = self.optimize(node.alternative)
+
+        if self.is_constant(condition):
+            self.pruned += 1
+            # integers are always truthy
+            if isinstance(condition, Boolean) and not condition.value:
+                chosen = alternative
+            else:
+                chosen = consequence
+            if chosen is None:
+                chosen = BlockStatement(token=node.token, statements=[])
+            if len(chosen.statements) == 1 and isinstance(chosen.statements[0], ExpressionStatement):
+                return chosen.statements[0].expression
+            return IfExpression(
+                token=node.token,
+                condition=self.fold_boolean(True),
+                consequence=chosen,
+                alternative=None)
+
+        if (condition is node.condition and consequence is node.consequence
+                and alternative is node.alternative):
+            return node
+        return IfExpression(
+            token=node.token,
+            condition=condition,
+            consequence=consequence,
+            alternative=alternative)
+
+    def fold_integer(self, value: int) -> IntegerLiteral:
+        self.folded += 1
+        return IntegerLiteral(token=Token(TokenType.INT, str(value)), value=value)
+
+    def fold_boolean(self, value: bool) -> Boolean:
+        self.folded += 1
+        if value:
+            return Boolean(token=Token(TokenType.TRUE, 'true'), value=True)
+        return Boolean(token=Token(TokenType.FALSE, 'false'), value=False)
+
+    def is_constant(self, node: Optional[Node]) -> bool:
+        return isinstance(node, (IntegerLiteral, Boolean))
+
+    def is_constant_statement(self, stmt: Statement) -> bool:
+        return isinstance(stmt, ExpressionStatement) and self.is_constant(stmt.expression)
+
+    def is_double_bang_of_boolean(self, node: Optional[Node]) -> bool:
+        if not isinstance(node, PrefixExpression) or node.operator != '!':
+            return False
+        # Only ! is sure to give a boolean: comparisons of arrays give arrays.
+        inner = node.right
+        return isinstance(inner, PrefixExpression) and inner.operator == '!'
+
+
+def count_nodes(node: Optional[Node]) -> int:
+    # iterative, so it also sizes trees too deep to optimize
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        count += 1
+        if isinstance(node, LazyBlockStatement) and not node.parsed:
+            continue
+        elif isinstance(node, (Program, BlockStatement)):
+            stack.extend(node.statements)
+        elif isinstance(node, ExpressionStatement):
+            stack.append(node.expression)
+        elif isinstance(node, LetStatement):
+            stack.append(node.name)
+            stack.append(node.value)
+        elif isinstance(node, ReturnStatement):
+            stack.append(node.return_value)
+        elif isinstance(node, PrefixExpression):
+            stack.append(node.right)
+        elif isinstance(node, InfixExpression):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, IfExpression):
+            stack.append(node.condition)
+            stack.append(node.consequence)
+            stack.append(node.alternative)
+        elif isinstance(node, FunctionLiteral):
+            stack.extend(node.parameters or ())
+            stack.append(node.body)
+        elif isinstance(node, CallExpression):
+            stack.append(node.function)
+            stack.extend(node.arguments or ())
+        elif isinstance(node, ArrayLiteral):
+            stack.extend(node.elements or ())
+        elif isinstance(node, IndexExpression):
+            stack.append(node.left)
+            stack.append(node.index)
+    return count
+
+
+def optimize(program: Program) -> Tuple[Program, OptimizationReport]:
+    optimizer = Optimizer()
+    nodes_before = count_nodes(program)
+    try:
+        optimized = optimizer.optimize(program)
+    except RecursionError:
+        # the rewrite is recursive; trees nested too deeply for it run as parsed
+        return program, OptimizationReport(nodes_before, nodes_before, 0, 0)
+    report = OptimizationReport(
+        nodes_before=nodes_before,
+        nodes_after=count_nodes(optimized),
+        folded=optimizer.folded,
+        pruned=optimizer.pruned)
+    return optimized, report
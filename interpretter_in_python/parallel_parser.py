@@ -0,0 +1,103 @@
+import gc
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from lexer import Lexer, SourceWindow
+from monkey_parser import Parser
+from program_cache import ProgramEncoder, ProgramDecoder
+from ast_type import Program, Statement
+
+# sources smaller than this are not worth a process pool
+DEFAULT_PIECE_SIZE = 1 << 20
+
+# A piece may end after a semicolon that ends a line outside any brackets.
+# Monkey has no strings or comments, so every bracket character is a token.
+boundary_pattern = re.compile(r"(?P<OPEN>[(\[{])|(?P<CLOSE>[)\]}])|(?P<END>;[ \t\r]*\n)")
+
+
+def split_source(source: str, piece_size: int = DEFAULT_PIECE_SIZE) -> List[SourceWindow]:
+    # Cuts source into pieces of whole lines, each at least piece_size long
+    # except the last. A cut is only a guess at a statement boundary: a
+    # piece that parses without errors proves the guess right.
+    pieces = []
+    start = 0
+    line = 1
+    depth = 0
+    for match in boundary_pattern.finditer(source):
+        kind = match.lastgroup
+        if kind == 'OPEN':
+            depth += 1
+        elif kind == 'CLOSE':
+            depth -= 1
+        elif depth == 0 and match.end() - start >= piece_size:
+            pieces.append(window(source, start, match.end(), line))
+            line += pieces[-1].count('\n')
+            start = match.end()
+    if start < len(source) or not pieces:
+        pieces.append(window(source, start, len(source), line))
+    return pieces
+
+
+def window(source: str, start: int, end: int, first_line: int) -> SourceWindow:
+    piece = SourceWindow(source[start:end])
+    piece.first_line = first_line
+    return piece
+
+
+def parse_piece(piece: SourceWindow) -> Tuple[Optional[bytes], List[str]]:
+    # Runs in a worker. The tree goes back in the program cache's encoding,
+    # which is far quicker to move between processes than a pickled tree;
+    # None asks the caller to parse the piece itself.
+    parser = Parser(Lexer(piece))
+    program = parser.parse_program()
+    if parser.errors:
+        return None, parser.errors
+    try:
+        return ProgramEncoder().encode(program), []
+    except RecursionError:
+        return None, []
+
+
+def parse_rest(pieces: List[SourceWindow]) -> Tuple[List[Statement], List[str]]:
+    rest = SourceWindow(''.join(pieces))
+    rest.first_line = pieces[0].first_line
+    parser = Parser(Lexer(rest))
+    return parser.parse_program().statements, parser.errors
+
+
+def decode_piece(payload: bytes) -> List[Statement]:
+    # see program_cache.read_cache
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return ProgramDecoder(payload).decode().statements
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def parse_parallel(source: str, workers: Optional[int] = None,
+                   piece_size: int = DEFAULT_PIECE_SIZE) -> Tuple[Program, List[str]]:
+    # Parses the pieces of source on a pool of worker processes and joins
+    # their statements in order. Pieces before the first one with errors
+    # end on statement boundaries, so from there on the source is parsed
+    # again in one go, and the errors are exactly the sequential parser's.
+    workers = workers or os.cpu_count() or 1
+    pieces = split_source(source, piece_size)
+    if workers == 1 or len(pieces) == 1:
+        parser = Parser(Lexer(source))
+        return parser.parse_program(), parser.errors
+
+    statements: List[Statement] = []
+    with ProcessPoolExecutor(min(workers, len(pieces))) as pool:
+        for i, (payload, errors) in enumerate(pool.map(parse_piece, pieces)):
+            if errors:
+                rest, errors = parse_rest(pieces[i:])
+                statements.extend(rest)
+                return Program(statements=statements), errors
+            if payload is None:
+                statements.extend(parse_rest(pieces[i: i + 1])[0])
+            else:
+                statements.extend(decode_piece(payload))
+    return Program(statements=statements), []
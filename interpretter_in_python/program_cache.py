@@ -0,0 +1,377 @@
+import gc
+import os
+import sys
+import zlib
+import struct
+import stat
+import marshal
+import hashlib
+import tempfile
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from token_type import Token, TokenType
+from lexer import Lexer, SourceWindow, file_chunks
+from monkey_parser import Parser
+from ast_arena import NodeKind, token_types, token_type_codes
+from ast_type import (Node,
+                      Program,
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      Identifier,
+                      IntegerLiteral,
+                      Boolean,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
+
+CACHE_DIR = '__monkeycache__'
+MAGIC = b'MKYC'
+# bump whenever the encoding below or the shape of ast_type changes
+FORMAT_VERSION = 2
+
+# magic, format version, python major/minor, sha256 of the source, payload size
+header = struct.Struct('<4sHBB32sQ')
+
+
+class ProgramEncoder:
+    # Flattens a Program into a preorder stream of ints: each node is its
+    # NodeKind, a token index, then its children (0 stands for a missing
+    # node, lists are prefixed by their length). Tokens are stored as
+    # (type, source, start, length) rows next to the source strings they
+    # point into, so decoding rebuilds the same spans.
+    def __init__(self):
+        self.nodes = array('i')
+        self.tokens = array('i')
+        self.token_index: Dict[int, int] = {}
+        self.sources: List[str] = []
+        self.source_index: Dict[int, int] = {}
+        self.ints: List[int] = []
+
+    def encode(self, program: Program) -> bytes:
+        self.encode_node(program)
+        first_lines = [getattr(source, 'first_line', 0) for source in self.sources]
+        return zlib.compress(marshal.dumps((
+            [str(source) for source in self.sources],
+            first_lines,
+            self.tokens.tobytes(),
+            self.nodes.tobytes(),
+            self.ints)), 1)
+
+    def add_token(self, token: Token) -> int:
+        if (index := self.token_index.get(id(token))) is not None:
+            return index
+        if (source := self.source_index.get(id(token.source))) is None:
+            source = self.source_index[id(token.source)] = len(self.sources)
+            self.sources.append(token.source)
+        index = self.token_index[id(token)] = len(self.tokens) // 4
+        self.tokens.extend((token_type_codes[token.type], source, token.start, token.length))
+        return index
+
+    def encode_node(self, node: Optional[Node]):
+        emit = self.nodes.append
+        if node is None:
+            emit(0)
+        elif isinstance(node, Program):
+            emit(NodeKind.PROGRAM)
+            self.encode_list(node.statements)
+        elif isinstance(node, ExpressionStatement):
+            emit(NodeKind.EXPRESSION_STATEMENT)
+            emit(self.add_token(node.token))
+            self.encode_node(node.expression)
+        elif isinstance(node, IntegerLiteral):
+            emit(NodeKind.INTEGER_LITERAL)
+            emit(self.add_token(node.token))
+            emit(len(self.ints))
+            self.ints.append(node.value)
+        elif isinstance(node, (Identifier, Boolean)):
+            emit(NodeKind.IDENTIFIER if isinstance(node, Identifier) else NodeKind.BOOLEAN)
+            emit(self.add_token(node.token))
+        elif isinstance(node, PrefixExpression):
+            emit(NodeKind.PREFIX_EXPRESSION)
+            emit(self.add_token(node.token))
+            self.encode_node(node.right)
+        elif isinstance(node, InfixExpression):
+            emit(NodeKind.INFIX_EXPRESSION)
+            emit(self.add_token(node.token))
+            self.encode_node(node.left)
+            self.encode_node(node.right)
+        elif isinstance(node, LetStatement):
+            emit(NodeKind.LET_STATEMENT)
+            emit(self.add_token(node.token))
+            self.encode_node(node.name)
+            self.encode_node(node.value)
+        elif isinstance(node, ReturnStatement):
+            emit(NodeKind.RETURN_STATEMENT)
+            emit(self.add_token(node.token))
+            self.encode_node(node.return_value)
+        elif isinstance(node, BlockStatement):
+            emit(NodeKind.BLOCK_STATEMENT)
+            emit(self.add_token(node.token))
+            self.encode_list(node.statements)
+        elif isinstance(node, IfExpression):
+            emit(NodeKind.IF_EXPRESSION)
+            emit(self.add_token(node.token))
+            self.encode_node(node.condition)
+            self.encode_node(node.consequence)
+            self.encode_node(node.alternative)
+        elif isinstance(node, FunctionLiteral):
+            emit(NodeKind.FUNCTION_LITERAL)
+            emit(self.add_token(node.token))
+            self.encode_list(node.parameters)
+            self.encode_node(node.body)
+        elif isinstance(node, CallExpression):
+            emit(NodeKind.CALL_EXPRESSION)
+            emit(self.add_token(node.token))
+            self.encode_node(node.function)
+            self.encode_list(node.arguments)
+        elif isinstance(node, ArrayLiteral):
+            emit(NodeKind.ARRAY_LITERAL)
+            emit(self.add_token(node.token))
+            self.encode_list(node.elements)
+        elif isinstance(node, IndexExpression):
+            emit(NodeKind.INDEX_EXPRESSION)
+            emit(self.add_token(node.token))
+            self.encode_node(node.left)
+            self.encode_node(node.index)
+        else:
+            raise TypeError(f"cannot encode {type(node).__name__}")
+
+    def encode_list(self, nodes: List[Node]):
+        self.nodes.append(len(nodes))
+        for node in nodes:
+            self.encode_node(node)
+
+
+class ProgramDecoder:
+    def __init__(self, payload: bytes):
+        texts, first_lines, token_bytes, node_bytes, self.ints = marshal.loads(zlib.decompress(payload))
+
+        sources = []
+        for text, first_line in zip(texts, first_lines):
+            if first_line:
+                text = SourceWindow(text)
+                text.first_line = first_line
+            sources.append(text)
+
+        rows = array('i')
+        rows.frombytes(token_bytes)
+        rows = rows.tolist()
+        types = [token_types[code] for code in rows[0::4]]
+        self.tokens = list(map(Token, types, [sources[i] for i in rows[1::4]], rows[2::4], rows[3::4]))
+
+        nodes = array('i')
+        nodes.frombytes(node_bytes)
+        self.stream = iter(nodes.tolist())
+        self.next = self.stream.__next__
+        self.decoders = {
+            NodeKind.EXPRESSION_STATEMENT.value: self.decode_expression_statement,
+            NodeKind.INTEGER_LITERAL.value: self.decode_integer_literal,
+            NodeKind.IDENTIFIER.value: self.decode_identifier,
+            NodeKind.BOOLEAN.value: self.decode_boolean,
+            NodeKind.PREFIX_EXPRESSION.value: self.decode_prefix_expression,
+            NodeKind.INFIX_EXPRESSION.value: self.decode_infix_expression,
+            NodeKind.LET_STATEMENT.value: self.decode_let_statement,
+            NodeKind.RETURN_STATEMENT.value: self.decode_return_statement,
+            NodeKind.BLOCK_STATEMENT.value: self.decode_block_statement,
+            NodeKind.IF_EXPRESSION.value: self.decode_if_expression,
+            NodeKind.FUNCTION_LITERAL.value: self.decode_function_literal,
+            NodeKind.CALL_EXPRESSION.value: self.decode_call_expression,
+            NodeKind.ARRAY_LITERAL.value: self.decode_array_literal,
+            NodeKind.INDEX_EXPRESSION.value: self.decode_index_expression,
+        }
+
+    def decode(self) -> Program:
+        if self.next() != NodeKind.PROGRAM:
+            raise ValueError("malformed program encoding")
+        program = Program(self.decode_list())
+        if next(self.stream, None) is not None:
+            raise ValueError("malformed program encoding")
+        return program
+
+    def decode_node(self) -> Optional[Node]:
+        kind = self.next()
+        if kind == 0:
+            return None
+        return self.decoders[kind](self.tokens[self.next()])
+
+    def decode_list(self) -> list:
+        decode_node = self.decode_node
+        return [decode_node() for _ in range(self.next())]
+
+    def decode_expression_statement(self, token: Token) -> ExpressionStatement:
+        return ExpressionStatement(token, self.decode_node())
+
+    def decode_integer_literal(self, token: Token) -> IntegerLiteral:
+        return IntegerLiteral(token, self.ints[self.next()])
+
+    def decode_identifier(self, token: Token) -> Identifier:
+        return Identifier(token, token.literal)
+
+    def decode_boolean(self, token: Token) -> Boolean:
+        return Boolean(token, token.type == TokenType.TRUE)
+
+    def decode_prefix_expression(self, token: Token) -> PrefixExpression:
+        return PrefixExpression(token, token.literal, self.decode_node())
+
+    def decode_infix_expression(self, token: Token) -> InfixExpression:
+        left = self.decode_node()
+        return InfixExpression(token, left, token.literal, self.decode_node())
+
+    def decode_let_statement(self, token: Token) -> LetStatement:
+        name = self.decode_node()
+        return LetStatement(token, name, self.decode_node())
+
+    def decode_return_statement(self, token: Token) -> ReturnStatement:
+        return ReturnStatement(token, self.decode_node())
+
+    def decode_block_statement(self, token: Token) -> BlockStatement:
+        return BlockStatement(token, self.decode_list())
+
+    def decode_if_expression(self, token: Token) -> IfExpression:
+        condition = self.decode_node()
+        consequence = self.decode_node()
+        return IfExpression(token, condition, consequence, self.decode_node())
+
+    def decode_function_literal(self, token: Token) -> FunctionLiteral:
+        parameters = self.decode_list()
+        return FunctionLiteral(token, parameters, self.decode_node())
+
+    def decode_call_expression(self, token: Token) -> CallExpression:
+        function = self.decode_node()
+        return CallExpression(token, function, self.decode_list())
+
+    def decode_array_literal(self, token: Token) -> ArrayLiteral:
+        return ArrayLiteral(token, self.decode_list())
+
+    def decode_index_expression(self, token: Token) -> IndexExpression:
+        left = self.decode_node()
+        return IndexExpression(token, left, self.decode_node())
+
+
+def hashed_chunks(chunks: Iterable[str], digest) -> Iterator[str]:
+    # the digest is of the text as the lexer reads it, newlines translated
+    for chunk in chunks:
+        digest.update(chunk.encode('utf-8'))
+        yield chunk
+
+
+def source_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    for _ in hashed_chunks(file_chunks(path), digest):
+        pass
+    return digest.digest()
+
+
+def is_regular_file(path: str) -> bool:
+    # a pipe or device can only be read once, and has no name to cache under
+    try:
+        return stat.S_ISREG(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def cache_path(path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR, f"{name}.mkc")
+
+
+def expected_header(digest: bytes, size: int) -> bytes:
+    return header.pack(MAGIC, FORMAT_VERSION, sys.version_info[0], sys.version_info[1], digest, size)
+
+
+def read_cache(cache_file: str, digest: bytes) -> Optional[Program]:
+    try:
+        with open(cache_file, 'rb') as f:
+            head = f.read(header.size)
+            if len(head) != header.size:
+                return None
+            size = header.unpack(head)[-1]
+            if head != expected_header(digest, size):
+                return None
+            payload = f.read()
+    except OSError:
+        return None
+
+    if len(payload) != size:
+        return None
+
+    # The decoded tree is acyclic; pausing the cyclic GC stops it from
+    # rescanning the growing heap on every allocation threshold.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return ProgramDecoder(payload).decode()
+    except Exception:
+        # anything unexpected in the payload means we parse instead
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def write_cache(cache_file: str, digest: bytes, program: Program) -> bool:
+    try:
+        payload = ProgramEncoder().encode(program)
+    except (TypeError, ValueError, OverflowError, RecursionError):
+        return False
+
+    directory = os.path.dirname(cache_file)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(expected_header(digest, len(payload)))
+            f.write(payload)
+        # readers see either the old file or the complete new one
+        os.replace(tmp, cache_file)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load_program(path: str, use_cache: bool = True, lazy: bool = False,
+                 parse: Optional[Callable[[str], Tuple[Program, List[str]]]] = None) -> Tuple[Program, List[str]]:
+    # Parses the script at path, reusing the cached Program when the source
+    # hash and versions match. Only regular files are cached, and programs
+    # with parse errors never are.
+    # A lazy parse skips the cache both ways: it is the whole tree. parse,
+    # say parallel_parser.parse_parallel, parses the whole text at once
+    # instead of streaming it.
+    if lazy:
+        parser = Parser(Lexer.from_file(path), lazy=True)
+        return parser.parse_program(), parser.errors
+
+    use_cache = use_cache and is_regular_file(path)
+    if use_cache:
+        digest = source_digest(path)
+        cache_file = cache_path(path)
+        if (program := read_cache(cache_file, digest)) is not None:
+            return program, []
+
+    # The text parsed is hashed again as it is read: the file may have
+    # changed since, and its program must not be cached under the old hash.
+    parsed_digest = hashlib.sha256()
+    chunks = hashed_chunks(file_chunks(path), parsed_digest)
+    if parse is None:
+        parser = Parser(Lexer.from_chunks(chunks))
+        program, errors = parser.parse_program(), parser.errors
+    else:
+        program, errors = parse(''.join(chunks))
+
+    if use_cache and not errors and parsed_digest.digest() == digest:
+        write_cache(cache_file, digest, program)
+    return program, errors
@@ -0,0 +1,563 @@
+import ast
+import sys
+import weakref
+from collections import OrderedDict
+from types import CodeType
+from typing import Callable, Dict, List, Optional, Tuple
+from compiler import CompileError
+from resolver import Resolver
+from monkey_builtins import builtins
+from object import Object, Integer, Error, Function, TRUE, FALSE, NULL, int_div
+from environment import Environment
+import evaluator
+from ast_type import (Program,
+                      LetStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      Expression,
+                      Identifier,
+                      IntegerLiteral,
+                      Boolean,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      ReturnStatement,
+                      CallExpression)
+
+CODE_CACHE_SIZE = 256
+
+# Static types of compiled expressions. Inside the generated code integers
+# are Python ints, booleans are Python bools and null is None; ANY is a value
+# whose type is only known at run time.
+INT = 'int'
+BOOL = 'bool'
+NULL_TYPE = 'null'
+ANY = None
+
+
+class ExecutionError(Exception):
+    pass
+
+
+class Unbound:
+    # the value of a global slot no let has filled in yet
+    def __repr__(self) -> str:
+        return 'UNBOUND'
+
+
+UNBOUND = Unbound()
+
+
+def raw(obj: Object):
+    # the generated code's form of a Monkey value; objects without a Python
+    # counterpart, like functions and arrays, stay as they are
+    if type(obj) is Integer:
+        return obj.value
+    elif obj is TRUE:
+        return True
+    elif obj is FALSE:
+        return False
+    elif obj is NULL:
+        return None
+    return obj
+
+
+def to_object(value) -> Optional[Object]:
+    if value is None:
+        return NULL
+    elif value is True:
+        return TRUE
+    elif value is False:
+        return FALSE
+    elif type(value) is int:
+        return Integer(value)
+    return value
+
+
+def checked(result: Object):
+    if type(result) is Error:
+        raise ExecutionError(result.message)
+    return raw(result)
+
+
+def object_infix(operator: str, left, right):
+    # anything but two ints is left to the evaluator, so errors read the same
+    # and arrays reaching compiled function bodies keep their bulk operators
+    return checked(evaluator.eval_infix_expression(operator, to_object(left), to_object(right)))
+
+
+# the types of plain values in the generated code
+plain_types = (int, bool, type(None))
+
+
+# Run-time checked operators for operands whose types are not known to be
+# integers. Each returns an int or a bool for plain values, or raises like
+# the evaluator would report.
+
+def add(left, right):
+    if type(left) is int and type(right) is int:
+        return left + right
+    return object_infix('+', left, right)
+
+
+def sub(left, right):
+    if type(left) is int and type(right) is int:
+        return left - right
+    return object_infix('-', left, right)
+
+
+def mul(left, right):
+    if type(left) is int and type(right) is int:
+        return left * right
+    return object_infix('*', left, right)
+
+
+def div(left, right):
+    if type(left) is int and type(right) is int and right != 0:
+        return int_div(left, right)
+    return object_infix('/', left, right)
+
+
+def lt(left, right):
+    if type(left) is int and type(right) is int:
+        return left < right
+    return object_infix('<', left, right)
+
+
+def gt(left, right):
+    if type(left) is int and type(right) is int:
+        return left > right
+    return object_infix('>', left, right)
+
+
+def eq(left, right):
+    # values of different Monkey types are never equal; bools are ints in Python
+    if type(left) is type(right) and type(left) in plain_types:
+        return left == right
+    return object_infix('==', left, right)
+
+
+def ne(left, right):
+    if type(left) is type(right) and type(left) in plain_types:
+        return left != right
+    return object_infix('!=', left, right)
+
+
+def neg(right):
+    if type(right) is int:
+        return -right
+    return checked(evaluator.eval_prefix_expression('-', to_object(right)))
+
+
+def truthy(value) -> bool:
+    return value is not False and value is not None
+
+
+def bang(value) -> bool:
+    return value is False or value is None
+
+
+def unbound(name: str):
+    builtin = builtins.get(name)
+    if builtin is None:
+        raise ExecutionError(f"identifier not found: {name}")
+    return builtin
+
+
+def load(env: Environment, depth: int, slot: int, name: str):
+    # a free variable of a compiled function body, read when it is used as
+    # the evaluator does, so lets made after the function was created count
+    value = env.get(depth, slot)
+    if value is None:
+        return unbound(name)
+    return raw(value)
+
+
+def apply(function, *arguments):
+    return checked(evaluator.apply_function(to_object(function), [to_object(a) for a in arguments]))
+
+
+def tail_call(function, *arguments) -> evaluator.TailCall:
+    return evaluator.TailCall(to_object(function), [to_object(a) for a in arguments])
+
+helpers = {f.__name__: f for f in (add, sub, mul, div, lt, gt, eq, ne, neg, truthy, bang, unbound,
+                                   load, apply, tail_call, raw, to_object)}
+
+checked_operators = {
+    '+': 'add',
+    '-': 'sub',
+    '*': 'mul',
+    '/': 'div',
+    '<': 'lt',
+    '>': 'gt',
+    '==': 'eq',
+    '!=': 'ne',
+}
+
+native_arithmetic = {
+    '+': ast.Add,
+    '-': ast.Sub,
+    '*': ast.Mult,
+}
+
+native_comparisons = {
+    '<': ast.Lt,
+    '>': ast.Gt,
+    '==': ast.Eq,
+    '!=': ast.NotEq,
+}
+
+
+def name(identifier: str) -> ast.Name:
+    return ast.Name(id=identifier, ctx=ast.Load())
+
+
+def call(helper: str, *args: ast.expr) -> ast.Call:
+    return ast.Call(func=name(helper), args=list(args), keywords=[])
+
+
+def store(identifier: str) -> ast.Name:
+    return ast.Name(id=identifier, ctx=ast.Store())
+
+
+def function_module(function_name: str, parameters: List[str], body: List[ast.stmt]) -> ast.Module:
+    function = ast.FunctionDef(
+        name=function_name,
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=p) for p in parameters], vararg=None,
+                           kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+        body=body,
+        decorator_list=[],
+        returns=None,
+        **({'type_params': []} if sys.version_info >= (3, 12) else {}))
+    return ast.Module(body=[function], type_ignores=[])
+
+
+def slot_name(slot: int) -> str:
+    # Monkey names never contain digits, but slots avoid clashing with
+    # Python keywords and the helpers
+    return f"s{slot}"
+
+
+class PythonCompiler:
+    # Translates the expression subset of Monkey, plus global lets, into the
+    # body of one Python function. Where both operands of an operator are
+    # statically integers it becomes the native Python operator; everything
+    # else goes through the checked helpers above.
+    #
+    # A program only ever holds plain values, so a checked operator's result
+    # type is known even when its operands' are not.
+    plain_values = True
+
+    def __init__(self, slot_count: int):
+        self.slot_count = slot_count
+
+    def compile_program(self, program: Program) -> ast.Module:
+        body: List[ast.stmt] = []
+        if self.slot_count:
+            body.append(ast.Assign(
+                targets=[ast.Name(id=slot_name(s), ctx=ast.Store()) for s in range(self.slot_count)],
+                value=name('UNBOUND')))
+
+        stmts = program.statements
+        for i, stmt in enumerate(stmts):
+            last = i == len(stmts) - 1
+            if isinstance(stmt, LetStatement):
+                value, _ = self.compile_expression(stmt.value)
+                body.append(ast.Assign(
+                    targets=[ast.Name(id=slot_name(stmt.name.slot), ctx=ast.Store())], value=value))
+                if last:
+                    body.append(ast.Return(value=ast.Constant(value=None)))
+            elif isinstance(stmt, ExpressionStatement):
+                value, _ = self.compile_expression(stmt.expression)
+                body.append(ast.Return(value=value) if last else ast.Expr(value=value))
+            else:
+                raise CompileError(f"unsupported node: {type(stmt).__name__}")
+        if not stmts:
+            body.append(ast.Return(value=ast.Constant(value=None)))
+
+        return function_module('program', [], body)
+
+    def compile_expression(self, node: Optional[Expression]) -> Tuple[ast.expr, Optional[str]]:
+        # returns the Python expression and its static type
+        if isinstance(node, IntegerLiteral):
+            return ast.Constant(value=node.value), INT
+        elif isinstance(node, Boolean):
+            return ast.Constant(value=node.value), BOOL
+        elif isinstance(node, Identifier):
+            return self.compile_identifier(node), ANY
+        elif isinstance(node, PrefixExpression):
+            return self.compile_prefix_expression(node)
+        elif isinstance(node, InfixExpression):
+            return self.compile_infix_expression(node)
+        elif isinstance(node, IfExpression):
+            return self.compile_if_expression(node)
+        raise CompileError(f"unsupported node: {type(node).__name__}")
+
+    def compile_identifier(self, node: Identifier) -> ast.expr:
+        if node.depth != 0 or node.slot < 0:
+            raise CompileError(f"unsupported identifier: {node.value}")
+        if node.value in builtins:
+            raise CompileError(f"unsupported builtin: {node.value}")
+        # s if s is not UNBOUND else unbound(name)
+        slot = name(slot_name(node.slot))
+        return ast.IfExp(
+            test=ast.Compare(left=slot, ops=[ast.IsNot()], comparators=[name('UNBOUND')]),
+            body=slot,
+            orelse=call('unbound', ast.Constant(value=node.value)))
+
+    def compile_prefix_expression(self, node: PrefixExpression) -> Tuple[ast.expr, Optional[str]]:
+        right, right_type = self.compile_expression(node.right)
+        if node.operator == '-':
+            if right_type == INT:
+                return ast.UnaryOp(op=ast.USub(), operand=right), INT
+            return call('neg', right), self.result_type(INT, right_type)
+        elif node.operator == '!':
+            if right_type == BOOL:
+                return ast.UnaryOp(op=ast.Not(), operand=right), BOOL
+            return call('bang', right), BOOL
+        raise CompileError(f"unknown operator: {node.operator}")
+
+    def compile_infix_expression(self, node: InfixExpression) -> Tuple[ast.expr, Optional[str]]:
+        operator = node.operator
+        if operator not in checked_operators:
+            raise CompileError(f"unknown operator: {operator}")
+        left, left_type = self.compile_expression(node.left)
+        right, right_type = self.compile_expression(node.right)
+        result_type = BOOL if operator in native_comparisons else INT
+
+        if left_type == INT and right_type == INT:
+            if operator in native_arithmetic:
+                return ast.BinOp(left=left, op=native_arithmetic[operator](), right=right), INT
+            elif operator in native_comparisons:
+                return ast.Compare(left=left, ops=[native_comparisons[operator]()], comparators=[right]), BOOL
+        elif left_type == BOOL and right_type == BOOL and operator in ('==', '!='):
+            # the two bools are singletons, as TRUE and FALSE are
+            op = ast.Is() if operator == '==' else ast.IsNot()
+            return ast.Compare(left=left, ops=[op], comparators=[right]), BOOL
+        return call(checked_operators[operator], left, right), self.result_type(result_type, left_type, right_type)
+
+    def result_type(self, result_type: str, *operand_types: Optional[str]) -> Optional[str]:
+        # an operand that may be an object, like an array, may give one back
+        if self.plain_values or ANY not in operand_types:
+            return result_type
+        return ANY
+
+    def compile_if_expression(self, node: IfExpression) -> Tuple[ast.expr, Optional[str]]:
+        condition, condition_type = self.compile_expression(node.condition)
+        if condition_type != BOOL:
+            condition = call('truthy', condition)
+
+        consequence, consequence_type = self.compile_block(node.consequence)
+        if node.alternative is None:
+            alternative, alternative_type = ast.Constant(value=None), NULL_TYPE
+        else:
+            alternative, alternative_type = self.compile_block(node.alternative)
+
+        result_type = consequence_type if consequence_type == alternative_type else ANY
+        return ast.IfExp(test=condition, body=consequence, orelse=alternative), result_type
+
+    def compile_block(self, block: BlockStatement) -> Tuple[ast.expr, Optional[str]]:
+        # A block is the tuple of its statements' values, indexed by -1. Lets
+        # become assignment expressions; a block ending in one is null.
+        values: List[ast.expr] = []
+        value_type = NULL_TYPE
+        for stmt in block.statements:
+            if isinstance(stmt, LetStatement):
+                value, _ = self.compile_expression(stmt.value)
+                values.append(ast.NamedExpr(
+                    target=ast.Name(id=slot_name(stmt.name.slot), ctx=ast.Store()), value=value))
+                value_type = NULL_TYPE
+            elif isinstance(stmt, ExpressionStatement):
+                value, value_type = self.compile_expression(stmt.expression)
+                values.append(value)
+            else:
+                raise CompileError(f"unsupported node: {type(stmt).__name__}")
+
+        if values and value_type == NULL_TYPE:
+            values.append(ast.Constant(value=None))
+        if not values:
+            return ast.Constant(value=None), NULL_TYPE
+        elif len(values) == 1:
+            return values[0], value_type
+        last = ast.Constant(value=-1)
+        if sys.version_info < (3, 9):
+            last = ast.Index(value=last)
+        return ast.Subscript(value=ast.Tuple(elts=values, ctx=ast.Load()), slice=last, ctx=ast.Load()), value_type
+
+
+class FunctionCompiler(PythonCompiler):
+    # Translates the body of a Monkey function into
+    #
+    #   def body(function, arguments): ...
+    #
+    # which returns what evaluating the body would: a Monkey object, or a
+    # TailCall for a call in tail position, so evaluator.apply_function can
+    # run it in place of the tree. Parameters and lets are Python locals and
+    # free variables are read from function.env. Calls go back through
+    # evaluator.apply_function, so they may reach any function, compiled or
+    # not, and arguments and results may be any object.
+    plain_values = False
+
+    def __init__(self, function: Function):
+        super().__init__(function.slot_count)
+        self.function = function
+        self.parameters = {p.slot for p in function.parameters}
+
+    def compile_function(self) -> ast.Module:
+        body: List[ast.stmt] = [ast.Assign(targets=[store('env')], value=ast.Attribute(
+            value=name('function'), attr='env', ctx=ast.Load()))]
+        lets = [slot_name(s) for s in range(self.slot_count) if s not in self.parameters]
+        if lets:
+            body.append(ast.Assign(targets=[store(n) for n in lets], value=name('UNBOUND')))
+        if self.function.parameters:
+            body.append(ast.Assign(
+                targets=[ast.Tuple(elts=[store(slot_name(p.slot)) for p in self.function.parameters],
+                                   ctx=ast.Store())],
+                value=call('map', name('raw'), name('arguments'))))
+        body.extend(self.compile_statements(self.function.body.statements, True))
+        return function_module('body', ['function', 'arguments'], body)
+
+    def compile_statements(self, stmts: list, tail: bool) -> List[ast.stmt]:
+        # Statements of a block whose value is either returned (tail) or
+        # dropped. Ifs among them become if statements, so returns inside
+        # their blocks return from the function.
+        body: List[ast.stmt] = []
+        for i, stmt in enumerate(stmts):
+            last = tail and i == len(stmts) - 1
+            if isinstance(stmt, LetStatement):
+                value, _ = self.compile_expression(stmt.value)
+                body.append(ast.Assign(targets=[store(slot_name(stmt.name.slot))], value=value))
+                if last:
+                    body.append(ast.Return(value=name('NULL')))
+            elif isinstance(stmt, ReturnStatement):
+                body.append(ast.Return(value=self.compile_result(stmt.return_value)))
+            elif isinstance(stmt, ExpressionStatement) and isinstance(stmt.expression, IfExpression):
+                body.append(self.compile_if_statement(stmt.expression, last))
+            elif isinstance(stmt, ExpressionStatement):
+                if last:
+                    body.append(ast.Return(value=self.compile_result(stmt.expression)))
+                else:
+                    body.append(ast.Expr(value=self.compile_expression(stmt.expression)[0]))
+            else:
+                raise CompileError(f"unsupported node: {type(stmt).__name__}")
+        if tail and not stmts:
+            body.append(ast.Return(value=name('NULL')))
+        return body
+
+    def compile_if_statement(self, node: IfExpression, tail: bool) -> ast.If:
+        condition, condition_type = self.compile_expression(node.condition)
+        if condition_type != BOOL:
+            condition = call('truthy', condition)
+        consequence = self.compile_statements(node.consequence.statements, tail)
+        if node.alternative is not None:
+            alternative = self.compile_statements(node.alternative.statements, tail)
+        else:
+            alternative = [ast.Return(value=name('NULL'))] if tail else []
+        return ast.If(test=condition, body=consequence or [ast.Pass()], orelse=alternative)
+
+    def compile_result(self, node: Optional[Expression]) -> ast.expr:
+        # the value the function returns; a call here is a tail call
+        if isinstance(node, CallExpression):
+            return self.compile_call_expression(node, 'tail_call')
+        return call('to_object', self.compile_expression(node)[0])
+
+    def compile_expression(self, node: Optional[Expression]) -> Tuple[ast.expr, Optional[str]]:
+        if isinstance(node, CallExpression):
+            return self.compile_call_expression(node, 'apply'), ANY
+        return super().compile_expression(node)
+
+    def compile_call_expression(self, node: CallExpression, helper: str) -> ast.expr:
+        function, _ = self.compile_expression(node.function)
+        arguments = [self.compile_expression(argument)[0] for argument in node.arguments or ()]
+        return call(helper, function, *arguments)
+
+    def compile_identifier(self, node: Identifier) -> ast.expr:
+        if node.slot < 0:
+            raise CompileError(f"unsupported identifier: {node.value}")
+        elif node.depth > 0:
+            return call('load', name('env'), ast.Constant(value=node.depth - 1),
+                        ast.Constant(value=node.slot), ast.Constant(value=node.value))
+        elif node.slot in self.parameters:
+            return name(slot_name(node.slot))
+        slot = name(slot_name(node.slot))
+        return ast.IfExp(
+            test=ast.Compare(left=slot, ops=[ast.IsNot()], comparators=[name('UNBOUND')]),
+            body=slot,
+            orelse=call('unbound', ast.Constant(value=node.value)))
+
+
+class CodeCache:
+    # Compiled programs keyed by the identity of their Program, so running
+    # the same tree again skips resolving, translating and compiling it; a
+    # tree parsed again from the same source is a new program. The least
+    # recently used entry is evicted first. Entries hold their program
+    # weakly and go when it does, before its id can be reused.
+    def __init__(self, maxsize: int = CODE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, program: Program) -> Optional[Callable[[], object]]:
+        entry = self.entries.get(id(program))
+        if entry is None or entry[0]() is not program:
+            return None
+        try:
+            self.entries.move_to_end(id(program))
+        except KeyError:
+            # evicted by another thread since the lookup
+            pass
+        return entry[1]
+
+    def put(self, program: Program, function: Callable[[], object]):
+        key = id(program)
+        self.entries[key] = (weakref.ref(program, lambda _: self.entries.pop(key, None)), function)
+        while len(self.entries) > self.maxsize:
+            try:
+                self.entries.popitem(last=False)
+            except KeyError:
+                break
+
+
+code_cache = CodeCache()
+
+
+def compile_code(program: Program) -> CodeType:
+    resolver = Resolver()
+    resolver.resolve_program(program)
+    module = PythonCompiler(len(resolver.globals)).compile_program(program)
+    return compile(ast.fix_missing_locations(module), '<monkey>', 'exec')
+
+
+def compile_function(program: Program) -> Callable[[], object]:
+    function = code_cache.get(program)
+    if function is None:
+        namespace: Dict[str, object] = {'UNBOUND': UNBOUND, **helpers}
+        exec(compile_code(program), namespace)
+        function = namespace['program']
+        code_cache.put(program, function)
+    return function
+
+
+def compile_body(function: Function) -> Callable[[Function, List[Object]], object]:
+    # The compiled form of function's body, shared by every function made
+    # from the same literal. It raises ExecutionError where the evaluator
+    # would give an Error.
+    module = FunctionCompiler(function).compile_function()
+    namespace: Dict[str, object] = {'UNBOUND': UNBOUND, 'NULL': NULL, **helpers}
+    exec(compile(ast.fix_missing_locations(module), '<monkey>', 'exec'), namespace)
+    return namespace['body']
+
+
+def run(program: Program) -> Optional[Object]:
+    function = compile_function(program)
+    try:
+        value = function()
+    except ExecutionError as e:
+        return Error(str(e))
+    # a program that is empty or ends in a let has no value, as in the evaluator
+    stmts = program.statements
+    if not stmts or isinstance(stmts[-1], LetStatement):
+        return None
+    return to_object(value)
@@ -0,0 +1,188 @@
+from typing import Dict, List, Optional, Tuple
+from ast_type import (Node,
+                      Program,
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      LazyBlockStatement,
+                      Identifier,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
+
+
+class Scope:
+    # The names of one function body, or of the program, by their numbers in
+    # symbols.table. Blocks do not open scopes: a let inside an if block
+    # belongs to the enclosing function.
+    def __init__(self, outer: Optional['Scope'] = None):
+        self.outer = outer
+        self.slots: Dict[int, int] = {}
+        # names read from enclosing frames, by (depth, slot) from the
+        # function's closure environment
+        self.free: Dict[Tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def define(self, symbol: int) -> int:
+        slot = self.slots.get(symbol)
+        if slot is None:
+            slot = self.slots[symbol] = len(self.slots)
+        return slot
+
+
+class Resolver:
+    # Annotates every Identifier with the (depth, slot) of its binding and
+    # every FunctionLiteral with the number of slots its frame needs and the
+    # free variables it reads from the environment it closes over.
+    #
+    # Names are bound in program order, so `let x = x + 1` still reads an
+    # outer x. A name used inside a function that is not yet bound in that
+    # function is looked up in the enclosing scopes only once the whole
+    # program is resolved, because a closure sees lets that follow it.
+    # Names bound nowhere get a global slot that a later let (or a later REPL
+    # line) fills in; reading it before then is "identifier not found".
+    #
+    # A body the parser has not parsed yet is pre-resolved from the names in
+    # its token span instead: each may be a local, so the frame gets a slot
+    # for every one, and each may be free, so each is looked up outside.
+    # Parsing the body resolves it for real in the same scopes, which only
+    # ever finds fewer slots and free variables and no new globals.
+    def __init__(self, globals: Optional[Scope] = None):
+        self.globals = Scope() if globals is None else globals
+        self.scope = self.globals
+        self.free: List[Tuple[Identifier, Scope]] = []
+        self.functions: List[Tuple[FunctionLiteral, Scope]] = []
+
+    def resolve_program(self, program: Program):
+        self.resolve(program)
+        self.finish()
+
+    def finish(self):
+        for identifier, scope in self.free:
+            self.resolve_free(identifier, scope)
+        for function, scope in self.functions:
+            function.slot_count = len(scope)
+            function.free_variables = tuple(
+                (name, depth, slot) for (depth, slot), name in sorted(scope.free.items()))
+        self.free.clear()
+        self.functions.clear()
+
+    def resolve(self, node: Optional[Node]):
+        # Walks the tree in source order with an explicit stack, so deeply
+        # nested expressions do not hit the recursion limit. Children are
+        # pushed in reverse; callables on the stack run when it reaches them.
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            elif callable(node):
+                node()
+            elif isinstance(node, (Program, BlockStatement)):
+                stack.extend(reversed(node.statements))
+            elif isinstance(node, ExpressionStatement):
+                stack.append(node.expression)
+            elif isinstance(node, LetStatement):
+                # the value is resolved before the name is bound
+                stack.append(lambda let=node: self.define(let.name))
+                stack.append(node.value)
+            elif isinstance(node, ReturnStatement):
+                stack.append(node.return_value)
+            elif isinstance(node, Identifier):
+                self.resolve_identifier(node)
+            elif isinstance(node, PrefixExpression):
+                stack.append(node.right)
+            elif isinstance(node, InfixExpression):
+                stack.append(node.right)
+                stack.append(node.left)
+            elif isinstance(node, IfExpression):
+                stack.append(node.alternative)
+                stack.append(node.consequence)
+                stack.append(node.condition)
+            elif isinstance(node, FunctionLiteral):
+                if isinstance(node.body, LazyBlockStatement) and not node.body.parsed:
+                    self.pre_resolve_function(node)
+                    continue
+                stack.append(self.leave_function(node, self.scope))
+                stack.append(node.body)
+                self.enter_function(node)
+            elif isinstance(node, CallExpression):
+                stack.extend(reversed(node.arguments or ()))
+                stack.append(node.function)
+            elif isinstance(node, ArrayLiteral):
+                stack.extend(reversed(node.elements or ()))
+            elif isinstance(node, IndexExpression):
+                stack.append(node.index)
+                stack.append(node.left)
+
+    def define(self, identifier: Identifier):
+        identifier.depth = 0
+        identifier.slot = self.scope.define(identifier.symbol)
+
+    def resolve_identifier(self, node: Identifier):
+        slot = self.scope.slots.get(node.symbol)
+        if slot is not None:
+            node.depth = 0
+            node.slot = slot
+        elif self.scope is self.globals:
+            node.depth = 0
+            node.slot = self.globals.define(node.symbol)
+        else:
+            self.free.append((node, self.scope))
+
+    def enter_function(self, node: FunctionLiteral):
+        self.scope = Scope(self.scope)
+        for parameter in node.parameters or ():
+            self.define(parameter)
+
+    def leave_function(self, node: FunctionLiteral, outer: Scope):
+        def leave():
+            self.functions.append((node, self.scope))
+            self.scope = outer
+        return leave
+
+    def pre_resolve_function(self, node: FunctionLiteral):
+        outer = self.scope
+        self.enter_function(node)
+        scope = self.scope
+        for name in sorted(node.body.span.names()):
+            identifier = Identifier(token=node.token, value=name)
+            if identifier.symbol not in scope.slots:
+                scope.define(identifier.symbol)
+                self.free.append((identifier, scope))
+        self.functions.append((node, scope))
+        self.scope = outer
+
+        def resolve():
+            resolver = Resolver(self.globals)
+            resolver.scope = outer
+            resolver.resolve(node)
+            resolver.finish()
+        node.body.resolve = resolve
+
+    def resolve_free(self, node: Identifier, scope: Scope):
+        depth = 1
+        outer = scope.outer
+        while outer is not self.globals and node.symbol not in outer.slots:
+            depth += 1
+            outer = outer.outer
+        node.depth = depth
+        node.slot = outer.define(node.symbol)
+
+        # every function between the use and the binding captures the name
+        for level in range(depth):
+            scope.free[(depth - level - 1, node.slot)] = node.value
+            scope = scope.outer
+
+
+def resolve(program: Program) -> Resolver:
+    resolver = Resolver()
+    resolver.resolve_program(program)
+    return resolver
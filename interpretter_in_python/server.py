@@ -0,0 +1,144 @@
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from lexer import Lexer
+from monkey_parser import Parser
+from compiler import CompileError
+from optimizer import optimize
+from monkey_builtins import capture_output
+import evaluator
+
+PROMPT = '>>'
+GREETING = 'Hello! This is the Monkey programming language!\nFeel free to type in commands\n'
+# latencies kept per session for percentiles
+RECENT_LATENCIES = 1000
+
+
+@dataclass
+class LatencyMetrics:
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    recent: deque = field(default_factory=lambda: deque(maxlen=RECENT_LATENCIES))
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self) -> str:
+        mean = self.total_time / self.count if self.count else 0.0
+        return (f"requests={self.count} mean={mean * 1000:.3f}ms "
+                f"p50={self.percentile(50) * 1000:.3f}ms p95={self.percentile(95) * 1000:.3f}ms "
+                f"max={self.max_time * 1000:.3f}ms")
+
+
+class ClientSession:
+    # The state behind one connection: its own globals, so clients never see
+    # each other's bindings, and the latency of every line it sent.
+    def __init__(self, session_id: int, engine: Callable, optimize_ast: bool = True):
+        self.session_id = session_id
+        self.engine = engine
+        self.optimize_ast = optimize_ast
+        self.metrics = LatencyMetrics()
+
+    def execute(self, input_str: str) -> List[str]:
+        # the REPL pipeline; blocking, so the server runs it off the event
+        # loop. What puts writes comes back before the result.
+        with capture_output() as printed:
+            output = self.evaluate(input_str)
+        return printed + output
+
+    def evaluate(self, input_str: str) -> List[str]:
+        parser = Parser(Lexer(input_str=input_str))
+        program = parser.parse_program()
+
+        if parser.errors:
+            return [f"\t{e}" for e in parser.errors]
+
+        if self.optimize_ast:
+            program, _ = optimize(program)
+        try:
+            evaluated = self.engine(program)
+        except CompileError as e:
+            return [f"\t{e}"]
+        except RecursionError:
+            return ["\tnesting too deep for this engine, try --engine stack"]
+        return [evaluated.inspect()] if evaluated else []
+
+
+class ReplServer:
+    # Serves the REPL to any number of concurrent connections on one event
+    # loop. Each line is evaluated on the executor's threads, so a client
+    # stuck in a long evaluation only delays its own next prompt.
+    def __init__(self, engine_factory: Callable[[], Callable] = lambda: evaluator.Session().run,
+                 optimize_ast: bool = True, workers: Optional[int] = None):
+        self.engine_factory = engine_factory
+        self.optimize_ast = optimize_ast
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='monkey-eval')
+        self.sessions: Dict[int, ClientSession] = {}
+        self.next_session_id = 1
+
+    def open_session(self) -> ClientSession:
+        session = ClientSession(self.next_session_id, self.engine_factory(), self.optimize_ast)
+        self.sessions[session.session_id] = session
+        self.next_session_id += 1
+        return session
+
+    def metrics(self) -> Dict[int, LatencyMetrics]:
+        return {session_id: session.metrics for session_id, session in self.sessions.items()}
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        session = self.open_session()
+        try:
+            writer.write(f"{GREETING}{PROMPT}".encode())
+            await writer.drain()
+            while line := await reader.readline():
+                input_str = line.decode(errors='replace').strip()
+                if input_str == ':quit':
+                    break
+                elif input_str == ':metrics':
+                    output = [f"\t{session.metrics.report()}"]
+                elif input_str.startswith(':'):
+                    output = [f"\tunknown command: {input_str.split()[0]}"]
+                else:
+                    start = time.perf_counter()
+                    output = await loop.run_in_executor(self.executor, session.execute, input_str)
+                    session.metrics.record(time.perf_counter() - start)
+                writer.write("".join(f"{o}\n" for o in output).encode() + PROMPT.encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, address: str) -> asyncio.AbstractServer:
+        # address is host:port or unix:/path/to/socket
+        if address.startswith('unix:'):
+            return await asyncio.start_unix_server(self.handle_client, address[len('unix:'):])
+        host, _, port = address.rpartition(':')
+        return await asyncio.start_server(self.handle_client, host or None, int(port))
+
+    async def serve_forever(self, address: str):
+        server = await self.start(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
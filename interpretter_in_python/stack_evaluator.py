@@ -0,0 +1,253 @@
+from typing import Dict, List, Optional
+import evaluator
+from environment import Environment
+from object import (Object,
+                    Integer,
+                    Error,
+                    Function,
+                    Array,
+                    Builtin,
+                    TRUE,
+                    FALSE,
+                    NULL)
+from evaluator import eval_prefix_expression, eval_infix_expression, eval_index_expression, is_truthy
+from monkey_builtins import builtins
+from memoization import call_key, lookup, store
+from ast_type import (Node,
+                      IntegerLiteral,
+                      Boolean as BooleanLiteral,
+                      Program,
+                      LetStatement,
+                      ReturnStatement,
+                      ExpressionStatement,
+                      BlockStatement,
+                      Identifier,
+                      PrefixExpression,
+                      InfixExpression,
+                      IfExpression,
+                      FunctionLiteral,
+                      CallExpression,
+                      ArrayLiteral,
+                      IndexExpression)
+
+# node kinds
+(NONE, PROGRAM, EXPRESSION_STATEMENT, INTEGER, BOOLEAN, IDENTIFIER, PREFIX, INFIX, BLOCK, IF,
+ LET, RETURN_STATEMENT, FUNCTION, CALL, ARRAY, INDEX, UNKNOWN) = range(17)
+
+node_classes = (
+    (Program, PROGRAM),
+    (ExpressionStatement, EXPRESSION_STATEMENT),
+    (IntegerLiteral, INTEGER),
+    (BooleanLiteral, BOOLEAN),
+    (Identifier, IDENTIFIER),
+    (PrefixExpression, PREFIX),
+    (InfixExpression, INFIX),
+    (BlockStatement, BLOCK),
+    (IfExpression, IF),
+    (LetStatement, LET),
+    (ReturnStatement, RETURN_STATEMENT),
+    (FunctionLiteral, FUNCTION),
+    (CallExpression, CALL),
+    (ArrayLiteral, ARRAY),
+    (IndexExpression, INDEX),
+)
+
+# filled in on first sight of each class, so arena views are found too
+node_kinds: Dict[type, int] = {type(None): NONE}
+
+# work items
+(EVAL, APPLY_PREFIX, APPLY_INFIX, BRANCH, NEXT_STATEMENT, NULL_IF_NONE, BIND, APPLY,
+ RETURN, MEMOIZE, BUILD_ARRAY, APPLY_INDEX) = range(12)
+
+
+def node_kind(node: Optional[Node]) -> int:
+    kind = node_kinds.get(type(node))
+    if kind is None:
+        kind = next((k for cls, k in node_classes if isinstance(node, cls)), UNKNOWN)
+        node_kinds[type(node)] = kind
+    return kind
+
+
+def eval(node: Node, env: Environment) -> Optional[Object]:
+    # Evaluates like evaluator.eval, but keeps pending work on an explicit
+    # stack instead of the Python stack, so neither deeply nested expressions
+    # nor deep Monkey recursion can raise RecursionError.
+    #
+    # work holds (item, a, b) tuples, innermost last; values holds the
+    # results of finished subexpressions. Each active call has a RETURN item
+    # with the caller's environment and value stack height, and frames holds
+    # the positions of those items. A call whose RETURN item would land right
+    # on top of another one is a tail call and reuses it instead.
+    work = [(RETURN, env, 0), (EVAL, node, None)]
+    frames = [0]
+    values: List[Optional[Object]] = []
+    push = work.append
+    pop = work.pop
+    push_value = values.append
+    pop_value = values.pop
+
+    while work:
+        item, a, b = pop()
+
+        if item == EVAL:
+            kind = node_kinds.get(type(a)) or node_kind(a)
+            if kind == IDENTIFIER:
+                value = env.get(a.depth, a.slot) if a.slot >= 0 else None
+                if value is None:
+                    value = builtins.get(a.value)
+                    if value is None:
+                        return Error(f"identifier not found: {a.value}")
+                push_value(value)
+            elif kind == INTEGER:
+                push_value(Integer(a.value))
+            elif kind == INFIX:
+                push((APPLY_INFIX, a.operator, None))
+                push((EVAL, a.right, None))
+                push((EVAL, a.left, None))
+            elif kind == EXPRESSION_STATEMENT:
+                push((EVAL, a.expression, None))
+            elif kind == CALL:
+                arguments = a.arguments or ()
+                push((APPLY, len(arguments), None))
+                for argument in reversed(arguments):
+                    push((EVAL, argument, None))
+                push((EVAL, a.function, None))
+            elif kind == IF:
+                push((BRANCH, a, None))
+                push((EVAL, a.condition, None))
+            elif kind == BLOCK or kind == PROGRAM:
+                stmts = a.statements
+                if not stmts:
+                    push_value(NULL if kind == BLOCK else None)
+                    continue
+                # a block ending in a let is null; other blocks leave nothing
+                # behind their last statement, so calls there stay tail calls
+                if kind == BLOCK and node_kind(stmts[-1]) == LET:
+                    push((NULL_IF_NONE, None, None))
+                if len(stmts) > 1:
+                    push((NEXT_STATEMENT, stmts, 1))
+                push((EVAL, stmts[0], None))
+            elif kind == BOOLEAN:
+                push_value(TRUE if a.value else FALSE)
+            elif kind == PREFIX:
+                push((APPLY_PREFIX, a.operator, None))
+                push((EVAL, a.right, None))
+            elif kind == LET:
+                push((BIND, a.name.slot, None))
+                push((EVAL, a.value, None))
+            elif kind == RETURN_STATEMENT:
+                # drop whatever the current call had left to do
+                base = frames[-1]
+                del values[work[base][2]:]
+                del work[base + 1:]
+                push((EVAL, a.return_value, None))
+            elif kind == FUNCTION:
+                push_value(Function(a.parameters, a.body, a.slot_count, env, a.free_variables))
+            elif kind == ARRAY:
+                elements = a.elements or ()
+                push((BUILD_ARRAY, len(elements), None))
+                for element in reversed(elements):
+                    push((EVAL, element, None))
+            elif kind == INDEX:
+                push((APPLY_INDEX, None, None))
+                push((EVAL, a.index, None))
+                push((EVAL, a.left, None))
+            else:
+                push_value(None)
+
+        elif item == APPLY_INFIX:
+            right = pop_value()
+            result = eval_infix_expression(a, pop_value(), right)
+            if type(result) is Error:
+                return result
+            push_value(result)
+
+        elif item == NEXT_STATEMENT:
+            pop_value()
+            if b + 1 < len(a):
+                push((NEXT_STATEMENT, a, b + 1))
+            push((EVAL, a[b], None))
+
+        elif item == BRANCH:
+            if is_truthy(pop_value()):
+                push((EVAL, a.consequence, None))
+            elif a.alternative is not None:
+                push((EVAL, a.alternative, None))
+            else:
+                push_value(NULL)
+
+        elif item == APPLY:
+            arguments = values[len(values) - a:]
+            del values[len(values) - a:]
+            function = pop_value()
+            if type(function) is Builtin:
+                result = function.function(arguments)
+                if type(result) is Error:
+                    return result
+                push_value(result)
+                continue
+            if type(function) is not Function:
+                return Error(f"not a function: {function.type().value}")
+            if a != len(function.parameters):
+                return Error(f"wrong number of arguments: want={len(function.parameters)}, got={a}")
+
+            if work[-1][0] != RETURN:
+                # tail calls are not memoized, as in evaluator.apply_function
+                key = call_key(function, arguments)
+                if key is not None:
+                    result = lookup(key)
+                    if result is not None:
+                        push_value(result)
+                        continue
+                    push((MEMOIZE, key, None))
+                frames.append(len(work))
+                push((RETURN, env, len(values)))
+
+            env = Environment(function.slot_count, function.env)
+            for parameter, argument in zip(function.parameters, arguments):
+                env.slots[parameter.slot] = argument
+            push((EVAL, function.body, None))
+
+        elif item == RETURN:
+            env = a
+            frames.pop()
+
+        elif item == APPLY_PREFIX:
+            result = eval_prefix_expression(a, pop_value())
+            if type(result) is Error:
+                return result
+            push_value(result)
+
+        elif item == BIND:
+            env.set(a, pop_value())
+            push_value(None)
+
+        elif item == NULL_IF_NONE:
+            if values[-1] is None:
+                values[-1] = NULL
+
+        elif item == MEMOIZE:
+            store(a, values[-1])
+
+        elif item == BUILD_ARRAY:
+            elements = values[len(values) - a:]
+            del values[len(values) - a:]
+            push_value(Array.from_objects(elements))
+
+        elif item == APPLY_INDEX:
+            index = pop_value()
+            result = eval_index_expression(pop_value(), index)
+            if type(result) is Error:
+                return result
+            push_value(result)
+
+    return values[-1] if values else None
+
+
+class Session(evaluator.Session):
+    def evaluate(self, program: Program) -> Optional[Object]:
+        return eval(program, self.env)
+
+
+def run(program: Program) -> Optional[Object]:
+    return Session().run(program)
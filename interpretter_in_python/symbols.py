@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+
+class SymbolTable:
+    # Identifier names, numbered in the order they are first seen. The lexer
+    # interns every identifier it reads, so all tokens and Identifier nodes
+    # for one name share a single string, and lookups by name can be keyed
+    # by its number instead.
+    #
+    # Unlike sys.intern, whose strings are freed once unused, names are
+    # never dropped: numbers must stay valid for any tree still holding
+    # them. The table grows with every distinct name the process sees,
+    # across all sessions of a long-running server, even after the
+    # sessions that used them end. That is an accepted cost: it is one
+    # string, one dict entry and one list slot per distinct name.
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
+
+
+# numbers are per process: anything sent to another one carries names
+table = SymbolTable()
+
+
+def intern(name: str) -> int:
+    return table.intern(name)
@@ -0,0 +1,154 @@
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Tuple
+import evaluator
+import pycompiler
+from compiler import CompileError
+from object import Object, Error, Function
+
+original_call_body = evaluator.call_body
+
+DEFAULT_THRESHOLD = 100
+# tier-up events kept for inspection
+RECENT_EVENTS = 100
+
+# tiers
+INTERPRETED = 'interpreted'
+COMPILED = 'compiled'
+# compiling failed, so the body stays interpreted for good
+UNCOMPILABLE = 'uncompilable'
+
+
+class FunctionProfile:
+    # Calls to the functions made from one literal, which share its body,
+    # and the tier that runs that body. owner is a weak reference to what
+    # the body lives in, which drops the profile when it goes.
+    __slots__ = ('name', 'calls', 'tier', 'compiled', 'reason', 'owner')
+
+    def __init__(self, function: Function):
+        params = ", ".join(p.value for p in function.parameters)
+        token = getattr(function.body, 'token', None)
+        if token is None:
+            self.name = f"fn({params})"
+        else:
+            self.name = f"fn({params}) at line {token.line}, column {token.column}"
+        self.calls = 0
+        self.tier = INTERPRETED
+        self.compiled: Optional[Callable] = None
+        self.reason = ''
+        self.owner = None
+
+
+def body_key(body) -> Tuple[object, Hashable]:
+    # An arena hands out a new view of a body each time the literal is
+    # evaluated, so those are told apart by their row; other bodies are
+    # their own key. Returns the object that owns the body and the key.
+    arena = getattr(body, 'arena', None)
+    if arena is None:
+        return body, id(body)
+    return arena, (id(arena), body.row)
+
+
+@dataclass
+class TierEvent:
+    function: str
+    calls: int
+    tier: str
+    compile_time: float
+    reason: str = ''
+
+
+class TieringState:
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        # keyed by body_key; a profile lasts as long as its body
+        self.profiles: Dict[Hashable, FunctionProfile] = {}
+        self.events: Deque[TierEvent] = deque(maxlen=RECENT_EVENTS)
+
+    def reset(self):
+        self.profiles.clear()
+        self.events.clear()
+
+    def tiers(self) -> Dict[str, str]:
+        return {profile.name: profile.tier for profile in self.profiles.values()}
+
+    def tier_up(self, profile: FunctionProfile, function: Function):
+        start = time.perf_counter()
+        try:
+            profile.compiled = pycompiler.compile_body(function)
+            profile.tier = COMPILED
+        except CompileError as e:
+            profile.tier = UNCOMPILABLE
+            profile.reason = str(e)
+        self.events.append(TierEvent(profile.name, profile.calls, profile.tier,
+                                     time.perf_counter() - start, profile.reason))
+
+    def report(self) -> str:
+        lines = [f"threshold={self.threshold}"]
+        if self.profiles:
+            lines.append(f"{'function':<40} {'calls':>10} tier")
+            for profile in sorted(self.profiles.values(), key=lambda p: -p.calls):
+                reason = f" ({profile.reason})" if profile.reason else ""
+                lines.append(f"{profile.name:<40} {profile.calls:>10} {profile.tier}{reason}")
+        for event in self.events:
+            lines.append(f"{event.function} -> {event.tier} after {event.calls} calls "
+                         f"in {event.compile_time * 1000:.3f}ms")
+        return "\n".join(lines)
+
+
+state = TieringState()
+
+
+def make_tiered_call_body(target: TieringState) -> Callable:
+    profiles = target.profiles
+
+    def call_body(function: Function, arguments: List[Object]) -> Object:
+        owner, key = body_key(function.body)
+        profile = profiles.get(key)
+        if profile is None:
+            profile = profiles[key] = FunctionProfile(function)
+            profile.owner = weakref.ref(owner, lambda _: profiles.pop(key, None))
+        profile.calls += 1
+        if profile.tier is INTERPRETED and profile.calls >= target.threshold:
+            target.tier_up(profile, function)
+
+        if profile.compiled is None:
+            return original_call_body(function, arguments)
+        try:
+            return profile.compiled(function, arguments)
+        except pycompiler.ExecutionError as e:
+            return Error(str(e))
+
+    return call_body
+
+
+def is_enabled() -> bool:
+    return evaluator.call_body is not original_call_body
+
+
+def enable(threshold: Optional[int] = None, target: Optional[TieringState] = None) -> TieringState:
+    # Every call the evaluator makes runs its body through the module-level
+    # call_body, so swapping that name counts calls per function literal.
+    # A body called threshold times is compiled by pycompiler and runs as
+    # Python from then on; cold code never pays for compiling.
+    target = state if target is None else target
+    if threshold is not None:
+        target.threshold = threshold
+    evaluator.call_body = make_tiered_call_body(target)
+    return target
+
+
+def disable():
+    evaluator.call_body = original_call_body
+
+
+@contextmanager
+def tiered(threshold: Optional[int] = None, target: Optional[TieringState] = None):
+    previous = evaluator.call_body
+    try:
+        yield enable(threshold, target)
+    finally:
+        evaluator.call_body = previous
@@ -1,5 +1,6 @@
 from enum import Enum
-from dataclasses import dataclass
+from typing import Optional
+import symbols
 
 class TokenType(Enum):
     ILLEGAL = 'ILLEGAL'
@@ -28,6 +29,8 @@ class TokenType(Enum):
     RPAREN = ')'
     LBRACE = '{'
     RBRACE = '}'
+    LBRACKET = '['
+    RBRACKET = ']'
 
     FUNCTION = 'FUNCTION'
     LET = 'LET'
@@ -37,8 +40,61 @@ class TokenType(Enum):
     ELSE = 'ELSE'
     RETURN = 'RETURN'
 
-@dataclass
 class Token:
-    type: TokenType
-    literal: str
+    # A token is a span of its source buffer: the literal is sliced out on
+    # demand, so every token shares the one source string.
+    __slots__ = ('type', 'source', 'start', 'length')
 
+    def __init__(self, type: TokenType, source: str, start: int = 0, length: Optional[int] = None):
+        self.type = type
+        self.source = source
+        self.start = start
+        self.length = len(source) - start if length is None else length
+
+    @property
+    def literal(self) -> str:
+        return self.source[self.start: self.start + self.length]
+
+    @property
+    def line(self) -> int:
+        # streamed sources are split into windows that know their first line
+        first_line = getattr(self.source, 'first_line', 1)
+        return first_line + self.source.count('\n', 0, self.start)
+
+    @property
+    def column(self) -> int:
+        return self.start - self.source.rfind('\n', 0, self.start)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Token):
+            return NotImplemented
+        return self.type == other.type and self.literal == other.literal
+
+    def __repr__(self) -> str:
+        return f"Token(type={self.type}, literal={self.literal!r})"
+
+
+
+class SymbolToken(Token):
+    # An identifier, numbered in symbols.table when it is lexed. Its literal
+    # is the table's string for the name instead of a new slice.
+    __slots__ = ('symbol',)
+
+    def __init__(self, source: str, start: int, length: int, symbol: int):
+        self.type = TokenType.IDENT
+        self.source = source
+        self.start = start
+        self.length = length
+        self.symbol = symbol
+
+    @property
+    def literal(self) -> str:
+        return symbols.table.names[self.symbol]
+
+    def __reduce__(self):
+        # another process numbers the name itself
+        return symbol_token, (self.source, self.start, self.length)
+
+
+def symbol_token(source: str, start: int, length: int) -> SymbolToken:
+    return SymbolToken(source, start, length, symbols.intern(source[start: start + length]))
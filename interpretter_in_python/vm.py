@@ -0,0 +1,133 @@
+from typing import List, Optional
+from bytecode import Opcode, Bytecode
+from compiler import compile_program, infix_opcodes
+from object import Object, Integer, Error, TRUE, FALSE, NULL, int_div
+from ast_type import Program
+
+infix_operators = {op: operator for operator, op in infix_opcodes.items()}
+
+
+class VMError(Exception):
+    pass
+
+
+class VM:
+    def __init__(self, bytecode: Bytecode):
+        self.instructions: List[int] = bytecode.instructions
+        self.constants: List[Object] = bytecode.constants
+        self.stack: List[Object] = []
+        self.last_popped: Optional[Object] = None
+
+    def run(self) -> Optional[Object]:
+        OP_CONSTANT = Opcode.CONSTANT.value
+        OP_POP = Opcode.POP.value
+        OP_ADD = Opcode.ADD.value
+        OP_SUB = Opcode.SUB.value
+        OP_MUL = Opcode.MUL.value
+        OP_DIV = Opcode.DIV.value
+        OP_TRUE = Opcode.TRUE.value
+        OP_FALSE = Opcode.FALSE.value
+        OP_NULL = Opcode.NULL.value
+        OP_EQUAL = Opcode.EQUAL.value
+        OP_NOT_EQUAL = Opcode.NOT_EQUAL.value
+        OP_GREATER_THAN = Opcode.GREATER_THAN.value
+        OP_LESS_THAN = Opcode.LESS_THAN.value
+        OP_MINUS = Opcode.MINUS.value
+        OP_BANG = Opcode.BANG.value
+        OP_JUMP_NOT_TRUTHY = Opcode.JUMP_NOT_TRUTHY.value
+        OP_JUMP = Opcode.JUMP.value
+
+        instructions = self.instructions
+        constants = self.constants
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        end = len(instructions)
+        ip = 0
+
+        while ip < end:
+            op = instructions[ip]
+            if op == OP_CONSTANT:
+                push(constants[instructions[ip + 1]])
+                ip += 2
+                continue
+            elif op == OP_POP:
+                self.last_popped = pop()
+            elif op == OP_TRUE:
+                push(TRUE)
+            elif op == OP_FALSE:
+                push(FALSE)
+            elif op == OP_NULL:
+                push(NULL)
+            elif op == OP_JUMP_NOT_TRUTHY:
+                condition = pop()
+                if condition is FALSE or condition is NULL:
+                    ip = instructions[ip + 1]
+                else:
+                    ip += 2
+                continue
+            elif op == OP_JUMP:
+                ip = instructions[ip + 1]
+                continue
+            # arithmetic and comparison opcodes are declared contiguously
+            elif op <= OP_DIV:
+                right = pop()
+                left = pop()
+                if type(left) is not Integer or type(right) is not Integer:
+                    raise VMError(self.binary_operator_error(op, left, right))
+                if op == OP_ADD:
+                    push(Integer(left.value + right.value))
+                elif op == OP_SUB:
+                    push(Integer(left.value - right.value))
+                elif op == OP_MUL:
+                    push(Integer(left.value * right.value))
+                elif right.value == 0:
+                    raise VMError("division by zero")
+                else:
+                    push(Integer(int_div(left.value, right.value)))
+            elif op <= OP_LESS_THAN:
+                right = pop()
+                left = pop()
+                if type(left) is Integer and type(right) is Integer:
+                    if op == OP_EQUAL:
+                        result = left.value == right.value
+                    elif op == OP_NOT_EQUAL:
+                        result = left.value != right.value
+                    elif op == OP_GREATER_THAN:
+                        result = left.value > right.value
+                    else:
+                        result = left.value < right.value
+                elif op == OP_EQUAL:
+                    result = left is right
+                elif op == OP_NOT_EQUAL:
+                    result = left is not right
+                else:
+                    raise VMError(self.binary_operator_error(op, left, right))
+                push(TRUE if result else FALSE)
+            elif op == OP_MINUS:
+                operand = pop()
+                if type(operand) is not Integer:
+                    raise VMError(f"unknown operator: -{operand.type().value}")
+                push(Integer(-operand.value))
+            elif op == OP_BANG:
+                operand = pop()
+                push(TRUE if operand is FALSE or operand is NULL else FALSE)
+            else:
+                raise VMError(f"unknown opcode: {op}")
+            ip += 1
+
+        return self.last_popped
+
+    def binary_operator_error(self, op: int, left: Object, right: Object) -> str:
+        operator = infix_operators[op]
+        if left.type() != right.type():
+            return f"type mismatch: {left.type().value} {operator} {right.type().value}"
+        return f"unknown operator: {left.type().value} {operator} {right.type().value}"
+
+
+def run(program: Program) -> Optional[Object]:
+    vm = VM(compile_program(program))
+    try:
+        return vm.run()
+    except VMError as e:
+        return Error(str(e))
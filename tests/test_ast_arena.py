@@ -0,0 +1,76 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena, ProgramView
+from ast_type import (
+    Program,
+    LetStatement,
+    ExpressionStatement,
+    Identifier,
+    IntegerLiteral,
+    InfixExpression,
+    IfExpression,
+    FunctionLiteral,
+    CallExpression,
+    )
+from evaluator import run
+
+
+def parse(src: str, nodes=None):
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+@pytest.mark.parametrize("src", [
+    "let x = 5;",
+    "return 5;",
+    "-a * b",
+    "a + b * c + d / e - f",
+    "3 + 4; -5 + 5",
+    "5 < 4 != 3 > 4",
+    "!(true == true)",
+    "if (x < y) { x } else { y }",
+    "fn(x, y) { x + y; }",
+    "add(1, 2 * 3, 4 + 5);",
+    "99999999999999999999999 + 1",
+    "[1, 2 * 3, []][a[0]]",
+])
+def test_string_matches_object_ast(src):
+    program = parse(src, AstArena())
+
+    assert isinstance(program, ProgramView)
+    assert program.string() == parse(src).string()
+
+def test_views_are_ast_nodes():
+    program = parse("let f = fn(x) { if (x) { x } }; f(1 + 2);", AstArena())
+
+    assert isinstance(program, Program)
+    let, call = program.statements
+    assert isinstance(let, LetStatement)
+    assert isinstance(let.name, Identifier)
+    assert let.name.value == "f"
+    assert isinstance(let.value, FunctionLiteral)
+    assert [p.value for p in let.value.parameters] == ["x"]
+    assert isinstance(let.value.body.statements[0].expression, IfExpression)
+    assert let.value.body.statements[0].expression.alternative is None
+
+    assert isinstance(call, ExpressionStatement)
+    assert isinstance(call.expression, CallExpression)
+    argument = call.expression.arguments[0]
+    assert isinstance(argument, InfixExpression)
+    assert argument.operator == "+"
+    assert isinstance(argument.left, IntegerLiteral)
+    assert argument.left.value == 1
+    assert argument.left.token_literal() == "1"
+
+@pytest.mark.parametrize("src", ["5", "true", "false"])
+def test_evaluator_accepts_views(src):
+    assert run(parse(src, AstArena())) == run(parse(src))
+
+def test_arena_rows():
+    arena = AstArena()
+    parse("1 + 2 * 3", arena)
+
+    # three literals, two infix expressions, the statement and the program
+    assert len(arena) == 7
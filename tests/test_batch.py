@@ -0,0 +1,83 @@
+from itertools import count, islice
+import pytest
+import stack_evaluator
+from batch import BatchResult, run_many, chunked
+from main import main
+
+SOURCES = [
+    "1 + 2",
+    "let f = fn(x) { x * 2 }; f(21)",
+    "let x = ;",
+    "true + 1",
+    "let a = 1;",
+    "if (1 > 2) { 3 }",
+]
+
+EXPECTED = [
+    BatchResult(0, "3"),
+    BatchResult(1, "42"),
+    BatchResult(2, errors=["no prefix parse function for TokenType.SEMICLOLON found at line 1, column 9"]),
+    BatchResult(3, "ERROR: type mismatch: BOOLEAN + INTEGER", failed=True),
+    BatchResult(4),
+    BatchResult(5, "null"),
+]
+
+
+def test_chunked():
+    assert list(chunked(iter("abcde"), 2)) == [(0, ['a', 'b']), (2, ['c', 'd']), (4, ['e'])]
+    assert list(chunked([], 2)) == []
+
+
+@pytest.mark.parametrize("workers, chunksize", [(1, 64), (2, 1), (3, 4)])
+def test_results_in_input_order(workers, chunksize):
+    results = list(run_many(SOURCES * 5, workers=workers, chunksize=chunksize))
+    assert [r.index for r in results] == list(range(len(SOURCES) * 5))
+    assert results[:len(SOURCES)] == EXPECTED
+    assert [r.output for r in results[-len(SOURCES):]] == [r.output for r in EXPECTED]
+
+
+def test_other_engines():
+    results = list(run_many(SOURCES, workers=2, chunksize=2, engine=stack_evaluator.run))
+    assert results == EXPECTED
+
+
+def test_sources_are_read_lazily():
+    # an endless input works as long as the caller stops reading
+    sources = (f"{i} * 2" for i in count())
+    results = run_many(sources, workers=2, chunksize=8)
+    assert [r.output for r in islice(results, 50)] == [str(i * 2) for i in range(50)]
+    results.close()
+    assert int(next(sources).split()[0]) < 50 + 2 * 2 * 8 + 8
+
+
+def test_main_batch(tmp_path, capsys):
+    programs = tmp_path / "programs.txt"
+    programs.write_text("\n".join(SOURCES) + "\n")
+    assert main(['--batch', str(programs), '--workers', '2']) == 1
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "line 1:\t3",
+        "line 2:\t42",
+        "line 4:\tERROR: type mismatch: BOOLEAN + INTEGER",
+        "line 5:\t",
+        "line 6:\tnull",
+    ]
+    assert captured.err.startswith("line 3:\t")
+
+    programs.write_text("1\n2 + 2\n")
+    assert main(['--batch', str(programs), '--workers', '1']) == 0
+    assert capsys.readouterr().out == "line 1:\t1\nline 2:\t4\n"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_puts_output_is_returned(workers, capsys):
+    results = list(run_many(["puts(1); 2", "let f = fn(x) { puts(x, x) }; f(3)", "4"], workers=workers))
+    assert [(r.printed, r.output) for r in results] == [(["1"], "2"), (["3", "3"], "null"), ([], "4")]
+    assert capsys.readouterr().out == ""
+
+
+def test_main_batch_prints_puts_output(tmp_path, capsys):
+    programs = tmp_path / "programs.txt"
+    programs.write_text("puts(1); 2\n3\n")
+    assert main(['--batch', str(programs), '--workers', '2']) == 0
+    assert capsys.readouterr().out == "1\nline 1:\t2\nline 2:\t3\n"
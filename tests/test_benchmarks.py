@@ -0,0 +1,74 @@
+import json
+import pytest
+from benchmarks.corpora import corpora
+from benchmarks.runner import run_suite, run_memory_suite, compare, parse
+from benchmarks.__main__ import main
+
+
+@pytest.mark.parametrize("name", sorted(corpora))
+def test_corpora_parse(name):
+    small, large = corpora[name](2), corpora[name](8)
+    parse(small)
+    parse(large)
+    assert len(large) > len(small)
+
+
+def test_run_suite():
+    report = run_suite(sizes=[2], repeat=1, names=['let_statements'])
+    assert sorted(report['results']) == [
+        'evaluator-closure/let_statements/2',
+        'evaluator-python/let_statements/2',
+        'evaluator-stack/let_statements/2',
+        'evaluator/let_statements/2',
+        'lexer/let_statements/2',
+        'parser-recursive/let_statements/2',
+        'parser/let_statements/2',
+    ]
+    assert report['results']['lexer/let_statements/2']['unit'] == 'tokens/s'
+    assert all(entry['rate'] > 0 for entry in report['results'].values())
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_stages_skip_unsupported_corpora():
+    report = run_suite(sizes=[2], repeat=1, names=['call_chains'])
+    assert 'evaluator/call_chains/2' in report['results']
+    assert 'evaluator-python/call_chains/2' not in report['results']
+
+
+def report_with(rates):
+    return {'results': {key: {'rate': rate} for key, rate in rates.items()}}
+
+
+@pytest.mark.parametrize("current, baseline, expected", [
+    ({'a': 100.0}, {'a': 100.0}, []),
+    ({'a': 85.0}, {'a': 100.0}, []),
+    ({'a': 70.0}, {'a': 100.0}, [('a', 0.7)]),
+    ({'a': 200.0}, {'a': 100.0}, []),
+    ({}, {'a': 100.0}, []),
+])
+def test_compare(current, baseline, expected):
+    assert compare(report_with(current), report_with(baseline), tolerance=0.2) == expected
+
+
+def test_main_fails_on_regression(tmp_path, capsys):
+    output = tmp_path / 'out.json'
+    args = ['--sizes', '2', '--repeat', '1', '--corpus', 'conditionals']
+    assert main(args + ['--output', str(output)]) == 0
+
+    baseline = json.loads(output.read_text())
+    for entry in baseline['results'].values():
+        entry['rate'] *= 1000
+    baseline_file = tmp_path / 'baseline.json'
+    baseline_file.write_text(json.dumps(baseline))
+
+    assert main(args + ['--compare', str(baseline_file)]) == 1
+    assert 'REGRESSION' in capsys.readouterr().err
+
+
+def test_memory_suite(capsys):
+    report = run_memory_suite(sizes=[4], names=['wide_functions'])
+    entry = report['results']['memory/wide_functions/4']
+    assert entry['bytes'] > 0 and entry['nodes'] > 0
+    assert entry['identifiers'] == 4 * 36 and entry['names'] == 16 + 4
+    assert main(['--memory', '--sizes', '2', '--corpus', 'let_statements']) == 0
+    assert 'memory/let_statements/2' in capsys.readouterr().out
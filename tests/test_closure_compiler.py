@@ -0,0 +1,117 @@
+import gc
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+from compiler import CompileError
+from pycompiler import CodeCache
+import evaluator
+import closure_compiler
+from closure_compiler import compile_node, has_return
+
+
+def parse(src: str, nodes=None):
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def inspect(result):
+    return result and result.inspect()
+
+
+@pytest.mark.parametrize("src", [
+    "",
+    "let a = 1;",
+    "1; 2; 3",
+    "let a = 5; let b = a * 2; if (a < b) { b - a } else { a - b }",
+    "if (1 > 2) { 3 }",
+    "if (true) { let a = 1; }",
+    "if (true) { }",
+    "!5 == !!false",
+    "-true",
+    "5 / 0",
+    "7 / -2",
+    "1 < true",
+    "true + false",
+    "x",
+    "let f = fn(x) { if (x > 10) { return x; } if (x > 5) { return x * 2; }; x * 3 }; [f(11), f(6), f(1)]",
+    "let f = fn() { return 1; 2 }; f()",
+    "let f = fn() { if (true) { if (true) { return 1; } }; 2 }; f()",
+    "if (true) { return 10; }; 20",
+    "return 1; 2",
+    "let f = fn(x) { x }; return f(3);",
+    "let f = fn(a, b, c) { a * b - c }; f(2, 3, 4)",
+    "let f = fn(a, a) { a }; f(1, 2)",
+    "let f = fn() { 7 }; f() + f()",
+    "let f = fn(x) { x }; f(1, 2)",
+    "1(2)",
+    "let adder = fn(a) { fn(b) { fn(c) { a + b + c } } }; adder(1)(2)(3)",
+    "let f = fn() { later }; let later = 4; f()",
+    "let f = fn() { undefined }; f()",
+    "let f = fn(x) { x + y }; let g = fn() { f(1) }; let y = 2; g()",
+    "let f = fn(x) { let g = fn() { x * 2 }; g() }; f(21)",
+    "let fact = fn(n) { if (n < 2) { 1 } else { n * fact(n - 1) } }; fact(30)",
+    "let f = fn(xs) { xs[0] + xs[1] }; [f([1, 2]), f([3, 4]) * [1, 2]]",
+    "[1, 2][5]",
+    "len([1, 2]) + sum(range(5)) + abs(-3)",
+    "map([1, [2]], len)",
+    "let f = fn(x) { len(x) }; f(1)",
+    "[1, 1 / 0, 2]",
+    "puts(-1)",
+])
+def test_matches_evaluator(src, capsys):
+    expected = inspect(evaluator.run(parse(src)))
+    expected_out = capsys.readouterr().out
+    assert inspect(closure_compiler.run(parse(src))) == expected
+    assert capsys.readouterr().out == expected_out
+
+
+def test_arena_programs():
+    src = "let f = fn(n) { if (n < 2) { return n; } f(n - 1) + f(n - 2) }; f(10)"
+    assert closure_compiler.run(parse(src, AstArena())).inspect() == "55"
+
+
+def test_session_keeps_globals():
+    session = closure_compiler.Session()
+    session.run(parse("let f = fn(x) { x + g };"))
+    session.run(parse("let g = 10;"))
+    assert session.run(parse("f(1)")).inspect() == "11"
+
+
+def test_foreign_functions_are_compiled_on_first_call():
+    function = evaluator.run(parse("fn(x) { x * 2 }"))
+    assert function.code is None
+    assert closure_compiler.apply_function(function, [evaluator.Integer(4)]).inspect() == "8"
+    assert function.code is not None
+
+
+@pytest.mark.parametrize("src, expected", [
+    ("1", False),
+    ("return 1;", True),
+    ("if (true) { if (false) { return 1; } }", True),
+    ("if (true) { 1 } else { return 2; }", True),
+    ("fn() { return 1; }", False),
+])
+def test_has_return(src, expected):
+    assert has_return(parse(src).statements[0]) is expected
+
+
+def test_compiled_programs_are_cached(monkeypatch):
+    cache = CodeCache(maxsize=2)
+    monkeypatch.setattr(closure_compiler, "code_cache", cache)
+    program = parse("let a = 2; a * 3")
+    assert closure_compiler.run(program).inspect() == "6"
+    entry = cache.get(program)
+    assert entry is not None and entry[1] == 1
+    assert closure_compiler.run(program).inspect() == "6"
+    assert cache.get(program) is entry
+    del program, entry
+    gc.collect()
+    assert len(cache) == 0
+
+
+def test_unknown_nodes():
+    with pytest.raises(CompileError):
+        compile_node(object())
@@ -0,0 +1,100 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from bytecode import Opcode, make, disassemble
+from compiler import Compiler, CompileError
+
+
+def compile_src(src: str) -> Compiler:
+    lexer = Lexer(src)
+    parser = Parser(lexer)
+    program = parser.parse_program()
+    compiler = Compiler()
+    compiler.compile(program)
+    return compiler
+
+def concat(*instructions):
+    return [i for ins in instructions for i in ins]
+
+@pytest.mark.parametrize("src, expected_constants, expected_instructions", [
+    ("1 + 2", [1, 2], [
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.CONSTANT, 1),
+        make(Opcode.ADD),
+        make(Opcode.POP),
+    ]),
+    ("1; 2", [1, 2], [
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.POP),
+        make(Opcode.CONSTANT, 1),
+        make(Opcode.POP),
+    ]),
+    ("2 * 2 / 2", [2], [
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.MUL),
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.DIV),
+        make(Opcode.POP),
+    ]),
+    ("-1", [1], [
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.MINUS),
+        make(Opcode.POP),
+    ]),
+    ("!true", [], [
+        make(Opcode.TRUE),
+        make(Opcode.BANG),
+        make(Opcode.POP),
+    ]),
+    ("1 < 2 == false", [1, 2], [
+        make(Opcode.CONSTANT, 0),
+        make(Opcode.CONSTANT, 1),
+        make(Opcode.LESS_THAN),
+        make(Opcode.FALSE),
+        make(Opcode.EQUAL),
+        make(Opcode.POP),
+    ]),
+])
+def test_expressions(src, expected_constants, expected_instructions):
+    compiler = compile_src(src)
+    bytecode = compiler.bytecode()
+
+    assert disassemble(bytecode.instructions) == disassemble(concat(*expected_instructions))
+    assert [c.value for c in bytecode.constants] == expected_constants
+
+@pytest.mark.parametrize("src, expected_instructions", [
+    ("if (true) { 10 }; 3333;", [
+        make(Opcode.TRUE),                 # 0000
+        make(Opcode.JUMP_NOT_TRUTHY, 7),   # 0001
+        make(Opcode.CONSTANT, 0),          # 0003
+        make(Opcode.JUMP, 8),              # 0005
+        make(Opcode.NULL),                 # 0007
+        make(Opcode.POP),                  # 0008
+        make(Opcode.CONSTANT, 1),          # 0009
+        make(Opcode.POP),                  # 0011
+    ]),
+    ("if (true) { 10 } else { 20 }", [
+        make(Opcode.TRUE),                 # 0000
+        make(Opcode.JUMP_NOT_TRUTHY, 7),   # 0001
+        make(Opcode.CONSTANT, 0),          # 0003
+        make(Opcode.JUMP, 9),              # 0005
+        make(Opcode.CONSTANT, 1),          # 0007
+        make(Opcode.POP),                  # 0009
+    ]),
+    ("if (true) { }", [
+        make(Opcode.TRUE),                 # 0000
+        make(Opcode.JUMP_NOT_TRUTHY, 6),   # 0001
+        make(Opcode.NULL),                 # 0003
+        make(Opcode.JUMP, 7),              # 0004
+        make(Opcode.NULL),                 # 0006
+        make(Opcode.POP),                  # 0007
+    ]),
+])
+def test_conditionals(src, expected_instructions):
+    compiler = compile_src(src)
+    assert disassemble(compiler.bytecode().instructions) == disassemble(concat(*expected_instructions))
+
+def test_unsupported_node():
+    with pytest.raises(CompileError):
+        compile_src("let x = 5;")
@@ -1,15 +1,25 @@
+import sys
 import pytest
 from lexer import Lexer
 from monkey_parser import Parser
-from object import Object, Integer, Boolean, Null
-from evaluator import eval
+from object import Object, Integer, Boolean, Null, Error, Function, NULL
+from main import engines, sessions
 
 
-def eval_src(src: str):
+@pytest.fixture(params=sorted(engines))
+def engine(request):
+    return request.param
+
+# engines that run the whole language, not just expressions
+@pytest.fixture(params=["eval", "stack", "closure"])
+def tree_engine(request):
+    return request.param
+
+def eval_src(src: str, engine: str = "eval"):
     lexer = Lexer(src)
     parser = Parser(lexer)
     program = parser.parse_program()
-    return eval(program)
+    return engines[engine](program)
 
 def assert_integer_object(obj: Object, expected: int):
     assert isinstance(obj, Integer)
@@ -22,16 +32,261 @@ def assert_boolean_object(obj: Object, expected: bool):
 @pytest.mark.parametrize("src, expected", [
     ("5", 5),
     ("10", 10),
+    ("-5", -5),
+    ("-10", -10),
+    ("5 + 5 + 5 + 5 - 10", 10),
+    ("2 * 2 * 2 * 2 * 2", 32),
+    ("-50 + 100 + -50", 0),
+    ("5 * 2 + 10", 20),
+    ("5 + 2 * 10", 25),
+    ("20 + 2 * -10", 0),
+    ("50 / 2 * 2 + 10", 60),
+    ("2 * (5 + 10)", 30),
+    ("3 * 3 * 3 + 10", 37),
+    ("3 * (3 * 3) + 10", 37),
+    ("(5 + 10 * 2 + 15 / 3) * 2 + -10", 50),
+    ("7 / 2", 3),
+    ("-7 / 2", -3),
+    ("7 / -2", -3),
+    ("123456789012345678901234567890 * 10", 1234567890123456789012345678900),
 ])
-def test_eval_integer_expression(src, expected):
-    evaluated = eval_src(src)
+def test_eval_integer_expression(src, expected, engine):
+    evaluated = eval_src(src, engine)
     assert_integer_object(evaluated, expected)
 
 @pytest.mark.parametrize("src, expected", [
     ("true", True),
     ("false", False),
+    ("1 < 2", True),
+    ("1 > 2", False),
+    ("1 < 1", False),
+    ("1 > 1", False),
+    ("1 == 1", True),
+    ("1 != 1", False),
+    ("1 == 2", False),
+    ("1 != 2", True),
+    ("5000 == 5000", True),
+    ("true == true", True),
+    ("false == false", True),
+    ("true == false", False),
+    ("true != false", True),
+    ("false != true", True),
+    ("(1 < 2) == true", True),
+    ("(1 < 2) == false", False),
+    ("(1 > 2) == true", False),
+    ("(1 > 2) == false", True),
+    ("1 == true", False),
+    ("1 != true", True),
 ])
-def test_eval_boolean_expression(src, expected):
-    evaluated = eval_src(src)
+def test_eval_boolean_expression(src, expected, engine):
+    evaluated = eval_src(src, engine)
     assert_boolean_object(evaluated, expected)
 
+
+@pytest.mark.parametrize("src, expected", [
+    ("!true", False),
+    ("!false", True),
+    ("!5", False),
+    ("!!true", True),
+    ("!!false", False),
+    ("!!5", True),
+])
+def test_bang_operator(src, expected, engine):
+    evaluated = eval_src(src, engine)
+    assert_boolean_object(evaluated, expected)
+
+@pytest.mark.parametrize("src, expected", [
+    ("if (true) { 10 }", 10),
+    ("if (false) { 10 }", None),
+    ("if (1) { 10 }", 10),
+    ("if (1 < 2) { 10 }", 10),
+    ("if (1 > 2) { 10 }", None),
+    ("if (1 > 2) { 10 } else { 20 }", 20),
+    ("if (1 < 2) { 10 } else { 20 }", 10),
+    ("if (true) { }", None),
+])
+def test_if_else_expressions(src, expected, engine):
+    evaluated = eval_src(src, engine)
+    if expected is None:
+        assert evaluated is NULL
+    else:
+        assert_integer_object(evaluated, expected)
+
+@pytest.mark.parametrize("src, expected_message", [
+    ("5 + true;", "type mismatch: INTEGER + BOOLEAN"),
+    ("5 + true; 5;", "type mismatch: INTEGER + BOOLEAN"),
+    ("-true", "unknown operator: -BOOLEAN"),
+    ("true + false;", "unknown operator: BOOLEAN + BOOLEAN"),
+    ("5; true + false; 5", "unknown operator: BOOLEAN + BOOLEAN"),
+    ("if (10 > 1) { true + false; }", "unknown operator: BOOLEAN + BOOLEAN"),
+    ("1 / 0", "division by zero"),
+])
+def test_error_handling(src, expected_message, engine):
+    evaluated = eval_src(src, engine)
+    assert isinstance(evaluated, Error)
+    assert evaluated.message == expected_message
+
+def test_identifier_not_found(tree_engine):
+    evaluated = eval_src("foobar", tree_engine)
+    assert isinstance(evaluated, Error)
+    assert evaluated.message == "identifier not found: foobar"
+
+@pytest.mark.parametrize("src", ["1 + 2 == 3", "!(1 < 2)", "if (true) { 7 }", "100 * 10"])
+def test_small_values_are_shared(src, engine):
+    assert eval_src(src, engine) is eval_src(src, engine)
+
+@pytest.mark.parametrize("src, expected", [
+    ("let a = 5; a;", 5),
+    ("let a = 5 * 5; a;", 25),
+    ("let a = 5; let b = a; b;", 5),
+    ("let a = 5; let b = a; let c = a + b + 5; c;", 15),
+    ("let a = 1; let a = a + 1; a", 2),
+    ("let a = 1; if (true) { let b = a + 1; } b", 2),
+])
+def test_let_statements(src, expected, tree_engine):
+    assert_integer_object(eval_src(src, tree_engine), expected)
+
+@pytest.mark.parametrize("src, expected_message", [
+    ("a; let a = 1;", "identifier not found: a"),
+    ("let a = a;", "identifier not found: a"),
+    ("let a = -true; a", "unknown operator: -BOOLEAN"),
+    ("if (false) { let b = 1; } b", "identifier not found: b"),
+])
+def test_let_statement_errors(src, expected_message, tree_engine):
+    evaluated = eval_src(src, tree_engine)
+    assert isinstance(evaluated, Error)
+    assert evaluated.message == expected_message
+
+def test_session_keeps_globals(tree_engine):
+    session = sessions[tree_engine]()
+    assert session.run(Parser(Lexer("x")).parse_program()).message == "identifier not found: x"
+    assert session.run(Parser(Lexer("let x = 2; let y = 3;")).parse_program()) is None
+    assert_integer_object(session.run(Parser(Lexer("x * y")).parse_program()), 6)
+
+@pytest.mark.parametrize("src, expected", [
+    ("return 10;", 10),
+    ("return 10; 9;", 10),
+    ("return 2 * 5; 9;", 10),
+    ("9; return 2 * 5; 9;", 10),
+    ("if (10 > 1) { if (10 > 1) { return 10; } return 1; }", 10),
+    ("let f = fn(x) { return x; x + 10; }; f(10);", 10),
+    ("let f = fn(x) { let result = x + 10; return result; return 10; }; f(10);", 20),
+])
+def test_return_statements(src, expected, tree_engine):
+    assert_integer_object(eval_src(src, tree_engine), expected)
+
+def test_function_object(tree_engine):
+    evaluated = eval_src("fn(x) { x + 2; };", tree_engine)
+    assert isinstance(evaluated, Function)
+    assert [p.string() for p in evaluated.parameters] == ["x"]
+    assert evaluated.body.string() == "(x + 2)"
+
+@pytest.mark.parametrize("src, expected", [
+    ("let identity = fn(x) { x; }; identity(5);", 5),
+    ("let identity = fn(x) { return x; }; identity(5);", 5),
+    ("let double = fn(x) { x * 2; }; double(5);", 10),
+    ("let add = fn(x, y) { x + y; }; add(5, 5);", 10),
+    ("let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", 20),
+    ("fn(x) { x; }(5)", 5),
+    ("let f = fn(a, a) { a }; f(1, 2)", 2),
+    ("let f = fn() { let x = 3; x * 2 }; f()", 6),
+])
+def test_function_application(src, expected, tree_engine):
+    assert_integer_object(eval_src(src, tree_engine), expected)
+
+@pytest.mark.parametrize("src, expected", [
+    ("let newAdder = fn(x) { fn(y) { x + y }; }; let addTwo = newAdder(2); addTwo(2);", 4),
+    ("let f = fn() { g() }; let g = fn() { 7 }; f()", 7),
+    ("let x = 1; let f = fn() { x }; let x = 2; f()", 2),
+    ("let f = fn(n) { let g = fn() { n * k }; let k = 3; g() }; f(5)", 15),
+    ("let counter = fn(x) { fn() { x + 1 } }; let a = counter(1); let b = counter(10); a() + b()", 13),
+])
+def test_closures(src, expected, tree_engine):
+    assert_integer_object(eval_src(src, tree_engine), expected)
+
+@pytest.mark.parametrize("src, expected_message", [
+    ("let f = fn(x) { x }; f(1, 2)", "wrong number of arguments: want=1, got=2"),
+    ("5(1)", "not a function: INTEGER"),
+    ("let f = fn(x) { x }; f(-true)", "unknown operator: -BOOLEAN"),
+    ("let f = fn() { return -true; }; f() + 1", "unknown operator: -BOOLEAN"),
+])
+def test_function_errors(src, expected_message, tree_engine):
+    evaluated = eval_src(src, tree_engine)
+    assert isinstance(evaluated, Error)
+    assert evaluated.message == expected_message
+
+@pytest.mark.parametrize("src", [
+    "let loop = fn(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + n) } }; loop({n}, 0)",
+    "let loop = fn(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + n); }; loop({n}, 0)",
+    "let loop = fn(n, acc) { if (n > 0) { return loop(n - 1, acc + n); } acc }; loop({n}, 0)",
+    "let even = fn(n, acc) { if (n == 0) { acc } else { odd(n - 1, acc + n) } };"
+    "let odd = fn(n, acc) { if (n == 0) { acc } else { even(n - 1, acc + n) } }; even({n}, 0)",
+    "let loop = fn(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + n) } }; return loop({n}, 0);",
+])
+def test_tail_calls_run_in_constant_stack(src, tree_engine):
+    n = 5 * sys.getrecursionlimit()
+    assert_integer_object(eval_src(src.replace("{n}", str(n)), tree_engine), n * (n + 1) // 2)
+
+def test_non_tail_recursion(tree_engine):
+    src = "let fib = fn(n) { if (n < 2) { return n; } fib(n - 1) + fib(n - 2) }; fib(15)"
+    assert_integer_object(eval_src(src, tree_engine), 610)
+
+@pytest.mark.parametrize("src, expected", [
+    ("[1, 2 * 2, 3 + 3]", "[1, 4, 6]"),
+    ("[]", "[]"),
+    ("[1, true, fn(x) { x }][1]", "true"),
+    ("let a = [1, 2, 3]; a[0] + a[1] + a[2]", "6"),
+    ("let i = 0; [1][i]", "1"),
+    ("[1, 2, 3][3]", "null"),
+    ("[1, 2, 3][-1]", "null"),
+    ("[fn(x) { x * 2 }][0](21)", "42"),
+    ("[1, 2, 3] * [4, 5, 6]", "[4, 10, 18]"),
+    ("[1, 2, 3] - 1", "[0, 1, 2]"),
+    ("10 / [1, 2, -3]", "[10, 5, -3]"),
+    ("-[1, -2]", "[-1, 2]"),
+    ("[1, 2, 3] > 1", "[false, true, true]"),
+    ("[1, 2] == [1, 3]", "[true, false]"),
+    ("[9223372036854775807] + 1", "[9223372036854775808]"),
+    ("[1, 2] + [1]", "ERROR: array length mismatch: 2 + 1"),
+    ("[1, 2] / [1, 0]", "ERROR: division by zero"),
+    ("[1, true] + 1", "ERROR: type mismatch: ARRAY + INTEGER"),
+    ("[true] + [true]", "ERROR: unknown operator: ARRAY + ARRAY"),
+    ("1[0]", "ERROR: index operator not supported: INTEGER"),
+])
+def test_arrays(src, expected, tree_engine):
+    assert eval_src(src, tree_engine).inspect() == expected
+
+@pytest.mark.parametrize("src, expected", [
+    ("len([1, 2, 3])", "3"),
+    ("len(1)", "ERROR: argument to `len` not supported, got INTEGER"),
+    ("len([1], [2])", "ERROR: wrong number of arguments: want=1, got=2"),
+    ("first([1, 2])", "1"),
+    ("first([])", "null"),
+    ("last([1, 2])", "2"),
+    ("rest([1, 2, 3])", "[2, 3]"),
+    ("rest([])", "null"),
+    ("push([1], 2)", "[1, 2]"),
+    ("push([1], true)", "[1, true]"),
+    ("sum(range(101))", "5050"),
+    ("sum([])", "0"),
+    ("sum([true])", "ERROR: argument to `sum` must be ARRAY of INTEGER"),
+    ("range(3)", "[0, 1, 2]"),
+    ("range(1, 10, 4)", "[1, 5, 9]"),
+    ("range(3, 0, -1)", "[3, 2, 1]"),
+    ("range(1, 2, 0)", "ERROR: `range` step must not be zero"),
+    ("abs(-3)", "3"),
+    ("abs([-1, 2])", "[1, 2]"),
+    ("map(range(-2, 2), abs)", "[2, 1, 0, 1]"),
+    ("map([[1], [2, 3]], len)", "[1, 2]"),
+    ("map([1, []], len)", "ERROR: argument to `len` not supported, got INTEGER"),
+    ("map([1], fn(x) { x })", "ERROR: argument to `map` must be BUILTIN, got FUNCTION"),
+    ("let double = fn(xs) { xs * 2 }; sum(double(range(4)))", "12"),
+    ("let len = fn(x) { 0 }; len([1])", "0"),
+    ("let f = fn() { len }; f()([1, 2])", "2"),
+])
+def test_builtin_functions(src, expected, tree_engine):
+    assert eval_src(src, tree_engine).inspect() == expected
+
+def test_puts(tree_engine, capsys):
+    assert eval_src("puts(1, [true])", tree_engine) is NULL
+    assert capsys.readouterr().out == "1\n[true]\n"
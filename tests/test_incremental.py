@@ -0,0 +1,73 @@
+import random
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from incremental import TextEdit, parse_source, reparse
+
+
+def full_parse(src: str):
+    parser = Parser(Lexer(src))
+    return parser.parse_program(), parser.errors
+
+
+def assert_matches_full_parse(parsed):
+    program, errors = full_parse(parsed.source)
+    assert parsed.program == program
+    assert parsed.errors == errors
+    tokens = list(Lexer(parsed.source).tokenize())
+    assert [(t.type, t.start, t.length) for t in parsed.tokens] == [(t.type, t.start, t.length) for t in tokens]
+    assert all(t.source is parsed.source for t in parsed.tokens)
+    assert ([(s.token.line, s.token.column) for s in parsed.program.statements]
+            == [(s.token.line, s.token.column) for s in program.statements])
+
+
+@pytest.mark.parametrize("src, edit", [
+    ("let a = 1;\nlet b = 2;\nlet c = 3;", TextEdit(19, 1, "20")),
+    ("let a = 1;\nlet b = 2;\nlet c = 3;", TextEdit(11, 11, "")),
+    ("let a = 1;\nlet b = 2;\nlet c = 3;", TextEdit(0, 0, "let z = 0;\n")),
+    ("let a = 1;\nlet b = 2;\nlet c = 3;", TextEdit(30, 0, "\nc")),
+    ("let ab = 1;\nab", TextEdit(5, 0, "c")),
+    ("let a = 1\nlet b = 2;", TextEdit(9, 0, " +")),
+    ("x\ny;", TextEdit(1, 0, " + 1")),
+    ("let f = fn(x) {\n  x * 2\n};\nf(3);", TextEdit(14, 1, "")),
+    ("let f = fn(x) {\n  x * 2\n};\nf(3);", TextEdit(14, 0, "{")),
+    ("let = 1;\nlet b = 2;\nlet = 3;", TextEdit(9, 0, "\n\n")),
+    ("let = 1;\nlet b = 2;\nlet = 3;", TextEdit(0, 8, "let a = 1;")),
+    ("", TextEdit(0, 0, "1 + 2")),
+    ("1 + 2", TextEdit(0, 5, "")),
+])
+def test_reparse_matches_full_parse(src, edit):
+    parsed = reparse(parse_source(src), edit)
+    assert parsed.source == edit.apply(src)
+    assert_matches_full_parse(parsed)
+
+
+def test_unchanged_statements_are_reused():
+    src = "".join(f"let {name} = {i};\n" for i, name in enumerate("abcdefgh"))
+    old = parse_source(src)
+    before = list(old.program.statements)
+    parsed = reparse(old, TextEdit(src.index("3"), 1, "(3 + 4)"))
+    after = parsed.program.statements
+    assert [a is b for a, b in zip(before, after)] == [True] * 3 + [False] + [True] * 4
+    assert after[4].token.line == 5
+    assert after[3].string() == "let d = (3 + 4);"
+
+
+def test_random_edits():
+    fragments = ["let ", "x", "y", " = ", "12", ";", "\n", "fn(a) { a + 1 }", "(", ")", "{", "}",
+                 "[", "]", "+", "-", " ", "if (x) { y } else { 2 };", "return ", "==", "!", ","]
+    rng = random.Random(7)
+    for _ in range(100):
+        parsed = parse_source("".join(rng.choice(fragments) for _ in range(rng.randint(0, 30))))
+        for _ in range(10):
+            offset = rng.randint(0, len(parsed.source))
+            removed = rng.randint(0, min(4, len(parsed.source) - offset))
+            inserted = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 2)))
+            parsed = reparse(parsed, TextEdit(offset, removed, inserted))
+            assert_matches_full_parse(parsed)
+
+
+@pytest.mark.parametrize("edit", [TextEdit(-1, 0, ""), TextEdit(2, 2, ""), TextEdit(4, 0, "x")])
+def test_edits_out_of_range(edit):
+    with pytest.raises(ValueError):
+        reparse(parse_source("1 +"), edit)
@@ -0,0 +1,100 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+from object import Integer, Boolean
+import evaluator
+import inline_cache
+from inline_cache import GENERIC, OperatorCache, CallCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    inline_cache.stats.reset()
+    yield inline_cache.stats
+
+
+def parse(src: str, nodes=None):
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def run(program):
+    result = evaluator.run(program)
+    return result and result.inspect()
+
+
+def body_expression(program, index: int = 0):
+    # the last expression in the body of the function bound by the index-th let
+    return program.statements[index].value.body.statements[-1].expression
+
+
+def test_operators_specialize_on_first_types(fresh_stats):
+    program = parse("let f = fn(a, b) { a + b }; let g = fn(a, b) { a == b }; [f(1, 2), g(true, false)]")
+    assert run(program) == "[3, false]"
+
+    add, equals = body_expression(program), body_expression(program, 1)
+    assert (add.cache.left_type, add.cache.right_type, add.cache.handler) == (Integer, Integer, inline_cache.int_add)
+    assert (equals.cache.left_type, equals.cache.right_type) == (Boolean, Boolean)
+    assert fresh_stats.specializations == 4
+    assert fresh_stats.deoptimizations == 0
+
+
+def test_operators_deoptimize_on_new_types(fresh_stats):
+    program = parse("let f = fn(a, b) { a + b }; [f(1, 2), f([1], [2]), f(3, 4)]")
+    assert run(program) == "[3, [3], 7]"
+    assert body_expression(program).cache is GENERIC
+    assert fresh_stats.deoptimizations == 1
+
+
+def test_operators_without_fast_path_are_generic(fresh_stats):
+    program = parse("let f = fn(a, b) { a == b }; [f(1, true), f(1, 1)]")
+    assert run(program) == "[false, true]"
+    assert body_expression(program).cache is GENERIC
+    assert fresh_stats.deoptimizations == 0
+
+
+def test_division_by_zero_on_fast_path():
+    program = parse("let f = fn(a, b) { a / b }; if (f(-7, 2) == -3) { f(1, 0) }")
+    assert run(program) == "ERROR: division by zero"
+    assert isinstance(body_expression(program).cache, OperatorCache)
+
+
+def test_call_sites_cache_the_callee_literal(fresh_stats):
+    program = parse("let adder = fn(a) { fn(b) { a + b } }; "
+                    "let apply = fn(f) { f(1) }; "
+                    "apply(adder(1)) + apply(adder(2))")
+    assert run(program) == "5"
+    # functions made from one literal share their body
+    call = body_expression(program, 1)
+    assert isinstance(call.cache, CallCache) and call.cache.body is not None
+
+
+def test_call_sites_deoptimize_on_new_callee(fresh_stats):
+    program = parse("let apply = fn(f) { f(1) }; [apply(fn(x) { x }), apply(fn(x) { x * 2 }), apply(abs)]")
+    assert run(program) == "[1, 2, 1]"
+    assert body_expression(program).cache is GENERIC
+    assert fresh_stats.deoptimizations == 1
+
+
+def test_builtin_call_sites_see_shadowing():
+    program = parse("let h = fn(c) { if (c) { let len = fn(x) { 0 }; }; len([1, 2]) }; "
+                    "[h(false), h(true), h(false)]")
+    assert run(program) == "[2, 0, 2]"
+    assert body_expression(program).cache is GENERIC
+
+    program = parse("let h = fn(xs) { len(xs) }; [h([]), h([1])]")
+    assert run(program) == "[0, 1]"
+    assert repr(body_expression(program).cache) == "CallCache(builtin len)"
+
+
+def test_arena_nodes_keep_their_caches():
+    arena = AstArena()
+    program = parse("let f = fn(a) { a * 2 }; f(1) + f(2)", arena)
+    assert run(program) == "6"
+    caches = list(arena.caches.values())
+    assert GENERIC not in caches
+    assert sum(isinstance(c, OperatorCache) for c in caches) == 2
+    assert sum(isinstance(c, CallCache) for c in caches) == 2
@@ -0,0 +1,84 @@
+import pytest
+import evaluator
+import instrumentation
+from instrumentation import EvalStats, instrumented
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+from main import engines, repl_command
+
+
+def parse(src: str, nodes=None):
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+@pytest.fixture(autouse=True)
+def restore_eval():
+    yield
+    instrumentation.disable()
+    instrumentation.stats.reset()
+
+
+@pytest.mark.parametrize("nodes", [None, AstArena()])
+def test_counts_per_node_type(nodes):
+    program = parse("if (1 < 2) { 3 * 4 + 5 } else { 6 }", nodes)
+    with instrumented(EvalStats()) as stats:
+        assert engines['eval'](program).inspect() == "17"
+
+    assert stats['Program'].count == 1
+    assert stats['IfExpression'].count == 1
+    assert stats['BlockStatement'].count == 1
+    assert stats['IntegerLiteral'].count == 5
+    assert stats['InfixExpression <'].count == 1
+    assert stats['InfixExpression *'].count == 1
+    assert stats['InfixExpression +'].count == 1
+    assert 'InfixExpression -' not in stats
+
+
+def test_times_nest():
+    program = parse("1 + 2 * 3 - 4")
+    with instrumented(EvalStats()) as stats:
+        engines['eval'](program)
+
+    program_stats = stats['Program']
+    assert program_stats.total_time >= program_stats.self_time >= 0
+    assert program_stats.total_time == pytest.approx(
+        sum(entry.self_time for entry in stats.nodes.values()))
+
+
+def test_disabled_restores_plain_eval():
+    assert not instrumentation.is_enabled()
+    with instrumented():
+        assert instrumentation.is_enabled()
+        assert evaluator.eval is not instrumentation.original_eval
+    assert evaluator.eval is instrumentation.original_eval
+
+    instrumentation.stats.reset()
+    engines['eval'](parse("1 + 2"))
+    assert not instrumentation.stats.nodes
+
+
+def test_errors_are_still_counted():
+    program = parse("-true + 1")
+    with instrumented(EvalStats()) as stats:
+        assert engines['eval'](program).inspect() == "ERROR: unknown operator: -BOOLEAN"
+    assert stats['PrefixExpression'].count == 1
+    assert 'InfixExpression +' in stats
+
+
+def test_stats_command():
+    assert "stats are off" in repl_command(":stats")
+    assert "enabled" in repl_command(":stats on")
+    engines['eval'](parse("1 + 2"))
+    report = repl_command(":stats")
+    assert "InfixExpression +" in report
+    assert "IntegerLiteral" in report
+    assert "reset" in repl_command(":stats reset")
+    assert repl_command(":stats") == "no evaluations recorded"
+    assert "disabled" in repl_command(":stats off")
+    assert evaluator.eval is instrumentation.original_eval
+    assert "usage" in repl_command(":stats bogus")
+    assert "unknown command" in repl_command(":foo")
@@ -1,5 +1,9 @@
+import mmap
+import pickle
+import pytest
 from lexer import Lexer
-from token_type import Token, TokenType
+from token_type import Token, TokenType, SymbolToken
+import symbols
 
 def test_next_token():
     input_str = '''let five = 5;
@@ -104,3 +108,99 @@ def test_next_token():
 
     for expected in expected_tokens:
         assert lexer.next_token() == expected
+
+
+def next_tokens(lexer: Lexer):
+    tokens = []
+    while True:
+        tokens.append(lexer.next_token())
+        if tokens[-1].type == TokenType.EOF:
+            return tokens
+
+@pytest.mark.parametrize("input_str", [
+    "",
+    "   \n\t ",
+    "let add = fn(x, y) { x + y; };",
+    "a==b!=c=!d",
+    "if (5 < 10) { return true; } else { return false; }",
+    "x_y @ 3$ élan",
+    "12ab 3 == ! =",
+    "foo\r\nbar\n",
+    "[1, a][0]",
+    "x²",
+    "½",
+    "x²y³ 4½ Ⅻ ٣٤",
+    "let² = fn½",
+])
+def test_tokenize_matches_next_token(input_str):
+    assert list(Lexer(input_str).tokenize()) == next_tokens(Lexer(input_str))
+
+def test_token_position():
+    tokens = list(Lexer("let x = 5;\n  x + y;\n").tokenize())
+
+    assert [(t.literal, t.line, t.column) for t in tokens] == [
+        ("let", 1, 1), ("x", 1, 5), ("=", 1, 7), ("5", 1, 9), (";", 1, 10),
+        ("x", 2, 3), ("+", 2, 5), ("y", 2, 7), (";", 2, 8),
+        ("", 3, 1),
+    ]
+
+def test_tokens_share_source():
+    input_str = "let five = 5;"
+    for token in Lexer(input_str).tokenize():
+        assert token.source is input_str
+        assert not hasattr(token, "__dict__")
+
+
+stream_src = '''let five = 5;
+let add = fn(x, y) {
+    x + y;
+};
+add(five, 10) != 15;
+'''
+
+@pytest.mark.parametrize("chunks", [
+    [stream_src],
+    list(stream_src),
+    [stream_src[:6], stream_src[6:21], stream_src[21:]],
+])
+def test_from_chunks(chunks):
+    expected = list(Lexer(stream_src).tokenize())
+
+    assert list(Lexer.from_chunks(chunks, window_size=8).tokenize()) == expected
+    assert next_tokens(Lexer.from_chunks(chunks, window_size=8)) == expected
+
+def test_from_chunks_positions():
+    expected = [(t.line, t.column) for t in Lexer(stream_src).tokenize()]
+
+    tokens = list(Lexer.from_chunks(iter(stream_src), window_size=8).tokenize())
+    assert [(t.line, t.column) for t in tokens] == expected
+    assert len({id(t.source) for t in tokens}) > 1
+
+def test_from_file_and_mmap(tmp_path):
+    path = tmp_path / "script.mk"
+    path.write_text(stream_src * 1000, encoding="utf-8")
+    expected = list(Lexer(stream_src * 1000).tokenize())
+
+    assert list(Lexer.from_file(str(path)).tokenize()) == expected
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        assert next_tokens(Lexer.from_mmap(buffer)) == expected
+
+
+def test_identifiers_are_interned():
+    tokens = [t for t in Lexer("let abc = abc + fn(x) { abc }; abc").tokenize() if t.type == TokenType.IDENT]
+    assert len(tokens) == 5
+    assert all(isinstance(t, SymbolToken) for t in tokens)
+    abc = [t for t in tokens if t.literal == "abc"]
+    assert len({t.symbol for t in abc}) == 1
+    assert all(t.literal is symbols.table.name(abc[0].symbol) for t in abc)
+    assert symbols.intern("abc") == abc[0].symbol
+
+
+def test_symbol_tokens_are_numbered_again_when_unpickled(monkeypatch):
+    token = next(Lexer("pickled").tokenize())
+    data = pickle.dumps(token)
+    monkeypatch.setattr(symbols, "table", symbols.SymbolTable())
+    symbols.intern("other")
+    copy = pickle.loads(data)
+    assert copy.literal == "pickled" and copy.symbol == 1
+    assert (copy.start, copy.length, copy.line) == (0, 7, 1)
@@ -0,0 +1,116 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from object import Integer
+import memoization
+from memoization import MemoCache
+from main import engines, repl_command, main
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    memoization.cache = MemoCache()
+    yield memoization.cache
+    memoization.cache = MemoCache()
+
+
+@pytest.fixture(params=["eval", "stack", "closure"])
+def run(request):
+    return engines[request.param]
+
+
+def eval_src(src: str, run):
+    parser = Parser(Lexer(src))
+    program = parser.parse_program()
+    assert not parser.errors
+    return run(program)
+
+
+FIB = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+
+
+def test_recursive_calls_are_memoized(run, fresh_cache):
+    assert eval_src(FIB + "let r = fib(60); r", run).inspect() == "1548008755920"
+    assert fresh_cache.misses == 61
+    assert fresh_cache.hits == 58
+    assert len(fresh_cache) == 61
+
+
+@pytest.mark.parametrize("src, expected", [
+    # a rebound global changes what the caller computes
+    ("let g = fn(x) { x + 1 }; let f = fn(x) { g(x) }; let a = f(1);"
+     "let g = fn(x) { x + 100 }; a + f(1)", 103),
+    # so does a rebound variable captured by a closure
+    ("let outer = fn() { let k = 1; let h = fn(x) { x + k }; let a = h(1); let k = 10; a + h(1) };"
+     "outer()", 13),
+    # and a rebound variable read by a function the caller reaches
+    ("let h = 1; let g = fn(x) { x + h }; let f = fn(x) { g(x) * 1 }; let a = f(1); let h = 10;"
+     "a * 100 + f(1)", 211),
+    # or by a function passed as an argument
+    ("let k = 1; let add = fn(x) { x + k }; let app = fn(g, x) { g(x) }; let a = app(add, 1);"
+     "let k = 10; a * 100 + app(add, 1)", 211),
+    ("let adder = fn(k) { fn(x) { x + k } }; let a = adder(1); let b = adder(2); a(1) + b(1) + a(1)", 7),
+    ("let f = fn(x) { x }; let r = f(1) + f(1); r + f(true) - 1", None),
+])
+def test_memoized_results_follow_free_variables(src, expected, run):
+    evaluated = eval_src(src, run)
+    if expected is None:
+        assert evaluated.message == "type mismatch: INTEGER + BOOLEAN"
+    else:
+        assert evaluated == Integer(expected)
+
+
+def test_side_effecting_functions_are_not_stored(run, fresh_cache):
+    src = ("let show = fn(x) { if (x > 9) { puts(x) } else { x } }; let f = fn(x) { show(x) }; let g = fn(x) { x };"
+           "let a = f(1); let b = f(1); let c = g(1); let d = g(1); d")
+    assert eval_src(src, run).inspect() == "1"
+    assert len(fresh_cache) == 1
+    assert all(memoization.is_pure(key[0]) for key in fresh_cache.entries)
+    assert fresh_cache.hits == 1
+
+
+@pytest.mark.parametrize("src", [
+    "let p = puts; let f = fn(x) { p(x); 1 }; f(1); f(1)",
+    "let app = fn(g, x) { g(x); 1 }; app(puts, 1); app(puts, 1)",
+])
+def test_side_effecting_builtins_are_found_by_value(src, run, capsys, fresh_cache):
+    assert eval_src(src, run).inspect() == "1"
+    assert capsys.readouterr().out == "1\n1\n"
+    assert len(fresh_cache) == 0
+
+
+def test_lru_eviction():
+    cache = MemoCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.resize(1)
+    assert list(cache.entries) == ['c']
+
+
+def test_negative_sizes_are_rejected(fresh_cache, capsys):
+    with pytest.raises(ValueError):
+        fresh_cache.resize(-1)
+    assert fresh_cache.maxsize == memoization.DEFAULT_MAXSIZE
+    with pytest.raises(SystemExit):
+        main(["--memo-size", "-1"])
+    assert "--memo-size: must not be negative: -1" in capsys.readouterr().err
+
+
+def test_disabled(run, fresh_cache):
+    fresh_cache.resize(0)
+    assert eval_src(FIB + "fib(15)", run).inspect() == "610"
+    assert (fresh_cache.hits, fresh_cache.misses, len(fresh_cache)) == (0, 0, 0)
+
+
+def test_memo_command(fresh_cache):
+    eval_src(FIB + "let r = fib(10); r", engines["eval"])
+    assert repl_command(":memo") == "\thits=8 misses=11 size=11/1024"
+    assert repl_command(":memo size 4") == "\thits=8 misses=11 size=4/4"
+    assert repl_command(":memo clear") == "\tmemo cache cleared"
+    assert repl_command(":memo") == "\thits=0 misses=0 size=0/4"
+    assert "usage" in repl_command(":memo size x")
@@ -0,0 +1,72 @@
+import pickle
+import pytest
+from array import array
+from object import (Integer,
+                    Array,
+                    Boolean,
+                    Null,
+                    Error,
+                    TRUE,
+                    FALSE,
+                    NULL,
+                    SMALL_INT_MIN,
+                    SMALL_INT_MAX,
+                    int_div)
+
+
+def test_boolean_and_null_are_singletons():
+    assert Boolean(True) is TRUE
+    assert Boolean(False) is FALSE
+    assert Null() is NULL
+
+@pytest.mark.parametrize("value", [SMALL_INT_MIN, -1, 0, 1, SMALL_INT_MAX])
+def test_small_integers_are_cached(value):
+    assert Integer(value) is Integer(value)
+
+@pytest.mark.parametrize("value", [SMALL_INT_MIN - 1, SMALL_INT_MAX + 1, 10 ** 30])
+def test_large_integers_are_allocated(value):
+    assert Integer(value) is not Integer(value)
+    assert Integer(value) == Integer(value)
+    assert hash(Integer(value)) == hash(Integer(value))
+
+@pytest.mark.parametrize("obj", [Integer(1), Integer(10 ** 6), TRUE, FALSE, NULL, Error("boom"), Array([])])
+def test_objects_have_no_dict(obj):
+    assert not hasattr(obj, "__dict__")
+
+@pytest.mark.parametrize("obj", [Integer(1), TRUE, FALSE, NULL])
+def test_pickle_keeps_canonical_instances(obj):
+    assert pickle.loads(pickle.dumps(obj)) is obj
+
+@pytest.mark.parametrize("left, right, expected", [
+    (7, 2, 3),
+    (-7, 2, -3),
+    (7, -2, -3),
+    (-7, -2, 3),
+    (6, 3, 2),
+])
+def test_int_div_truncates(left, right, expected):
+    assert int_div(left, right) == expected
+
+def test_integer_arrays_are_unboxed():
+    numeric = Array.from_objects([Integer(1), Integer(-2), Integer(3)])
+    assert numeric.elements == array('q', [1, -2, 3])
+    assert numeric[1] == Integer(-2)
+    assert numeric.inspect() == "[1, -2, 3]"
+
+    mixed = Array.from_objects([Integer(1), TRUE])
+    assert mixed.elements == [Integer(1), TRUE]
+    assert mixed.ints() is None
+    assert mixed.inspect() == "[1, true]"
+
+def test_arrays_fall_back_to_objects_on_overflow():
+    big = Array.from_ints([1, 2 ** 64])
+    assert not big.is_numeric()
+    assert big.ints() == [1, 2 ** 64]
+    assert big == Array.from_objects([Integer(1), Integer(2 ** 64)])
+
+def test_arrays_compare_by_elements():
+    assert Array.from_ints([1, 2]) == Array([Integer(1), Integer(2)])
+    assert Array.from_ints([1, 2]) != Array.from_ints([2, 1])
+    assert pickle.loads(pickle.dumps(Array.from_ints([1, 2]))) == Array.from_ints([1, 2])
+    with pytest.raises(TypeError):
+        hash(Array([]))
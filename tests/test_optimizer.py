@@ -0,0 +1,89 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+from ast_type import Program
+from optimizer import optimize, count_nodes
+from evaluator import run
+
+
+def parse(src: str, nodes=None) -> Program:
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+@pytest.mark.parametrize("src, expected", [
+    ("(2 * 3) + 4", "10"),
+    ("1 + 2 * 3 - 4 / 2", "5"),
+    ("-7 / 2", "-3"),
+    ("-(5 + 5)", "-10"),
+    ("!true", "false"),
+    ("!5", "false"),
+    ("1 < 2 == true", "true"),
+    ("1 == true", "false"),
+    ("true != false", "true"),
+    ("!!(a < b)", "(!(!(a < b)))"),
+    ("!!!a", "(!a)"),
+    ("!!a", "(!(!a))"),
+    ("a + 2 * 3", "(a + 6)"),
+    ("1 / 0", "(1 / 0)"),
+    ("true + 1", "(true + 1)"),
+    ("if (true) { a } else { b }", "a"),
+    ("if (1 > 2) { a } else { b }", "b"),
+    ("if (0) { a }", "a"),
+    ("if (false) { a }", "iftrue  "),
+    ("if (true) { let x = 1; x }", "iftrue let x = 1;x "),
+    ("if (x) { 1 + 1 } else { 2 * 2 }", "ifx 2 else 4"),
+    ("1; 2; a", "a"),
+    ("let x = 2 * 3; x", "let x = 6;x"),
+    ("fn(x) { 1; x * (2 + 2) }", "fn(x)(x * 4)"),
+    ("f(1 + 1, !true)", "f(2,false)"),
+    ("[1 + 2, x][2 - 1]", "([3, x][1])"),
+])
+def test_optimize(src, expected):
+    optimized, _ = optimize(parse(src))
+    assert optimized.string() == expected
+
+def test_report():
+    program = parse("if (true) { 2 * 3 } else { 4 }")
+    optimized, report = optimize(program)
+
+    assert report.nodes_before == count_nodes(program) == 12
+    assert report.nodes_after == count_nodes(optimized) == 3
+    assert report.removed == 9
+    assert report.folded == 1
+    assert report.pruned == 1
+
+def test_unchanged_program_is_shared():
+    program = parse("let x = a + b; f(x)")
+    optimized, report = optimize(program)
+
+    assert optimized is program
+    assert report.removed == 0
+
+def test_optimize_arena_program():
+    optimized, report = optimize(parse("1 + 2; a * (3 - 1)", AstArena()))
+
+    assert optimized.string() == "(a * 2)"
+    assert report.removed == 6
+
+@pytest.mark.parametrize("src", [
+    "5 + 5 + 5 + 5 - 10",
+    "(5 + 10 * 2 + 15 / 3) * 2 + -10",
+    "-7 / 2",
+    "!!5",
+    "(1 < 2) == false",
+    "if (1 > 2) { 10 }",
+    "if (1 < 2) { 10 } else { 20 }",
+    "if (true) { }",
+    "5 + true; 5;",
+    "-true",
+    "if (10 > 1) { true + false; }",
+    "1 / 0",
+    "!!([1, 2] < [3, 0])",
+    "!!!([1, 2] == [1, 3])",
+])
+def test_optimized_program_evaluates_the_same(src):
+    optimized, _ = optimize(parse(src))
+    assert run(optimized) == run(parse(src))
@@ -0,0 +1,67 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from parallel_parser import split_source, parse_piece, parse_parallel
+from optimizer import count_nodes
+from main import run_file
+import evaluator
+
+
+def parse(src: str):
+    parser = Parser(Lexer(src))
+    return parser.parse_program(), parser.errors
+
+
+def positions(program):
+    return [(s.token.line, s.token.column) for s in program.statements]
+
+
+@pytest.mark.parametrize("src, pieces", [
+    ("let a = 1;\nlet b = 2;\nlet c = 3;\n", ["let a = 1;\n", "let b = 2;\n", "let c = 3;\n"]),
+    ("let f = fn(x) {\n  x;\n};\nf(1);", ["let f = fn(x) {\n  x;\n};\n", "f(1);"]),
+    ("let a = [1;\n2];\nb;\nc", ["let a = [1;\n2];\n", "b;\n", "c"]),
+    ("a; b;\nc", ["a; b;\n", "c"]),
+    ("", [""]),
+])
+def test_split_source(src, pieces):
+    windows = split_source(src, 1)
+    assert windows == pieces
+    assert [w.first_line for w in windows] == [1 + src.count('\n', 0, src.find(p)) for p in pieces]
+
+
+def test_split_source_keeps_pieces_above_the_size():
+    src = "let a = 1;\n" * 10
+    assert split_source(src, 25) == ["let a = 1;\n" * 3] * 3 + ["let a = 1;\n"]
+
+
+@pytest.mark.parametrize("src", [
+    "let a = 1;\nlet f = fn(x) {\n  if (x > a) { x } else { a };\n};\nlet b = [1,\n  2];\nf(b[0]);\n" * 5,
+    "let a = 1;\nlet b = ;\nlet c = 2;\n" * 3,
+    "let a = 1;\n1 + ;\n+ 2;\nlet c = 2;\n" * 3,
+    "let a = 1;\n) let b = 2;\n(3;\nlet c = 2;\n" * 3,
+    "let a = 1;\nlet f = fn() {\n  1;\n",
+])
+def test_matches_sequential_parser(src):
+    program, errors = parse_parallel(src, workers=2, piece_size=12)
+    expected, expected_errors = parse(src)
+    assert program == expected
+    assert positions(program) == positions(expected)
+    assert errors == expected_errors
+
+
+def test_pieces_too_deep_to_encode_are_parsed_by_the_caller():
+    payload, errors = parse_piece(split_source("-" * 5000 + "1;\n")[0])
+    assert payload is None and errors == []
+    src = "let a = 1;\n" + "-" * 5000 + "1;\nlet b = 2;\n"
+    program, errors = parse_parallel(src, workers=2, piece_size=1)
+    expected = parse(src)[0]
+    assert not errors
+    assert count_nodes(program) == count_nodes(expected) == 5009
+    assert positions(program) == positions(expected)
+
+
+def test_run_file_with_parse_workers(tmp_path, capsys):
+    script = tmp_path / "lets.mk"
+    script.write_text("".join(f"let {'abcdefghij'[i]} = {i};\n" for i in range(10)) + "a + j;\n")
+    assert run_file(str(script), evaluator.run, use_cache=False, parse_workers=2) == 0
+    assert capsys.readouterr().out == "9\n"
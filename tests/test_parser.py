@@ -11,12 +11,19 @@ from ast_type import (
     FunctionLiteral,
     PrefixExpression,
     CallExpression,
-    InfixExpression
+    InfixExpression,
+    ArrayLiteral,
+    IndexExpression
     )
 from lexer import Lexer
-from monkey_parser import Parser
+from monkey_parser import Parser, ParseError
+from ast_arena import AstArena
+from ast_type import LazyBlockStatement
+from optimizer import count_nodes
+import pickle
 import pytest
 from typing import Union
+import symbols
 
 
 def check_parse_errors(parser: Parser):
@@ -174,6 +181,12 @@ def test_parsing_infix_expressions(src, left_value, operator, right_value):
     ("2 / (5 + 5)", "(2 / (5 + 5))"),
     ("-(5 + 5)", "(-(5 + 5))"),
     ("!(true == true)", "(!(true == true))"),
+    ("a + add(b * c) + d", "((a + add((b * c))) + d)"),
+    ("add() * f()", "(add() * f())"),
+    ("a * [1, 2, 3, 4][b * c] * d", "((a * ([1, 2, 3, 4][(b * c)])) * d)"),
+    ("add(a * b[2], b[1], 2 * [1, 2][1])", "add((a * (b[2])),(b[1]),(2 * ([1, 2][1])))"),
+    ("-a[0]", "(-(a[0]))"),
+    ("f(1)[2](3)", "(f(1)[2])(3)"),
 ])
 def test_operator_precendence_parsing(src, expected):
     program = parse(src)
@@ -261,3 +274,121 @@ def test_call_expression_parsing():
     assert_literal_expression(exp.arguments[0], 1)
     assert_infix_expression(exp.arguments[1], 2, "*", 3)
     assert_infix_expression(exp.arguments[2], 4, "+", 5)
+
+
+def test_array_literal_parsing():
+    program = parse("[1, 2 * 2, 3 + 3]; []")
+
+    array = program.statements[0].expression
+    assert isinstance(array, ArrayLiteral)
+    assert len(array.elements) == 3
+    assert_literal_expression(array.elements[0], 1)
+    assert_infix_expression(array.elements[1], 2, "*", 2)
+    assert_infix_expression(array.elements[2], 3, "+", 3)
+    assert program.statements[1].expression.elements == []
+
+
+def test_index_expression_parsing():
+    exp = parse("myArray[1 + 1]").statements[0].expression
+
+    assert isinstance(exp, IndexExpression)
+    assert_literal_expression(exp.left, "myArray")
+    assert_infix_expression(exp.index, 1, "+", 1)
+
+
+@pytest.mark.parametrize("src, expected_errors", [
+    ("let = 5;", ["expected next token to be TokenType.IDENT, got TokenType.ASSIGN insted at line 1, column 5"]),
+    ("1 +\n  ;", ["no prefix parse function for TokenType.SEMICLOLON found at line 2, column 3"]),
+    ("[1, 2", ["expected next token to be TokenType.RBRACKET, got TokenType.EOF insted at line 1, column 6"]),
+    ("a[1", ["expected next token to be TokenType.RBRACKET, got TokenType.EOF insted at line 1, column 4"]),
+])
+def test_parse_errors(src, expected_errors):
+    parser = Parser(Lexer(src))
+    parser.parse_program()
+    assert parser.errors[:len(expected_errors)] == expected_errors
+
+@pytest.mark.parametrize("src, nodes", [
+    ("(" * 5000 + "1" + ")" * 5000, 3),
+    ("-" * 5000 + "1", 5003),
+    ("!-" * 2500 + "a", 5003),
+    ("f(" * 3000 + "1" + ")" * 3000, 6003),
+    ("1" + " + 2 * (3" * 3000 + ")" * 3000, 12003),
+], ids=["groups", "minus", "bang-minus", "calls", "infix"])
+def test_deeply_nested_expressions(src, nodes):
+    assert count_nodes(parse(src)) == nodes
+    with pytest.raises(RecursionError):
+        Parser(Lexer(src), recursive=True).parse_program()
+
+@pytest.mark.parametrize("src", [
+    "-a * b + f(1, -(2), g(x)) / (c - !d) == e",
+    "add() + f(1)(2, 3) * (4)",
+    "if (a) { b } else { c } + fn(x) { x }(1)",
+    "(1 + ; 2",
+    "f(1, 2",
+    "-",
+    "[1, -a, [b]][f(2) - 1] * [][0]",
+])
+def test_recursive_parser_builds_the_same_tree(src):
+    iterative, recursive = Parser(Lexer(src)), Parser(Lexer(src), recursive=True)
+    assert iterative.parse_program() == recursive.parse_program()
+    assert iterative.errors == recursive.errors
+
+
+@pytest.mark.parametrize("src", [
+    "let f = fn(x, y) { let z = x * y; if (z > 1) { z } else { fn() { if (z) { z } } } }; f(1, 2)",
+    "fn() { }",
+    "fn(a) { a }(1) + fn() { 2 }()",
+    "let f = fn() { 1",
+])
+def test_lazy_parser_builds_the_same_tree(src):
+    eager, lazy = Parser(Lexer(src)), Parser(Lexer(src), lazy=True)
+    assert lazy.parse_program().string() == eager.parse_program().string()
+    assert lazy.errors == eager.errors
+
+
+def test_lazy_bodies_are_parsed_on_first_use():
+    program = Parser(Lexer("let f = fn(x) { fn(y) { x + y } }; f"), lazy=True).parse_program()
+    body = program.statements[0].value.body
+    assert isinstance(body, LazyBlockStatement) and not body.parsed
+    assert count_nodes(program) == 8
+    assert not body.parsed
+
+    inner = body.statements[0].expression
+    assert body.parsed and body.span is None
+    assert isinstance(inner.body, LazyBlockStatement) and not inner.body.parsed
+    assert inner.body.string() == "(x + y)"
+
+
+def test_lazy_bodies_spanning_windows():
+    src = "let f = fn(x) {\n  let y = x + 1;\n  y * 2\n};\nf"
+    lexer = Lexer.from_chunks([src[i: i + 4] for i in range(0, len(src), 4)], window_size=8)
+    body = Parser(lexer, lazy=True).parse_program().statements[0].value.body
+    assert len(body.span.segments) == 2
+    assert body.string() == "let y = (x + 1);(y * 2)"
+    assert body.statements[1].token.line == 3
+
+
+def test_lazy_body_errors_are_raised_when_parsed():
+    parser = Parser(Lexer("let f = fn() {\n  let = 1; };"), lazy=True)
+    body = parser.parse_program().statements[0].value.body
+    assert not parser.errors
+    with pytest.raises(ParseError) as error:
+        body.statements
+    assert error.value.errors[:1] == [
+        "expected next token to be TokenType.IDENT, got TokenType.ASSIGN insted at line 2, column 7"]
+
+
+def test_lazy_parsing_needs_ast_type_nodes():
+    with pytest.raises(ValueError):
+        Parser(Lexer("1"), AstArena(), lazy=True)
+
+
+def test_identifiers_are_numbered_again_when_unpickled(monkeypatch):
+    src = "let pickled = fn(x) { x + pickled };"
+    data = pickle.dumps(Parser(Lexer(src)).parse_program())
+    monkeypatch.setattr(symbols, "table", symbols.SymbolTable())
+    symbols.intern("other")
+    program = pickle.loads(data)
+    assert program == Parser(Lexer(src)).parse_program()
+    name = program.statements[0].name
+    assert name.value == "pickled" and name.symbol == symbols.intern("pickled")
@@ -0,0 +1,112 @@
+import os
+import threading
+import pytest
+import program_cache
+from program_cache import load_program, read_cache, cache_path, source_digest, header
+from lexer import file_chunks
+from evaluator import run
+
+
+src = '''let double = fn(x) { x * 2 };
+let xs = [1, double(2)][1];
+if (1 < 2) { 10 * 3 } else { 0 }
+'''
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "script.mk"
+    path.write_text(src, encoding="utf-8")
+    return str(path)
+
+def test_cache_round_trip(script):
+    program, errors = load_program(script)
+    assert not errors
+
+    cached = read_cache(cache_path(script), source_digest(script))
+    assert cached is not None
+    assert cached.string() == program.string()
+    assert run(cached) == run(program)
+    assert [t.line for t in (cached.statements[1].token,)] == [2]
+
+def test_cached_program_is_used(script, monkeypatch):
+    load_program(script)
+
+    def fail(*args):
+        raise AssertionError("parsed instead of loading the cache")
+    monkeypatch.setattr(program_cache, "Parser", fail)
+
+    program, errors = load_program(script)
+    assert not errors
+    assert run(program).value == 30
+
+def test_source_change_invalidates_cache(script):
+    load_program(script)
+    with open(script, "a", encoding="utf-8") as f:
+        f.write("99")
+
+    program, _ = load_program(script)
+    assert run(program).value == 99
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:header.size - 1],
+    lambda data: data[:-3],
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:header.size] + b"\x00" * (len(data) - header.size),
+])
+def test_corrupt_cache_falls_back_to_parsing(script, corrupt):
+    load_program(script)
+    path = cache_path(script)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(data))
+
+    assert read_cache(path, source_digest(script)) is None
+    program, errors = load_program(script)
+    assert not errors
+    assert run(program).value == 30
+    assert read_cache(path, source_digest(script)) is not None
+
+def test_parse_errors_are_not_cached(tmp_path):
+    path = tmp_path / "broken.mk"
+    path.write_text("let = 1;", encoding="utf-8")
+
+    _, errors = load_program(str(path))
+    assert errors
+    assert not os.path.exists(cache_path(str(path)))
+
+def test_cache_can_be_disabled(script):
+    load_program(script, use_cache=False)
+    assert not os.path.exists(cache_path(script))
+
+def test_pipes_are_read_once_and_not_cached(tmp_path):
+    path = str(tmp_path / "pipe.mk")
+    os.mkfifo(path)
+
+    def feed():
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("1 + 41")
+    writer = threading.Thread(target=feed)
+    writer.start()
+    program, errors = load_program(path)
+    writer.join()
+    assert not errors
+    assert run(program).value == 42
+    assert not os.path.exists(cache_path(path))
+
+def test_source_changed_while_parsing_is_not_cached(script, monkeypatch):
+    reads = []
+
+    def edited_after_hashing(path):
+        # the file is hashed on the first read and parsed on the second
+        if reads:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("1 + 41")
+        reads.append(path)
+        return file_chunks(path)
+    monkeypatch.setattr(program_cache, "file_chunks", edited_after_hashing)
+
+    program, errors = load_program(script)
+    assert run(program).value == 42
+    assert len(reads) == 2
+    assert not os.path.exists(cache_path(script))
@@ -0,0 +1,142 @@
+import gc
+import ast
+import random
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from compiler import CompileError
+from resolver import resolve
+import evaluator
+import pycompiler
+from pycompiler import PythonCompiler, CodeCache
+
+
+def parse(src: str):
+    parser = Parser(Lexer(src))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def generated(src: str) -> str:
+    program = parse(src)
+    return ast.dump(PythonCompiler(len(resolve(program).globals)).compile_program(program))
+
+
+def random_expression(rng: random.Random, depth: int, kind: str = "int", names: bool = True) -> str:
+    # Mostly well typed, so most programs produce values rather than errors;
+    # now and then either operand type is picked at random.
+    if rng.random() < 0.03:
+        kind = rng.choice(["int", "bool"])
+    if depth == 0 or rng.random() < 0.2:
+        leaves = {"int": ["0", "1", "2", "7", "-3"], "bool": ["true", "false"]}
+        if names:
+            leaves = {"int": leaves["int"] + ["a"], "bool": leaves["bool"] + ["b"]}
+        return rng.choice(leaves[kind])
+
+    def operand(operand_kind=kind):
+        return random_expression(rng, depth - 1, operand_kind, names)
+
+    choice = rng.random()
+    if choice < 0.3:
+        alternative = f" else {{ {operand()} }}" if rng.random() < 0.8 else ""
+        let = f"let a = {operand('int')}; " if rng.random() < 0.3 else ""
+        return f"if ({operand('bool')}) {{ {let}{operand()} }}{alternative}"
+    elif kind == "int" and choice < 0.4:
+        return f"-{operand()}"
+    elif kind == "int":
+        return f"({operand()} {rng.choice(['+', '-', '*', '/'])} {operand()})"
+    elif choice < 0.4:
+        return f"!{operand()}"
+    elif choice < 0.7:
+        return f"({operand('int')} {rng.choice(['<', '>', '==', '!='])} {operand('int')})"
+    return f"({operand()} {rng.choice(['==', '!='])} {operand()})"
+
+
+def random_program(seed: int) -> str:
+    rng = random.Random(seed)
+    return (f"let a = {random_expression(rng, 2, names=False)}; "
+            f"let b = {random_expression(rng, 2, 'bool', names=False)}; "
+            f"{random_expression(rng, 5, rng.choice(['int', 'bool']))}")
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_evaluator(seed):
+    src = random_program(seed)
+    expected = evaluator.run(parse(src))
+    actual = pycompiler.run(parse(src))
+    assert (actual and actual.inspect()) == (expected and expected.inspect()), src
+
+
+@pytest.mark.parametrize("src, native, checked", [
+    ("1 + 2 * 3", "BinOp", "add"),
+    ("-(1 - 2) < 3", "Compare", "lt"),
+    ("(1 < 2) == !false", "Is()", "eq"),
+    ("if (1 > 2) { 3 } else { 4 } * 5", "BinOp", "mul"),
+])
+def test_integer_operands_use_native_operators(src, native, checked):
+    dump = generated(src)
+    assert native in dump
+    assert f"id='{checked}'" not in dump
+
+
+@pytest.mark.parametrize("src, checked", [
+    ("let a = 1; a + 2", "add"),
+    ("if (true) { 1 } else { false } * 2", "mul"),
+    ("1 == true", "eq"),
+    ("let a = 1; -a", "neg"),
+])
+def test_other_operands_are_checked(src, checked):
+    assert f"id='{checked}'" in generated(src)
+
+
+@pytest.mark.parametrize("src", [
+    "fn(x) { x }",
+    "f(1)",
+    "return 1;",
+    "[1, 2]",
+    "len",
+])
+def test_unsupported_programs(src):
+    with pytest.raises(CompileError):
+        pycompiler.run(parse(src))
+
+
+@pytest.mark.parametrize("src, expected", [
+    ("", None),
+    ("let a = 1;", None),
+    ("let a = 1; if (true) { let a = a + 1; } ; a", "2"),
+    ("if (true) { }", "null"),
+    ("a", "ERROR: identifier not found: a"),
+    ("if (false) { let a = 1; }; a", "ERROR: identifier not found: a"),
+    ("9223372036854775807 * 9223372036854775807", "85070591730234615847396907784232501249"),
+])
+def test_programs(src, expected):
+    result = pycompiler.run(parse(src))
+    assert (result and result.inspect()) == expected
+
+
+def test_code_is_cached(monkeypatch):
+    cache = CodeCache(maxsize=2)
+    monkeypatch.setattr(pycompiler, "code_cache", cache)
+    program = parse("1 + 2")
+    assert pycompiler.run(program).inspect() == "3"
+    function = cache.get(program)
+    assert function is not None
+    assert pycompiler.run(program).inspect() == "3"
+    assert cache.get(program) is function
+    # an equal tree is a different program
+    assert cache.get(parse("1 + 2")) is None
+
+    others = [parse("2"), parse("3")]
+    for other in others:
+        pycompiler.run(other)
+    assert len(cache) == 2
+    assert cache.get(program) is None
+
+    # entries do not keep their program alive
+    cache = CodeCache()
+    monkeypatch.setattr(pycompiler, "code_cache", cache)
+    pycompiler.run(parse("1 + 2"))
+    gc.collect()
+    assert len(cache) == 0
@@ -0,0 +1,140 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+from resolver import Resolver, resolve
+from environment import Environment
+import evaluator
+
+
+def parse(src: str, nodes=None):
+    parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes)
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def identifiers(node, found=None):
+    # every Identifier below node, in source order
+    found = [] if found is None else found
+    if type(node).__name__.startswith('Identifier'):
+        found.append(node)
+    for name in ('statements', 'expression', 'name', 'value', 'return_value', 'left', 'right',
+                 'condition', 'consequence', 'alternative', 'parameters', 'body', 'function',
+                 'arguments'):
+        child = getattr(node, name, None)
+        if isinstance(child, list):
+            for c in child:
+                identifiers(c, found)
+        elif child is not None and hasattr(child, 'token'):
+            identifiers(child, found)
+    return found
+
+
+def addresses(program):
+    return [(i.value, i.depth, i.slot) for i in identifiers(program)]
+
+
+@pytest.mark.parametrize("nodes", [None, AstArena()])
+@pytest.mark.parametrize("src, expected", [
+    ("let a = 1; let b = a; b",
+     [("a", 0, 0), ("b", 0, 1), ("a", 0, 0), ("b", 0, 1)]),
+    ("let a = 1; let a = a + 1;",
+     [("a", 0, 0), ("a", 0, 0), ("a", 0, 0)]),
+    ("x; let x = 1;",
+     [("x", 0, 0), ("x", 0, 0)]),
+    ("if (true) { let a = 1; } let b = a;",
+     [("a", 0, 0), ("b", 0, 1), ("a", 0, 0)]),
+    ("let f = fn(x, y) { let z = x; z + y + f };",
+     [("f", 0, 0), ("x", 0, 0), ("y", 0, 1), ("z", 0, 2), ("x", 0, 0),
+      ("z", 0, 2), ("y", 0, 1), ("f", 1, 0)]),
+    ("let x = 1; let f = fn() { let x = x; x };",
+     [("x", 0, 0), ("f", 0, 1), ("x", 0, 0), ("x", 1, 0), ("x", 0, 0)]),
+    ("let f = fn() { fn() { g } }; let g = 1;",
+     [("f", 0, 0), ("g", 2, 1), ("g", 0, 1)]),
+    ("let f = fn(a) { fn() { a + b } };",
+     [("f", 0, 0), ("a", 0, 0), ("a", 1, 0), ("b", 2, 1)]),
+])
+def test_resolve(src, expected, nodes):
+    assert addresses(parse(src, nodes)) == [(name, -1, -1) for name, _, _ in expected]
+    program = parse(src, nodes)
+    resolve(program)
+    assert addresses(program) == expected
+
+
+def test_function_slot_counts():
+    program = parse("fn(a, b) { let c = 1; if (a) { let d = 2; let c = 3; } }")
+    resolve(program)
+    assert program.statements[0].expression.slot_count == 4
+
+
+def test_globals_persist_across_programs():
+    resolver = Resolver()
+    first, second = parse("let f = fn() { g };"), parse("let x = 1; let g = 2;")
+    resolver.resolve_program(first)
+    resolver.resolve_program(second)
+    assert addresses(first) == [("f", 0, 0), ("g", 1, 1)]
+    assert addresses(second) == [("x", 0, 2), ("g", 0, 1)]
+    assert len(resolver.globals) == 3
+
+
+def test_environment():
+    outer = Environment(2)
+    inner = Environment(1, outer)
+    outer.set(1, "global")
+    inner.set(0, "local")
+    assert inner.get(0, 0) == "local"
+    assert inner.get(1, 1) == "global"
+    assert inner.get(1, 0) is None
+    outer.grow(4)
+    assert outer.slots == [None, "global", None, None]
+
+
+@pytest.mark.parametrize("nodes", [None, AstArena()])
+def test_free_variables(nodes):
+    program = parse("let k = 1; let f = fn(a) { let b = a; fn(c) { a + b + c + k + f } };", nodes)
+    resolve(program)
+    outer = program.statements[1].value
+    inner = outer.body.statements[1].expression
+    assert outer.free_variables == (("k", 0, 0), ("f", 0, 1))
+    assert inner.free_variables == (("a", 0, 0), ("b", 0, 1), ("k", 1, 0), ("f", 1, 1))
+
+
+@pytest.mark.parametrize("src", [
+    "let x = 1; let f = fn() { let x = x; x };",
+    "let f = fn() { fn() { g } }; let g = 1;",
+    "let f = fn(a) { fn() { a + b } };",
+    "let k = 1; let f = fn(a) { let b = a; fn(c) { a + b + c + k + f } };",
+])
+def test_lazy_bodies_resolve_as_parsed(src):
+    expected = parse(src)
+    resolve(expected)
+    parser = Parser(Lexer(src), lazy=True)
+    program = parser.parse_program()
+    resolve(program)
+    # forces every body, each resolved as it is parsed
+    assert program.string() == expected.string()
+    assert addresses(program) == addresses(expected)
+
+
+def test_lazy_bodies_are_pre_resolved_conservatively():
+    program = Parser(Lexer("let k = 1; let f = fn(a) { let b = a + k; b };"), lazy=True).parse_program()
+    resolve(program)
+    function = program.statements[1].value
+    # b and k might each be a local or free until the body is parsed
+    assert function.slot_count == 3
+    assert function.free_variables == (("k", 0, 0), ("b", 0, 2))
+    assert evaluator.run(program) is None
+    function.body.statements
+    assert function.slot_count == 2
+    assert function.free_variables == (("k", 0, 0),)
+
+
+def test_identifiers_compare_by_symbol():
+    first, second = parse("abc; abc"), parse("abc")
+    a, b = first.statements[0].expression, first.statements[1].expression
+    assert a.symbol == b.symbol == second.statements[0].expression.symbol
+    assert a == b and a.value is b.value
+    assert a != parse("abd").statements[0].expression
+    resolver = resolve(first)
+    assert resolver.globals.slots == {a.symbol: 0}
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+import memoization
+from memoization import MemoCache
+from server import ReplServer, LatencyMetrics, PROMPT
+
+
+@pytest.fixture(autouse=True)
+def no_memo():
+    # keeps the slow program slow
+    memoization.cache = MemoCache(0)
+    yield
+    memoization.cache = MemoCache()
+
+
+async def connect(server):
+    host, port = server.sockets[0].getsockname()[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readuntil(PROMPT.encode())
+    return reader, writer
+
+
+async def send(reader, writer, line):
+    writer.write(f"{line}\n".encode())
+    output = await reader.readuntil(PROMPT.encode())
+    return output.decode()[:-len(PROMPT)]
+
+
+def test_latency_metrics():
+    metrics = LatencyMetrics()
+    assert metrics.percentile(50) == 0.0
+    for ms in range(1, 101):
+        metrics.record(ms / 1000)
+    assert metrics.count == 100
+    assert metrics.max_time == 0.1
+    assert metrics.percentile(50) == 0.051
+    assert "requests=100 mean=50.500ms" in metrics.report()
+
+
+def test_sessions_are_isolated():
+    async def scenario():
+        repl = ReplServer()
+        server = await repl.start('127.0.0.1:0')
+        async with server:
+            a = await connect(server)
+            b = await connect(server)
+            assert await send(*a, "let x = 1;") == ""
+            assert await send(*b, "let x = 2;") == ""
+            assert await send(*a, "x + 10") == "11\n"
+            assert await send(*b, "x + 10") == "12\n"
+            assert await send(*b, "let = 1") != ""
+            assert await send(*b, ":nope") == "\tunknown command: :nope\n"
+            assert len(repl.sessions) == 2
+            assert [m.count for m in repl.metrics().values()] == [2, 3]
+            assert (await send(*a, ":metrics")).startswith("\trequests=2 ")
+
+            a[1].write(b":quit\n")
+            assert await a[0].read() == b""
+            b[1].close()
+            await asyncio.sleep(0.05)
+            assert repl.sessions == {}
+
+    asyncio.run(scenario())
+
+
+def test_puts_output_goes_to_its_client(capsys):
+    async def scenario():
+        repl = ReplServer()
+        server = await repl.start('127.0.0.1:0')
+        async with server:
+            a = await connect(server)
+            b = await connect(server)
+            assert await send(*a, "puts(1, 2); 3") == "1\n2\n3\n"
+            # a program that does not parse never runs
+            assert (await send(*b, "puts(4); let = 1")).startswith("\texpected next token")
+            assert await send(*b, "let f = fn(x) { puts(x) }; f(5)") == "5\nnull\n"
+            for _, writer in (a, b):
+                writer.close()
+                await writer.wait_closed()
+
+    asyncio.run(scenario())
+    assert capsys.readouterr().out == ""
+
+
+def test_slow_client_does_not_stall_others():
+    slow = "let count = fn(n) { if (n == 0) { 0 } else { count(n - 1) } }; count(20000)"
+
+    async def scenario():
+        repl = ReplServer()
+        server = await repl.start('127.0.0.1:0')
+        async with server:
+            a = await connect(server)
+            b = await connect(server)
+            slow_reply = asyncio.ensure_future(send(*a, slow))
+            await asyncio.sleep(0.01)
+            assert await send(*b, "1 + 1") == "2\n"
+            assert not slow_reply.done()
+            assert await slow_reply == "0\n"
+            for _, writer in (a, b):
+                writer.close()
+
+    asyncio.run(scenario())
+
+
+def test_unix_socket(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "monkey.sock")
+        server = await ReplServer().start(f"unix:{path}")
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(path)
+            await reader.readuntil(PROMPT.encode())
+            assert await send(reader, writer, "3 * 3") == "9\n"
+            writer.close()
+
+    asyncio.run(scenario())
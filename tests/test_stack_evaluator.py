@@ -0,0 +1,79 @@
+import sys
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from optimizer import optimize
+import evaluator
+import stack_evaluator
+from main import run_file
+
+
+def parse(src: str):
+    parser = Parser(Lexer(src))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+@pytest.mark.parametrize("src, expected", [
+    ("-" * 5001 + "1", "-1"),
+    ("!" * 5000 + "true", "true"),
+    (" + ".join(["1"] * 5000), "5000"),
+    ("1" + " + (1" * 5000 + ")" * 5000, "5001"),
+    ("let f = fn(x) { x + 1 }; " + "f(" * 3000 + "0" + ")" * 3000, "3000"),
+], ids=["minus", "bang", "sum", "nested-sum", "calls"])
+def test_deep_nesting(src, expected):
+    program = parse(src)
+    assert stack_evaluator.run(program).inspect() == expected
+    with pytest.raises(RecursionError):
+        evaluator.run(program)
+
+
+def test_deep_non_tail_recursion():
+    n = 10 * sys.getrecursionlimit()
+    program = parse("let sum = fn(n) { if (n == 0) { 0 } else { n + sum(n - 1) } }; sum(%d)" % n)
+    assert stack_evaluator.run(program).inspect() == str(n * (n + 1) // 2)
+
+
+@pytest.mark.parametrize("src, expected", [
+    ("let f = fn() { let x = 1; }; f()", "null"),
+    ("let f = fn() { }; f()", "null"),
+    ("let x = 1;", None),
+    ("", None),
+    ("let f = fn(x) { if (x) { return 1; } 2 }; f(true) + f(false)", "3"),
+    ("let f = fn() { 1 + g() }; let g = fn() { return 2; 3 }; f()", "3"),
+])
+def test_statement_values(src, expected):
+    for run in (evaluator.run, stack_evaluator.run):
+        evaluated = run(parse(src))
+        assert (evaluated and evaluated.inspect()) == expected
+
+
+def test_deep_script(tmp_path, capsys):
+    script = tmp_path / "deep.mk"
+    script.write_text(" + ".join(["(1 - -1)"] * 3000))
+    assert run_file(str(script), stack_evaluator.run) == 0
+    assert capsys.readouterr().out == "6000\n"
+
+    script.write_text("let one = fn() { 1 }; " + " + ".join(["one()"] * 3000))
+    assert run_file(str(script), evaluator.run, use_cache=False) == 1
+    assert "try --engine stack" in capsys.readouterr().err
+
+
+def test_lazy_script(tmp_path, capsys):
+    script = tmp_path / "lazy.mk"
+    script.write_text("let ok = fn(x) { x * 2 }; let bad = fn() { let = 1; }; ok(21)")
+    assert run_file(str(script), stack_evaluator.run, lazy=True) == 0
+    assert capsys.readouterr().out == "42\n"
+    assert not (tmp_path / "__monkeycache__").exists()
+
+    script.write_text(script.read_text() + "; bad()")
+    assert run_file(str(script), stack_evaluator.run, lazy=True) == 1
+    assert "expected next token to be TokenType.IDENT" in capsys.readouterr().err
+
+    # a function result is printed with its body, parsed only then
+    script.write_text("let f = fn() { let = 1 };\nf")
+    assert run_file(str(script), stack_evaluator.run, lazy=True) == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "expected next token to be TokenType.IDENT" in captured.err
@@ -0,0 +1,146 @@
+import gc
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from ast_arena import AstArena
+import evaluator
+import memoization
+import tiering
+from memoization import MemoCache
+from tiering import TieringState, tiered, COMPILED, INTERPRETED, UNCOMPILABLE
+from main import repl_command
+
+
+@pytest.fixture(autouse=True)
+def no_memo():
+    # memoized calls never reach the body, so they would not be counted
+    memoization.cache = MemoCache(0)
+    yield
+    memoization.cache = MemoCache()
+    tiering.disable()
+    tiering.state = TieringState()
+
+
+def parse(src: str):
+    parser = Parser(Lexer(src))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
+
+
+def run(src: str):
+    result = evaluator.run(parse(src))
+    return result and result.inspect()
+
+
+FIB = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+
+
+@pytest.mark.parametrize("src", [
+    FIB + "fib(15)",
+    "let count = fn(n, acc) { if (n == 0) { acc } else { count(n - 1, acc + 1) } }; count(50000, 0)",
+    "let f = fn(x) { let y = x * 2; if (y > 10) { return y; } y + 1 }; [f(3), f(7)]",
+    "let f = fn(x) { if (x) { 1 } }; [f(true), f(false), f(0)]",
+    "let f = fn(x) { if (x) { return 1; }; 2 }; [f(true), f(false)]",
+    "let f = fn() { }; f()",
+    "let f = fn(x) { let y = x; }; f(1)",
+    "let f = fn(x) { y }; f(1)",
+    "let f = fn(x) { if (x) { let y = 1; }; y }; [f(true), f(false)]",
+    "let f = fn(x) { x + true }; f(1)",
+    "let f = fn(x) { x / 0 }; f(1)",
+    "let f = fn(x) { -x }; [f(1), f(true)]",
+    "let f = fn(x, y) { x == y }; [f(1, 1), f(true, true), f(1, true), f(f, f), f(len, len)]",
+    "let f = fn(xs) { xs * 2 + 1 }; f([1, 2, 3])",
+    "let f = fn(xs) { xs == [1, 5] }; f([1, 2])",
+    "let f = fn(xs, i) { if (i < len(xs)) { xs[i] } }; [f([4, 5], 1), f([4, 5], 2)]",
+    "let f = fn(g, x) { g(g(x)) }; f(fn(y) { y * 3 }, 2)",
+    "let f = fn(x) { x(1) }; f(2)",
+    "let f = fn(x) { len(x) }; f(1)",
+    "let f = fn(x) { first }; f(1)",
+    "let adder = fn(a) { fn(b) { a + b } }; let add = adder(3); [add(1), add(2)]",
+    "let k = 10; let f = fn(x) { x + k + later }; let later = 100; f(1)",
+    "let f = fn(x) { if (x > 0) { f(x - 1) } else { puts(x) } }; f(3)",
+])
+def test_matches_interpreter(src):
+    expected = run(src)
+    # profiles go with their program, so it is kept until they are checked
+    program = parse(src)
+    with tiered(1, TieringState()) as state:
+        result = evaluator.run(program)
+        assert (result and result.inspect()) == expected
+    assert state.profiles
+
+
+def test_hot_functions_are_compiled():
+    program = parse(FIB + "let cold = fn() { 1 }; fib(10) + cold()")
+    with tiered(20, TieringState()) as state:
+        assert evaluator.run(program).inspect() == "56"
+
+    tiers = state.tiers()
+    assert list(tiers.values()) == [COMPILED, INTERPRETED]
+    (fib, cold), (event,) = state.profiles.values(), state.events
+    assert fib.calls == 177 and fib.compiled is not None
+    assert cold.calls == 1 and cold.compiled is None
+    assert event.function == fib.name == "fn(n) at line 1, column 17"
+    assert event.calls == 20
+    assert event.tier == COMPILED
+    assert event.compile_time > 0
+
+
+def test_functions_that_cannot_compile_stay_interpreted():
+    program = parse("let adder = fn(a) { fn(b) { a + b } }; adder(1)(2) + adder(3)(4)")
+    with tiered(1, TieringState()) as state:
+        assert evaluator.run(program).inspect() == "10"
+
+    adder, add = state.profiles.values()
+    assert adder.tier == UNCOMPILABLE
+    assert adder.reason == "unsupported node: FunctionLiteral"
+    assert adder.calls == 2
+    assert add.tier == COMPILED
+    assert "unsupported node: FunctionLiteral" in state.report()
+
+
+def test_compiled_tail_calls_do_not_grow_the_stack():
+    program = parse("let count = fn(n) { if (n == 0) { 0 } else { count(n - 1) } }; count(200000)")
+    with tiered(1, TieringState()):
+        assert evaluator.run(program).inspect() == "0"
+
+
+@pytest.mark.parametrize("nodes", [None, AstArena])
+def test_profiles_go_with_their_program(nodes):
+    src = "let f = fn(x) { x + 1 }; let g = fn() { f(1) }; g() + g()"
+    def parse_program():
+        parser = Parser(Lexer(src)) if nodes is None else Parser(Lexer(src), nodes())
+        return parser.parse_program()
+
+    with tiered(1, TieringState()) as state:
+        for _ in range(20):
+            assert evaluator.run(parse_program()).inspect() == "4"
+            gc.collect()
+            assert len(state.profiles) == 0
+        program = parse_program()
+        for _ in range(20):
+            evaluator.run(program)
+        assert len(state.profiles) == 2
+
+
+def test_tiered_restores_call_body():
+    assert not tiering.is_enabled()
+    with tiered(5) as state:
+        assert tiering.is_enabled()
+        assert state is tiering.state and state.threshold == 5
+    assert evaluator.call_body is tiering.original_call_body
+
+
+def test_repl_command():
+    assert "tiering is off" in repl_command(":tiers")
+    tiering.enable(2)
+    program = parse("let f = fn(x) { x }; f(1); f(2); f(3)")
+    evaluator.run(program)
+    report = repl_command(":tiers")
+    assert report.startswith("threshold=2")
+    assert "fn(x) at line 1, column 15" in report
+    assert "-> compiled after 2 calls" in report
+    assert repl_command(":tiers reset") == "\ttiers reset"
+    assert repl_command(":tiers") == "threshold=2"
+    assert "usage" in repl_command(":tiers bogus")
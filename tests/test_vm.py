@@ -0,0 +1,79 @@
+import pytest
+from lexer import Lexer
+from monkey_parser import Parser
+from object import Integer, Boolean, Null, Error
+from vm import run
+
+
+def run_src(src: str):
+    lexer = Lexer(src)
+    parser = Parser(lexer)
+    program = parser.parse_program()
+    return run(program)
+
+@pytest.mark.parametrize("src, expected", [
+    ("1", 1),
+    ("1 + 2", 3),
+    ("1 - 2", -1),
+    ("2 * 3", 6),
+    ("4 / 2", 2),
+    ("7 / 2", 3),
+    ("-7 / 2", -3),
+    ("50 / 2 * 2 + 10 - 5", 55),
+    ("5 * (2 + 10)", 60),
+    ("-5", -5),
+    ("-50 + 100 + -50", 0),
+    ("(5 + 10 * 2 + 15 / 3) * 2 + -10", 50),
+])
+def test_integer_arithmetic(src, expected):
+    result = run_src(src)
+    assert isinstance(result, Integer)
+    assert result.value == expected
+
+@pytest.mark.parametrize("src, expected", [
+    ("true", True),
+    ("false", False),
+    ("1 < 2", True),
+    ("1 > 2", False),
+    ("1 == 1", True),
+    ("1 != 1", False),
+    ("true == true", True),
+    ("true != false", True),
+    ("(1 < 2) == true", True),
+    ("1 == true", False),
+    ("!true", False),
+    ("!!5", True),
+    ("!(if (false) { 5; })", True),
+])
+def test_boolean_expressions(src, expected):
+    result = run_src(src)
+    assert isinstance(result, Boolean)
+    assert result.value == expected
+
+@pytest.mark.parametrize("src, expected", [
+    ("if (true) { 10 }", 10),
+    ("if (1) { 10 }", 10),
+    ("if (1 < 2) { 10 } else { 20 }", 10),
+    ("if (1 > 2) { 10 } else { 20 }", 20),
+    ("if ((if (false) { 10 })) { 10 } else { 20 }", 20),
+    ("if (true) { 1; 2 } else { 3 }", 2),
+])
+def test_conditionals(src, expected):
+    result = run_src(src)
+    assert isinstance(result, Integer)
+    assert result.value == expected
+
+@pytest.mark.parametrize("src", [
+    "if (false) { 10 }",
+    "if (true) { }",
+])
+def test_conditionals_without_value(src):
+    assert isinstance(run_src(src), Null)
+
+@pytest.mark.parametrize("src, message", [
+    ("-true", "unknown operator: -BOOLEAN"),
+    ("1 + true", "type mismatch: INTEGER + BOOLEAN"),
+    ("true + false", "unknown operator: BOOLEAN + BOOLEAN"),
+])
+def test_errors(src, message):
+    assert run_src(src) == Error(message)